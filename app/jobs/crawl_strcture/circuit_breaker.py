@@ -0,0 +1,167 @@
+"""
+Per-host async circuit breaker
+
+Thay cho time.sleep(300) khi gặp quá nhiều lỗi liên tiếp: chỉ các request tới host đang lỗi
+phải chờ (bằng asyncio.sleep), event loop vẫn phục vụ FastAPI và job của site khác.
+
+States:
+- closed:    hoạt động bình thường, đếm lỗi liên tiếp
+- open:      đủ failure_threshold lỗi liên tiếp → chặn request trong `cooldown` giây
+- half_open: hết cooldown → cho đúng 1 request probe đi qua;
+             probe thành công → closed, thất bại → open lại
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Optional
+
+from app.core.config import settings
+from .rate_limiter import get_host
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Circuit breaker của một host"""
+
+    def __init__(self, host: str, failure_threshold: int, cooldown: float, success_reset: int):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.success_reset = success_reset
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.consecutive_successes = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probe_started_at: Optional[float] = None
+        self._last_transition = time.time()
+
+    def _transition(self, new_state: str, reason: str) -> None:
+        if new_state == self.state:
+            return
+        message = f"[{self.host}] Circuit breaker {self.state} → {new_state} ({reason})"
+        logger.warning(message)
+        print(f"🔌 {message}")
+        self.state = new_state
+        self._last_transition = time.time()
+
+    def _probe_timed_out(self, now: float) -> bool:
+        # Probe bị cancel/treo thì cho probe khác đi, tránh kẹt ở half_open mãi
+        return self._probe_started_at is not None and now - self._probe_started_at > settings.CRAWLER_TIMEOUT * 2
+
+    async def before_request(self) -> None:
+        """Chờ (non-blocking) cho đến khi host cho phép gửi request"""
+        while True:
+            now = time.monotonic()
+
+            if self.state == CLOSED:
+                return
+
+            if self.state == OPEN:
+                remaining = self.opened_at + self.cooldown - now
+                if remaining > 0:
+                    await asyncio.sleep(min(remaining, 5.0))
+                    continue
+                self._transition(HALF_OPEN, "cool-down elapsed, sending probe")
+
+            # HALF_OPEN: chỉ một probe tại một thời điểm
+            if self._probe_started_at is None or self._probe_timed_out(now):
+                self._probe_started_at = now
+                return
+            await asyncio.sleep(0.5)
+
+    def record_success(self) -> None:
+        self.consecutive_successes += 1
+
+        if self.state == HALF_OPEN:
+            self._probe_started_at = None
+            self.consecutive_failures = 0
+            self.consecutive_successes = 0
+            self._transition(CLOSED, "probe succeeded")
+            return
+
+        # Chỉ reset failure counter sau success_reset lần thành công liên tiếp
+        if self.consecutive_successes >= self.success_reset:
+            if self.consecutive_failures:
+                print(f"✅ [{self.host}] {self.success_reset} consecutive successes - resetting failure counter (was {self.consecutive_failures})")
+            self.consecutive_failures = 0
+            self.consecutive_successes = 0
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self.consecutive_successes = 0
+
+        if self.state == HALF_OPEN:
+            self._probe_started_at = None
+            self._open("probe failed")
+            return
+
+        if self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self._open(f"{self.consecutive_failures} consecutive failures")
+        elif self.consecutive_failures > 0 and self.consecutive_failures % 5 == 0:
+            print(f"⚠️ [{self.host}] Warning: {self.consecutive_failures} consecutive failures (max: {self.failure_threshold})")
+
+    def _open(self, reason: str) -> None:
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        self._transition(OPEN, f"{reason}, cooling down {self.cooldown:.0f}s")
+
+    def snapshot(self) -> Dict[str, Any]:
+        retry_in = 0.0
+        if self.state == OPEN:
+            retry_in = max(0.0, self.opened_at + self.cooldown - time.monotonic())
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "cooldown": self.cooldown,
+            "retry_in": round(retry_in, 1),
+            "trips": self.trips,
+            "last_transition": self._last_transition,
+        }
+
+
+class CircuitBreakerRegistry:
+    """Registry các CircuitBreaker theo host"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, url: str, failure_threshold: Optional[int] = None) -> CircuitBreaker:
+        """
+        Lấy breaker của host chứa url (tạo mới nếu chưa có)
+
+        Args:
+            url: URL cần crawl
+            failure_threshold: Ngưỡng lỗi liên tiếp, cập nhật cho breaker nếu được truyền vào
+        """
+        host = get_host(url)
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                host=host,
+                failure_threshold=failure_threshold or settings.CIRCUIT_BREAKER_THRESHOLD,
+                cooldown=settings.CIRCUIT_BREAKER_COOLDOWN,
+                success_reset=settings.CIRCUIT_BREAKER_SUCCESS_RESET
+            )
+            self._breakers[host] = breaker
+        elif failure_threshold:
+            breaker.failure_threshold = failure_threshold
+        return breaker
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {host: breaker.snapshot() for host, breaker in self._breakers.items()}
+
+    def states(self) -> Dict[str, str]:
+        return {host: breaker.state for host, breaker in self._breakers.items()}
+
+
+# Global instance dùng chung cho mọi job trong process
+breaker_registry = CircuitBreakerRegistry()
@@ -0,0 +1,159 @@
+"""
+Auto-tuning concurrency cho worker crawl detail page
+
+BATCH_SIZE cố định vừa là số worker vừa là kích thước connection pool, nhưng giá trị tốt nhất khác nhau
+theo site và theo giờ. Controller giữ một giới hạn số request đang chạy (in-flight) và điều chỉnh sau mỗi
+cửa sổ CONCURRENCY_TUNE_INTERVAL giây theo số liệu đo được:
+- RAM khả dụng < CONCURRENCY_MIN_FREE_MB (Chrome geocoding cần RAM) → giảm một nửa
+- Tỉ lệ lỗi > CONCURRENCY_MAX_ERROR_RATE                          → giảm 25%
+- p95 latency > CONCURRENCY_LATENCY_FACTOR × p50 thấp nhất đã thấy  → giảm 1 (request đang xếp hàng)
+- Còn lại: hill climbing theo throughput - đi tiếp hướng cũ (±1) khi throughput tăng, đảo hướng khi giảm,
+  giảm 1 khi throughput không đổi (±5%): cùng throughput với ít request hơn thì latency thấp hơn
+
+Giới hạn nằm trong [CONCURRENCY_MIN, CONCURRENCY_MAX]; mọi lần điều chỉnh đều được log.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_THROUGHPUT_TOLERANCE = 0.05  # Chênh lệch throughput nhỏ hơn coi là nhiễu
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Percentile (nearest-rank) của list đã sort"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class ConcurrencyController:
+    """Giới hạn in-flight tự điều chỉnh cho một lần chạy crawl"""
+
+    def __init__(
+        self,
+        initial: Optional[int] = None,
+        min_limit: Optional[int] = None,
+        max_limit: Optional[int] = None,
+        interval: Optional[float] = None
+    ):
+        """
+        Args:
+            initial: Giới hạn ban đầu (default: settings.BATCH_SIZE)
+            min_limit: Giới hạn nhỏ nhất (default: settings.CONCURRENCY_MIN)
+            max_limit: Giới hạn lớn nhất, cũng là số worker / connection (default: settings.CONCURRENCY_MAX)
+            interval: Độ dài mỗi cửa sổ đo (giây) (default: settings.CONCURRENCY_TUNE_INTERVAL)
+        """
+        self.min_limit = max(1, min_limit or settings.CONCURRENCY_MIN)
+        self.max_limit = max(self.min_limit, max_limit or settings.CONCURRENCY_MAX)
+        self.limit = self._clamp(initial or settings.BATCH_SIZE)
+        self.interval = interval or settings.CONCURRENCY_TUNE_INTERVAL
+        self.in_flight = 0
+        self.adjustments = 0
+        self._cond = asyncio.Condition()
+        self._latencies: List[float] = []
+        self._errors = 0
+        self._window_start = time.monotonic()
+        self._baseline: Optional[float] = None  # p50 thấp nhất đã thấy (latency khi server không tải)
+        self._last_throughput: Optional[float] = None
+        self._direction = 1
+        self._last_stats: Dict[str, Any] = {}
+
+    def _clamp(self, value: int) -> int:
+        return max(self.min_limit, min(self.max_limit, value))
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self, latency: float, error: bool) -> None:
+        """Trả slot và ghi nhận kết quả của request (latency không gồm thời gian chờ breaker / rate limiter)"""
+        async with self._cond:
+            self.in_flight -= 1
+            self._latencies.append(latency)
+            if error:
+                self._errors += 1
+            self._maybe_adjust()
+            self._cond.notify_all()
+
+    @staticmethod
+    def _free_ram_mb() -> float:
+        return psutil.virtual_memory().available / 1024 / 1024
+
+    def _maybe_adjust(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        completed = len(self._latencies)
+        # Cửa sổ quá ngắn / quá ít mẫu → số liệu nhiễu
+        if elapsed < self.interval or completed < self.limit:
+            return
+
+        latencies = sorted(self._latencies)
+        p50, p95 = percentile(latencies, 0.5), percentile(latencies, 0.95)
+        error_rate = self._errors / completed
+        throughput = completed / elapsed
+        free_mb = self._free_ram_mb()
+        self._baseline = p50 if self._baseline is None else min(self._baseline, p50)
+
+        old = self.limit
+        if free_mb < settings.CONCURRENCY_MIN_FREE_MB:
+            new, reason = int(old * 0.5), f"low RAM {free_mb:.0f}MB"
+            self._direction = 1
+        elif error_rate > settings.CONCURRENCY_MAX_ERROR_RATE:
+            new, reason = int(old * 0.75), f"error rate {error_rate:.1%}"
+            self._direction = 1
+        elif p95 > self._baseline * settings.CONCURRENCY_LATENCY_FACTOR:
+            new, reason = old - 1, f"p95 {p95:.2f}s > {settings.CONCURRENCY_LATENCY_FACTOR}× baseline {self._baseline:.2f}s"
+            self._direction = 1
+        else:
+            if self._last_throughput is not None:
+                if throughput < self._last_throughput * (1 - _THROUGHPUT_TOLERANCE):
+                    self._direction = -self._direction
+                elif throughput <= self._last_throughput * (1 + _THROUGHPUT_TOLERANCE):
+                    self._direction = -1
+            new = old + self._direction
+            if new != self._clamp(new):
+                # Chạm biên → thử hướng ngược lại ở cửa sổ sau
+                self._direction = -self._direction
+            reason = f"throughput {throughput:.2f}/s" + (
+                f" (prev {self._last_throughput:.2f}/s)" if self._last_throughput is not None else ""
+            )
+        new = self._clamp(new)
+
+        self._last_stats = {
+            "p50": round(p50, 3), "p95": round(p95, 3), "error_rate": round(error_rate, 4),
+            "throughput": round(throughput, 3), "free_ram_mb": round(free_mb), "samples": completed,
+        }
+        self._last_throughput = throughput
+        self._latencies = []
+        self._errors = 0
+        self._window_start = now
+
+        if new != old:
+            self.limit = new
+            self.adjustments += 1
+            message = (
+                f"Concurrency {old} → {new} ({reason}; p50={p50:.2f}s p95={p95:.2f}s "
+                f"errors={error_rate:.1%} throughput={throughput:.2f}/s RAM={free_mb:.0f}MB)"
+            )
+            logger.info(message)
+            print(f"🎛️ {message}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "min": self.min_limit,
+            "max": self.max_limit,
+            "adjustments": self.adjustments,
+            "last_window": self._last_stats,
+        }
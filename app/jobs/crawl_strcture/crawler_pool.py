@@ -1,166 +1,250 @@
 """
-HTTP Session Pool - Quản lý pool các HTTP sessions để tránh overhead
+HTTP Session Pool - một aiohttp session (+ connector riêng) cho mỗi host
+
+- Giới hạn connection theo host: POOL_HOST_LIMITS[host], mặc định = pool_size
+- Warm-up (tuỳ chọn): mở sẵn POOL_WARMUP_CONNECTIONS kết nối TCP/TLS tới host trước request đầu tiên
+- Counters live qua aiohttp TraceConfig: connection mới / tái sử dụng / phải chờ slot,
+  cùng số connection đang dùng / idle của connector → dùng để chọn BATCH_SIZE theo số liệu
 """
 
 import asyncio
-import aiohttp
-from typing import Optional, Callable, List
-from app.core.config import CrawlerConfig
-from .custom_rules import CustomExtractor
+import time
 import uuid
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from app.core.config import CrawlerConfig, settings
+from .rate_limiter import get_host, rate_limiter
+
+
+class HostStats:
+    """Counters của một host, cập nhật từ TraceConfig callbacks"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.queued = 0  # Số lần request phải chờ vì connector hết slot
+        self.queued_time = 0.0
+        self.warmed = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        acquired = self.new_connections + self.reused_connections
+        return {
+            "limit": self.limit,
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "reuse_ratio": round(self.reused_connections / acquired, 3) if acquired else 0.0,
+            "queued": self.queued,
+            "avg_queue_wait": round(self.queued_time / self.queued, 3) if self.queued else 0.0,
+            "warmed": self.warmed,
+        }
+
 
 class CrawlerPool:
     """
-    Pool quản lý các aiohttp ClientSession instances để tái sử dụng
-    Giúp tránh overhead khi khởi tạo session mới cho mỗi request
+    Pool quản lý aiohttp ClientSession theo host
+
+    Mỗi host có đúng một session với TCPConnector riêng (limit = limit của host), nên giới hạn
+    và counters của từng site tách biệt nhau. Số request đồng thời vẫn do số worker quyết định.
     """
-    
+
     def __init__(
-        self, 
+        self,
         pool_size: int,
-        custom_extractor_factory: Optional[Callable[[], CustomExtractor]] = None
+        warmup_connections: Optional[int] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[int] = None
     ):
         """
         Initialize CrawlerPool (HTTP Session Pool)
-        
+
         Args:
-            pool_size: Số lượng session instances trong pool (thường bằng BATCH_SIZE)
-            custom_extractor_factory: Optional factory function to create custom extractor
+            pool_size: Số connection mặc định mỗi host (thường bằng số worker / BATCH_SIZE)
+            warmup_connections: Số connection mở sẵn cho mỗi host (default: settings.POOL_WARMUP_CONNECTIONS, 0 = tắt)
+            headers: Headers mặc định của session (default: CrawlerConfig.get_headers())
+            timeout: Timeout mỗi request, giây (default: CrawlerConfig.get_timeout())
         """
         self.pool_size = pool_size
+        self.warmup_connections = (
+            warmup_connections if warmup_connections is not None else settings.POOL_WARMUP_CONNECTIONS
+        )
         self.config = CrawlerConfig()
-        self.custom_extractor_factory = custom_extractor_factory
+        self.headers = headers or self.config.get_headers()
+        self.timeout = timeout or self.config.get_timeout()
         self._instance_id = str(uuid.uuid4())[:8]  # Debug: unique ID cho mỗi instance
-        
-        # Pool của các HTTP sessions
-        self._sessions: List[aiohttp.ClientSession] = []
-        self._available_sessions: asyncio.Queue = asyncio.Queue()
-        self._initialized = False
+
+        # host → (session, connector)
+        self._sessions: Dict[str, Tuple[aiohttp.ClientSession, aiohttp.TCPConnector]] = {}
+        self._stats: Dict[str, HostStats] = {}
         self._lock = asyncio.Lock()
-        self._connector: Optional[aiohttp.TCPConnector] = None
-        
+        self._closed = False
+
+        register_active_pool(self)
         print(f"🆕 CrawlerPool instance created: {self._instance_id}")
-        
-    async def initialize(self):
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def host_limit(self, host: str) -> int:
+        """Số connection tối đa tới host (POOL_HOST_LIMITS ghi đè pool_size)"""
+        return max(1, settings.POOL_HOST_LIMITS.get(host, self.pool_size))
+
+    def _trace_config(self, stats: HostStats) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            stats.requests += 1
+
+        async def on_queued_start(session, ctx, params):
+            ctx.queued_at = time.monotonic()
+
+        async def on_queued_end(session, ctx, params):
+            stats.queued += 1
+            stats.queued_time += time.monotonic() - getattr(ctx, 'queued_at', time.monotonic())
+
+        async def on_create_end(session, ctx, params):
+            stats.new_connections += 1
+
+        async def on_reuse(session, ctx, params):
+            stats.reused_connections += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_queued_start.append(on_queued_start)
+        trace_config.on_connection_queued_end.append(on_queued_end)
+        trace_config.on_connection_create_end.append(on_create_end)
+        trace_config.on_connection_reuseconn.append(on_reuse)
+        return trace_config
+
+    async def session_for(self, url: str) -> aiohttp.ClientSession:
         """
-        Khởi tạo pool với số lượng HTTP session instances
+        Session của host chứa url (tạo + warm-up ở lần gọi đầu tiên cho host đó)
+
+        Session được dùng chung giữa các worker, không cần trả lại.
         """
+        host = get_host(url)
+        entry = self._sessions.get(host)
+        if entry:
+            return entry[0]
+
         async with self._lock:
-            if self._initialized:
-                return
-                
-            print(f"🔧 [{self._instance_id}] Initializing HTTP session pool with {self.pool_size} instances...")
-            
-            # Tạo connector với connection pooling
-            self._connector = aiohttp.TCPConnector(
-                limit=self.pool_size * 2,  # Tổng số connections
-                limit_per_host=self.pool_size,  # Connections per host
+            entry = self._sessions.get(host)
+            if entry:
+                return entry[0]
+            if self._closed:
+                raise RuntimeError(f"CrawlerPool {self._instance_id} is closed")
+
+            limit = self.host_limit(host)
+            stats = HostStats(limit)
+            connector = aiohttp.TCPConnector(
+                limit=limit,
+                limit_per_host=limit,
                 ttl_dns_cache=300,  # DNS cache 5 phút
                 force_close=False,  # Giữ connections alive
             )
-            
-            # Tạo timeout config
             timeout = aiohttp.ClientTimeout(
-                total=self.config.get_timeout(),
+                total=self.timeout,
                 connect=10,
-                sock_read=self.config.get_timeout()
+                sock_read=self.timeout
             )
-            
-            for i in range(self.pool_size):
-                try:
-                    session = aiohttp.ClientSession(
-                        headers=self.config.get_headers(),
-                        connector=self._connector,
-                        timeout=timeout,
-                        connector_owner=False  # Connector được quản lý bởi pool
-                    )
-                    self._sessions.append(session)
-                    await self._available_sessions.put(session)
-                    print(f"✅ [{self._instance_id}] Session {i+1}/{self.pool_size} initialized")
-                except Exception as e:
-                    print(f"❌ [{self._instance_id}] Failed to initialize session {i+1}: {e}")
-                    
-            self._initialized = True
-            print(f"🎉 [{self._instance_id}] HTTP session pool initialized with {len(self._sessions)} instances")
-    
-    async def acquire(self) -> aiohttp.ClientSession:
-        """
-        Lấy một HTTP session instance từ pool
-        Nếu pool đang trống, sẽ đợi cho đến khi có session available
-        
-        Returns:
-            aiohttp.ClientSession instance
-        """
-        if not self._initialized:
-            await self.initialize()
-            
-        session = await self._available_sessions.get()
-        return session
-    
-    async def release(self, session: aiohttp.ClientSession):
-        """
-        Trả HTTP session instance về pool sau khi sử dụng xong
-        
-        Args:
-            session: aiohttp.ClientSession instance to release
-        """
-        await self._available_sessions.put(session)
-    
+            session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=connector,
+                timeout=timeout,
+                trace_configs=[self._trace_config(stats)]
+            )
+            self._sessions[host] = (session, connector)
+            self._stats[host] = stats
+            print(f"✅ [{self._instance_id}] Session for {host} initialized (limit {limit} connections)")
+
+            if self.warmup_connections > 0:
+                await self._warm_up(url, session, stats, min(self.warmup_connections, limit))
+
+            return session
+
+    async def _warm_up(self, url: str, session: aiohttp.ClientSession, stats: HostStats, count: int) -> None:
+        """Mở sẵn `count` connection (HEAD / đồng thời) để TCP + TLS handshake xong trước batch đầu"""
+        parts = urlsplit(url)
+        root = f"{parts.scheme}://{parts.netloc}/"
+
+        async def open_connection():
+            await rate_limiter.acquire(root)
+            try:
+                async with session.head(root, allow_redirects=False) as response:
+                    rate_limiter.record_status(root, response.status, response.headers.get('Retry-After'))
+                    return True
+            except Exception:
+                return False
+
+        started = time.monotonic()
+        results = await asyncio.gather(*(open_connection() for _ in range(count)))
+        stats.warmed = sum(1 for ok in results if ok)
+        print(f"🔥 [{self._instance_id}] Warmed up {stats.warmed}/{count} connections to {parts.netloc} in {time.monotonic() - started:.2f}s")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters live theo host: in_use / idle lấy từ connector, còn lại từ TraceConfig"""
+        hosts = {}
+        for host, (session, connector) in self._sessions.items():
+            data = self._stats[host].snapshot()
+            # aiohttp không có API public cho số connection đang dùng / idle
+            acquired = getattr(connector, '_acquired', ())
+            idle = getattr(connector, '_conns', {})
+            data["in_use"] = len(acquired)
+            data["idle"] = sum(len(conns) for conns in idle.values()) if isinstance(idle, dict) else 0
+            hosts[host] = data
+        return {"pool_id": self._instance_id, "transport": "aiohttp", "pool_size": self.pool_size, "hosts": hosts}
+
+    def log_stats(self) -> None:
+        for host, data in self.snapshot()["hosts"].items():
+            print(
+                f"📡 [{self._instance_id}] {host}: {data['requests']} requests, "
+                f"{data['new_connections']} new / {data['reused_connections']} reused connections "
+                f"(reuse {data['reuse_ratio']:.0%}), queued {data['queued']}x "
+                f"(avg {data['avg_queue_wait']:.2f}s), limit {data['limit']}"
+            )
+
     async def close(self):
-        """
-        Đóng tất cả HTTP session instances trong pool
-        """
+        """Đóng tất cả sessions (mỗi session sở hữu connector của nó)"""
         async with self._lock:
-            if not self._initialized:
+            self._closed = True
+            if not self._sessions:
                 return
-                
+
             print(f"🔒 [{self._instance_id}] Closing HTTP session pool...")
-            
-            # Đóng tất cả sessions
-            for i, session in enumerate(self._sessions):
+            self.log_stats()
+
+            for host, (session, _) in self._sessions.items():
                 try:
                     await session.close()
-                    print(f"✅ [{self._instance_id}] Session {i+1}/{len(self._sessions)} closed")
                 except Exception as e:
-                    print(f"⚠️ [{self._instance_id}] Error closing session {i+1}: {e}")
-            
+                    print(f"⚠️ [{self._instance_id}] Error closing session for {host}: {e}")
+
             self._sessions.clear()
-            
-            # Đóng connector
-            if self._connector:
-                try:
-                    await self._connector.close()
-                    print(f"✅ [{self._instance_id}] Connector closed")
-                except Exception as e:
-                    print(f"⚠️ [{self._instance_id}] Error closing connector: {e}")
-            
-            # Clear queue
-            while not self._available_sessions.empty():
-                try:
-                    self._available_sessions.get_nowait()
-                except asyncio.QueueEmpty:
-                    break
-                    
-            self._initialized = False
             print(f"🎉 [{self._instance_id}] HTTP session pool closed")
-    
+
     async def __aenter__(self):
         """Context manager entry"""
-        await self.initialize()
         return self
-    
+
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit"""
         await self.close()
-    
-    def get_custom_extractor(self) -> CustomExtractor:
-        """
-        Tạo custom extractor instance
-        
-        Returns:
-            CustomExtractor instance
-        """
-        if self.custom_extractor_factory:
-            return self.custom_extractor_factory()
-        else:
-            return CustomExtractor()
\ No newline at end of file
+
+
+# Các pool đang chạy (cho /health/connection-pools): CrawlerPool và các transport khác
+# (object có snapshot() và thuộc tính closed)
+_active_pools: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+
+def register_active_pool(pool: Any) -> None:
+    _active_pools.add(pool)
+
+
+def active_pool_snapshots() -> List[Dict[str, Any]]:
+    return [pool.snapshot() for pool in list(_active_pools) if not pool.closed]
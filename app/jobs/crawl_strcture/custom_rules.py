@@ -36,17 +36,70 @@ class CustomExtractor:
     def __init__(self):
         self.pre_hooks: List[Callable] = []
         self.post_hooks: List[Callable] = []
+        # Post-hooks gọi dịch vụ ngoài (gallery, geocoding, station, translate)
+        self.network_hooks: List[Callable] = []
+        # Post-hooks chỉ dùng HTML + data (không network, không cache của process) → chạy được trong worker process
+        self.cpu_hooks: List[Callable] = []
     
     def add_pre_hook(self, hook: Callable[[str, Dict[str, Any]], tuple]):
         """Add a pre-hook (sync or async)"""
         self.pre_hooks.append(hook)
     
-    def add_post_hook(self, hook: Callable[[Dict[str, Any]], Dict[str, Any]]):
-        """Add a post-hook (sync or async)"""
+    def add_post_hook(
+        self,
+        hook: Callable[[Dict[str, Any]], Dict[str, Any]],
+        network: bool = False,
+        cpu_bound: bool = False
+    ):
+        """
+        Add a post-hook (sync or async)
+        
+        network=True: hook cần network → bỏ qua khi extract offline (re-extract từ HTML archive)
+        cpu_bound=True: hook sync, chỉ đọc HTML + field của hook trước (không đọc field do network hook ghi)
+            → chạy trước, trong worker process khi bật extract process pool (xem extract_pool.py)
+        """
+        if network and cpu_bound:
+            raise ValueError("A post-hook cannot be both network and cpu_bound")
         self.post_hooks.append(hook)
+        if network:
+            self.network_hooks.append(hook)
+        if cpu_bound:
+            self.cpu_hooks.append(hook)
+    
+    def _active_post_hooks(self, offline: bool, skip_cpu_bound: bool = False) -> List[Callable]:
+        hooks = self.post_hooks
+        if offline:
+            hooks = [hook for hook in hooks if hook not in self.network_hooks]
+        if skip_cpu_bound:
+            hooks = [hook for hook in hooks if hook not in self.cpu_hooks]
+        return hooks
     
-    def extract_with_rules(self, html: str, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Synchronous extraction (for backward compatibility)"""
+    def extract_cpu_bound(self, html: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Pre-hooks + cpu_bound post-hooks (chạy trong worker process)
+        
+        Field do pre-hook thêm (_html, _doc...) bị bỏ khỏi kết quả: không cần gửi về, có thể không pickle được
+        """
+        before = set(data)
+        for hook in self.pre_hooks:
+            try:
+                html, data = hook(html, data)
+            except Exception as e:
+                print(f"❌ Error in pre-hook: {e}")
+        transient = set(data) - before
+        
+        for hook in self.cpu_hooks:
+            try:
+                data = hook(data)
+            except Exception as e:
+                print(f"❌ Error in post-hook: {e}")
+        
+        for field in transient:
+            data.pop(field, None)
+        return data
+    
+    def extract_with_rules(self, html: str, data: Dict[str, Any], offline: bool = False) -> Dict[str, Any]:
+        """Synchronous extraction (for backward compatibility, offline re-extract)"""
         # Run pre-hooks
         for hook in self.pre_hooks:
             try:
@@ -55,7 +108,7 @@ class CustomExtractor:
                 print(f"❌ Error in pre-hook: {e}")
         
         # Run post-hooks
-        for hook in self.post_hooks:
+        for hook in self._active_post_hooks(offline):
             try:
                 data = hook(data)
             except Exception as e:
@@ -63,8 +116,18 @@ class CustomExtractor:
         
         return data
     
-    async def extract_with_rules_async(self, html: str, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Asynchronous extraction supporting both sync and async hooks"""
+    async def extract_with_rules_async(
+        self,
+        html: str,
+        data: Dict[str, Any],
+        offline: bool = False,
+        skip_cpu_bound: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Asynchronous extraction supporting both sync and async hooks
+        
+        skip_cpu_bound=True: data đã qua extract_cpu_bound (worker process), chỉ chạy các hook còn lại
+        """
         # Run pre-hooks
         for hook in self.pre_hooks:
             try:
@@ -76,7 +139,7 @@ class CustomExtractor:
                 print(f"❌ Error in pre-hook: {e}")
         
         # Run post-hooks
-        for hook in self.post_hooks:
+        for hook in self._active_post_hooks(offline, skip_cpu_bound):
             try:
                 if inspect.iscoroutinefunction(hook):
                     data = await hook(data)
@@ -0,0 +1,130 @@
+"""
+Negative cache cho detail URL đã chết + bản đồ redirect
+
+Listing đôi khi vẫn giữ link tới phòng đã đóng: detail trả 404/410 hoặc redirect về trang search.
+Thay vì tải lại (và tính là lỗi cho circuit breaker) mỗi lần chạy:
+- dead:     404/410 hoặc redirect tới trang khớp site_profile.dead_redirect_patterns
+            → lưu DEAD_URL_TTL giây, các lần chạy sau bỏ qua URL (và document cũ được xoá như listing đã đóng)
+- redirect: redirect tới một detail page khác → lưu URL đích REDIRECT_TTL giây, lần sau fetch thẳng URL đích
+            (document vẫn giữ link gốc từ listing)
+
+Lưu trong MongoDB (collection DEAD_URL_COLLECTION, _id = URL), TTL index trên expires_at để Mongo tự xoá
+entry hết hạn → URL được thử lại (phòng mở lại với cùng link).
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.db.mongodb import get_collection
+
+logger = logging.getLogger(__name__)
+
+DEAD_STATUSES = frozenset({404, 410})
+DEAD = "dead"
+REDIRECT = "redirect"
+
+
+class DeadUrlCache:
+    """Dead URL / redirect map của một lần chạy crawl (nạp từ Mongo, ghi lại entry mới)"""
+
+    def __init__(self, collection_name: Optional[str] = None):
+        self.collection_name = collection_name or settings.DEAD_URL_COLLECTION
+        self._dead: Dict[str, str] = {}  # url → lý do
+        self._redirects: Dict[str, str] = {}  # url → URL đích
+        self._index_ready = False
+        self.skipped = 0  # URL bỏ qua nhờ cache
+        self.marked = 0  # URL mới bị đánh dấu dead trong lần chạy này
+        self.redirects_followed = 0  # Fetch thẳng URL đích nhờ redirect map
+
+    async def _ensure_index(self) -> None:
+        if self._index_ready:
+            return
+        try:
+            # expireAfterSeconds=0: Mongo xoá document khi tới thời điểm expires_at
+            await get_collection(self.collection_name).create_index("expires_at", expireAfterSeconds=0)
+        except Exception as e:
+            logger.warning(f"Dead URL TTL index creation failed: {e}")
+        self._index_ready = True
+
+    async def preload(self, urls: List[str]) -> int:
+        """
+        Nạp các entry còn hạn cho `urls` (gọi được nhiều lần theo chunk, entry được cộng dồn)
+
+        Returns:
+            Số URL có entry (dead hoặc redirect) trong lần gọi này
+        """
+        if not urls:
+            return 0
+
+        await self._ensure_index()
+        loaded = 0
+        try:
+            # TTL monitor của Mongo chạy mỗi ~60s → lọc thêm theo expires_at
+            cursor = get_collection(self.collection_name).find({
+                "_id": {"$in": urls},
+                "expires_at": {"$gt": datetime.now(timezone.utc)}
+            })
+            async for doc in cursor:
+                if doc.get("kind") == DEAD:
+                    self._dead[doc["_id"]] = doc.get("reason", "")
+                elif doc.get("kind") == REDIRECT and doc.get("target"):
+                    self._redirects[doc["_id"]] = doc["target"]
+                else:
+                    continue
+                loaded += 1
+        except Exception as e:
+            logger.warning(f"Dead URL cache preload failed: {e}")
+            print(f"⚠️ Dead URL cache preload failed: {e}")
+
+        if loaded:
+            print(f"🪦 Dead URL cache: {loaded}/{len(urls)} URLs known dead or redirected")
+        return loaded
+
+    def is_dead(self, url: str) -> bool:
+        return url in self._dead
+
+    def filter_live(self, urls: List[str]) -> List[str]:
+        """Bỏ các URL đã biết là dead (đếm vào skipped)"""
+        live = [url for url in urls if url not in self._dead]
+        self.skipped += len(urls) - len(live)
+        return live
+
+    def resolve(self, url: str) -> str:
+        """URL cần fetch: URL đích nếu đã biết url redirect, ngược lại chính url"""
+        target = self._redirects.get(url)
+        if target:
+            self.redirects_followed += 1
+            return target
+        return url
+
+    async def mark_dead(self, url: str, reason: str) -> None:
+        if url in self._dead:
+            return
+        self._dead[url] = reason
+        self._redirects.pop(url, None)
+        self.marked += 1
+        print(f"🪦 Dead URL ({reason}): {url}")
+        await self._store(url, {"kind": DEAD, "reason": reason}, settings.DEAD_URL_TTL)
+
+    async def record_redirect(self, url: str, target: str) -> None:
+        if self._redirects.get(url) == target:
+            return
+        self._redirects[url] = target
+        await self._store(url, {"kind": REDIRECT, "target": target}, settings.REDIRECT_TTL)
+
+    async def _store(self, url: str, fields: Dict[str, str], ttl: int) -> None:
+        await self._ensure_index()
+        now = datetime.now(timezone.utc)
+        try:
+            await get_collection(self.collection_name).replace_one(
+                {"_id": url},
+                {**fields, "updated_at": now, "expires_at": now + timedelta(seconds=ttl)},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"Dead URL cache store failed for {url}: {e}")
+
+    def summary(self) -> str:
+        return f"{self.skipped} skipped, {self.marked} newly dead, {self.redirects_followed} redirects followed"
@@ -0,0 +1,111 @@
+"""
+Process pool cho phần CPU của pipeline extract (parse HTML, regex, difflib fuzzy matching)
+
+Mặc định mọi hook chạy trên event loop - cùng thread với FastAPI và socket của crawler, nên một host chỉ dùng
+được một core. Khi bật EXTRACT_PROCESS_POOL_ENABLED, các post-hook đăng ký với cpu_bound=True (HTML vào, field
+ra: get_static_info, field schema, amenities, pricing...) chạy trong worker process:
+
+- HTML gửi sang worker dạng bytes UTF-8 (pickle rẻ), worker tự tạo CustomExtractor bằng factory của site
+  (factory phải là function module-level để pickle được) rồi chạy pre-hooks + cpu hooks theo thứ tự
+- Field do pre-hook thêm (_html, _doc: cây lxml không pickle được) bị bỏ trước khi trả data về
+- Hook còn lại (network: ảnh từ API, geocoding, station, translate; hook dùng cache của process chính như
+  district) chạy tiếp trên event loop như cũ
+- Pool lỗi (worker chết, pickle lỗi) → extract lại trên event loop, pool được tạo lại ở lần sau
+
+Worker dùng start method "spawn": fork một process đang có event loop + thread (motor, scheduler) dễ deadlock.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+from .custom_rules import CustomExtractor
+
+logger = logging.getLogger(__name__)
+
+
+def available_cores() -> int:
+    """Số core process được phép dùng (theo CPU affinity nếu có)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+def _run_cpu_hooks(factory: Callable[[], CustomExtractor], body: bytes, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Chạy trong worker process"""
+    return factory().extract_cpu_bound(body.decode('utf-8'), data)
+
+
+class ExtractPool:
+    """ProcessPoolExecutor dùng chung, tạo lazy ở lần extract đầu tiên"""
+
+    def __init__(self, enabled: bool, workers: int = 0):
+        """
+        Args:
+            enabled: False → mọi hook chạy trên event loop
+            workers: Số worker process (0 = số core khả dụng)
+        """
+        self.enabled = enabled
+        self.workers = workers or available_cores()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.offloaded = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def from_settings(cls) -> 'ExtractPool':
+        return cls(settings.EXTRACT_PROCESS_POOL_ENABLED, settings.EXTRACT_PROCESS_WORKERS)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            print(f"🧮 Extract process pool started ({self.workers} workers)")
+        return self._executor
+
+    async def run(
+        self,
+        factory: Callable[[], CustomExtractor],
+        html: str,
+        data: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Chạy cpu_bound hooks của site trong worker
+
+        Returns:
+            Data sau cpu hooks, None nếu pool lỗi (caller extract trên event loop)
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self._get_executor(), _run_cpu_hooks, factory, html.encode('utf-8'), data
+            )
+        except BrokenProcessPool as e:
+            self.fallbacks += 1
+            logger.warning(f"Extract process pool broken, recreating: {e}")
+            self.shutdown(wait=False)
+            return None
+        except Exception as e:
+            self.fallbacks += 1
+            logger.warning(f"Extract process pool failed, extracting on event loop: {e}")
+            return None
+        self.offloaded += 1
+        return result
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
+
+    def summary(self) -> str:
+        return f"{self.offloaded} pages in {self.workers} worker processes, {self.fallbacks} fallbacks"
+
+
+# Global instance dùng chung cho mọi job trong process
+extract_pool = ExtractPool.from_settings()
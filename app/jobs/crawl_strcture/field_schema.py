@@ -0,0 +1,133 @@
+"""
+Declarative field schema: label dt/th → converter → field đích
+
+Mỗi site khai báo danh sách FieldSpec (module property_data_extractor của site), compile một lần lúc import
+thành FieldSchema. extract() duyệt label map của trang một lần (dt/dd, th/td đã clean) và tra spec bằng dict,
+thay cho chuỗi _get_dt_dd('...') / _get_td('...') viết tay. Method viết tay chỉ còn cho logic phụ thuộc
+field khác (vd: deposit theo monthly_rent) hoặc cần HTML (span, li, ảnh).
+
+Đo thời gian từng field: SCHEMA.profile = True rồi SCHEMA.report().
+"""
+import time
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+
+DT = 'dt'  # <dt>label</dt><dd>value</dd>
+TH = 'th'  # <th>label</th>...<td>value</td>
+_NO_DEFAULT = object()
+
+
+class FieldSpec:
+    """Một field lấy từ label map"""
+
+    __slots__ = ('label', 'field', 'convert', 'default', 'source')
+
+    def __init__(
+        self,
+        label: str,
+        field: Optional[str] = None,
+        convert: Optional[Callable[[str], Any]] = None,
+        default: Any = _NO_DEFAULT,
+        source: str = DT
+    ):
+        """
+        Args:
+            label: Text của dt / th
+            field: Field đích; None → convert trả về dict được merge vào data (một label → nhiều field)
+            convert: text → value, trả None = bỏ qua (không có convert: giữ nguyên text)
+            default: Giá trị khi label không có, text rỗng hoặc convert trả None (không truyền: không set)
+            source: DT hoặc TH
+        """
+        if source not in (DT, TH):
+            raise ValueError(f"Unknown source {source!r} for field spec {label!r}")
+        if field is None and convert is None:
+            raise ValueError(f"Field spec {label!r} needs a field or a converter")
+        self.label = label
+        self.field = field
+        self.convert = convert
+        self.default = default
+        self.source = source
+
+    @property
+    def name(self) -> str:
+        return self.field or self.label
+
+
+class FieldSchema:
+    """Bảng label → FieldSpec của một site"""
+
+    def __init__(self, specs: Iterable[FieldSpec]):
+        self.specs: List[FieldSpec] = list(specs)
+        self._tables: Dict[str, Dict[str, FieldSpec]] = {DT: {}, TH: {}}
+        for spec in self.specs:
+            table = self._tables[spec.source]
+            if spec.label in table:
+                raise ValueError(f"Duplicate field spec for {spec.source} label {spec.label!r}")
+            table[spec.label] = spec
+        self._defaults = [spec for spec in self.specs if spec.default is not _NO_DEFAULT]
+        self.profile = False
+        self.timings: Dict[str, List[float]] = {}  # field → [số lần, tổng giây]
+
+    def _convert(self, spec: FieldSpec, text: str) -> Any:
+        if spec.convert is None:
+            return text
+        try:
+            if not self.profile:
+                return spec.convert(text)
+            start = time.perf_counter()
+            try:
+                return spec.convert(text)
+            finally:
+                stat = self.timings.setdefault(spec.name, [0, 0.0])
+                stat[0] += 1
+                stat[1] += time.perf_counter() - start
+        except Exception as e:
+            print(f"❌ Error in field {spec.name}: {e}")
+            return None
+
+    def extract(
+        self,
+        data: Dict[str, Any],
+        dt_dd: Optional[Mapping[str, str]] = None,
+        th_td: Optional[Mapping[str, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Set các field của schema vào data
+
+        Args:
+            data: Property data
+            dt_dd: dt label → text của dd (đã clean)
+            th_td: th label → text của td (đã clean)
+        """
+        found = set()
+        for source, labels in ((DT, dt_dd), (TH, th_td)):
+            table = self._tables[source]
+            if not table or not labels:
+                continue
+            for label, text in labels.items():
+                spec = table.get(label)
+                if spec is None or not text:
+                    continue
+                value = self._convert(spec, text)
+                if value is None:
+                    continue
+                found.add(spec)
+                if spec.field is None:
+                    data.update(value)
+                else:
+                    data[spec.field] = value
+
+        for spec in self._defaults:
+            if spec not in found:
+                if spec.field is None:
+                    data.update(spec.default)
+                else:
+                    data[spec.field] = spec.default
+        return data
+
+    def report(self) -> str:
+        """Thời gian convert theo field (chậm nhất trước)"""
+        rows = sorted(self.timings.items(), key=lambda item: item[1][1], reverse=True)
+        return '\n'.join(
+            f"{name:<30} {count:>8} calls {total * 1000:>10.2f}ms {total / count * 1e6:>8.1f}µs/call"
+            for name, (count, total) in rows
+        )
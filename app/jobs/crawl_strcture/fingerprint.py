@@ -0,0 +1,86 @@
+"""
+Content fingerprint cho detail pages
+
+Nhiều server không gửi ETag/Last-Modified nên không dùng được conditional GET.
+Fingerprint = hash phần HTML liên quan tới listing (các cặp dt/dd, th/td và các section ảnh
+của từng site). Nếu trùng với fingerprint đã lưu trên document → bỏ qua toàn bộ post-hooks
+(images, geocoding, district, station, translate) và chỉ cập nhật created_date.
+"""
+
+import hashlib
+import logging
+from typing import Dict, List, Optional, Sequence
+
+from app.core.config import settings
+from app.db.mongodb import get_collection
+from app.utils.html_processor_utils import HtmlProcessor
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_FIELD = 'content_fingerprint'
+
+
+class ContentFingerprinter:
+    """Tính và so sánh fingerprint nội dung listing"""
+
+    def __init__(self, image_patterns: Sequence[str] = ()):
+        """
+        Args:
+            image_patterns: Regex (group 1) lấy các section ảnh riêng của site,
+                            vd: biến JS RF_gallery_url của Mitsui, div#album_photos của Tokyu
+        """
+        self.image_patterns = list(image_patterns)
+        self._known: Dict[str, str] = {}
+        self.hits = 0  # Số trang không đổi
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return ' '.join(text.split())
+
+    def compute(self, html: str) -> str:
+        """Hash các block dt/dd, th/td và section ảnh theo thứ tự xuất hiện"""
+        digest = hashlib.sha1(settings.CONTENT_FINGERPRINT_SALT.encode('utf-8'))
+
+        dt_dd, th_td = HtmlProcessor.parse_label_maps(html)
+        for label, content in dt_dd.items():
+            digest.update(f"dt:{label}={self._normalize(content)}\n".encode('utf-8'))
+        for label, content in th_td.items():
+            digest.update(f"th:{label}={self._normalize(content)}\n".encode('utf-8'))
+        for pattern in self.image_patterns:
+            section = HtmlProcessor.find(pattern, html)
+            digest.update(f"img:{self._normalize(section or '')}\n".encode('utf-8'))
+
+        return digest.hexdigest()
+
+    async def preload(self, urls: List[str], collection_name: str) -> int:
+        """
+        Nạp fingerprint đã lưu của các URL sắp crawl (cộng dồn nếu gọi theo từng chunk)
+
+        Returns:
+            Số URL có fingerprint trong lần gọi này
+        """
+        if not urls:
+            return 0
+
+        loaded = 0
+
+        try:
+            cursor = get_collection(collection_name).find(
+                {"link": {"$in": urls}, FINGERPRINT_FIELD: {"$exists": True}},
+                projection={"link": 1, FINGERPRINT_FIELD: 1}
+            )
+            async for doc in cursor:
+                self._known[doc["link"]] = doc[FINGERPRINT_FIELD]
+                loaded += 1
+        except Exception as e:
+            logger.warning(f"Fingerprint preload failed: {e}")
+            print(f"⚠️ Fingerprint preload failed: {e}")
+
+        print(f"🧬 Fingerprints: {loaded}/{len(urls)} URLs have a stored fingerprint")
+        return loaded
+
+    def is_unchanged(self, url: str, fingerprint: Optional[str]) -> bool:
+        if fingerprint and self._known.get(url) == fingerprint:
+            self.hits += 1
+            return True
+        return False
@@ -2,56 +2,77 @@
 Simple helper for multi-page crawling
 Giúp tái sử dụng logic chung: collect URLs từ nhiều pages và crawl chúng
 """
-from typing import List, Tuple, Optional, Callable, Any
-from app.jobs.crawl_strcture.index import crawl_pages
+from typing import List, Tuple, Optional, Callable, Any, Awaitable, AsyncIterator, Dict
+from app.jobs.crawl_strcture.index import crawl_pages, crawl_pages_streaming
+from app.jobs.crawl_strcture.listing_fetcher import ListingFetcher, DiscoveryIncomplete
+from app.jobs.crawl_strcture.listing_page_cache import ListingPageCache
+from app.jobs.crawl_strcture.site_profile import SiteProfile, DEFAULT_SITE_PROFILE
 from app.core.config import settings
 
 async def crawl_multi_pages(
     site_name: str,
-    fetch_page_urls_func: Callable[[int, dict, bool], Tuple[List[str], Optional[int]]],
+    fetch_page_urls_func: Callable[[int, ListingFetcher, bool], Awaitable[Tuple[List[str], Optional[int]]]],
     default_num_pages: int,
     id_mongo: str,
     collection_name: str,
-    custom_extractor_factory: Any
+    custom_extractor_factory: Any,
+    site_profile: Optional[SiteProfile] = None
 ):
     """
     Helper function để crawl nhiều pages
     
     Args:
         site_name: Tên site (để log)
-        fetch_page_urls_func: Function để fetch URLs từ 1 page
-            - Input: (page_number, headers, detect_max_pages)
+        fetch_page_urls_func: Async function để fetch URLs từ 1 page
+            - Input: (page_number, fetcher, detect_max_pages)
             - Output: (list_of_urls, max_pages)
         default_num_pages: Số pages mặc định nếu không detect được
         id_mongo: ID mongo
         collection_name: Tên collection
         custom_extractor_factory: Factory để tạo custom extractor
+        site_profile: Cấu hình fetch/extract của site (fingerprint, end marker, ...)
     """
     print(f"🚀 Starting {site_name} crawl...")
     
     headers = {"User-Agent": settings.CRAWLER_USER_AGENT}
-    all_urls = []
-    
-    # First page: fetch URLs and detect max pages
-    print("📄 Fetching page 1 and detecting pagination...")
-    page_urls, detected_max_pages = fetch_page_urls_func(1, headers, True)
-    all_urls.extend(page_urls)
+    site_profile = site_profile or DEFAULT_SITE_PROFILE
+    transport = site_profile.transport
+    # URL → signature của dòng listing, site parser ghi trong lúc tải trang listing
+    row_signatures: Dict[str, str] = {}
+    # Hash + URL của từng trang listing từ lần chạy trước → trang không đổi thì không parse lại
+    page_cache = ListingPageCache(site_name) if settings.LISTING_PAGE_CACHE_ENABLED else None
     
-    # Use detected max pages or fallback to default
-    max_pages = detected_max_pages if detected_max_pages else default_num_pages
-    print(f"📊 Total pages to crawl: {max_pages}")
+    if settings.DISCOVERY_STREAMING:
+        # Producer/consumer: detail workers chạy ngay khi trang listing đầu tiên về
+        print("🎯 Streaming mode: crawling property pages while discovering URLs...")
+        await crawl_pages_streaming(
+            _discover_urls(headers, transport, fetch_page_urls_func, default_num_pages, row_signatures, page_cache),
+            batch_size=settings.BATCH_SIZE,
+            id_mongo=id_mongo,
+            collection_name=collection_name,
+            custom_extractor_factory=custom_extractor_factory,
+            site_profile=site_profile,
+            row_signatures=row_signatures
+        )
+        print(f"🎉 {site_name} crawl completed!")
+        return
     
-    # Fetch remaining pages
-    for page in range(2, max_pages + 1):
-        page_urls, _ = fetch_page_urls_func(page, headers, False)
-        all_urls.extend(page_urls)
+    all_urls = []
+    async with ListingFetcher(headers, transport=transport, row_signatures=row_signatures, page_cache=page_cache) as fetcher:
+        async for page_urls in _iter_listing_pages(fetcher, fetch_page_urls_func, default_num_pages):
+            all_urls.extend(page_urls)
+        failed_pages = fetcher.failed_pages
     
     print(f"✅ Collected {len(all_urls)} total URLs")
+    print(f"📊 Discovery: {fetcher.summary()}")
     
     if not all_urls:
         print("⚠️ No URLs found to crawl")
         return
     
+    if failed_pages:
+        print(f"⚠️ {failed_pages} listing pages failed, closed listings will not be removed this run")
+    
     # Crawl all collected URLs
     print(f"🎯 Starting to crawl {len(all_urls)} property pages...")
     await crawl_pages(
@@ -59,7 +80,56 @@ async def crawl_multi_pages(
         batch_size=settings.BATCH_SIZE,
         id_mongo=id_mongo,
         collection_name=collection_name,
-        custom_extractor_factory=custom_extractor_factory
+        custom_extractor_factory=custom_extractor_factory,
+        site_profile=site_profile,
+        remove_missing=not failed_pages,
+        row_signatures=row_signatures
     )
     
-    print(f"🎉 {site_name} crawl completed!")
\ No newline at end of file
+    print(f"🎉 {site_name} crawl completed!")
+
+
+async def _iter_listing_pages(
+    fetcher: ListingFetcher,
+    fetch_page_urls_func: Callable[[int, ListingFetcher, bool], Awaitable[Tuple[List[str], Optional[int]]]],
+    default_num_pages: int
+) -> AsyncIterator[List[str]]:
+    """Yield URLs của từng trang listing: trang 1 (detect số trang) rồi các trang còn lại đồng thời"""
+    # First page: fetch URLs and detect max pages
+    print("📄 Fetching page 1 and detecting pagination...")
+    page_urls, detected_max_pages = await fetcher.fetch_page(fetch_page_urls_func, 1, True)
+    yield page_urls
+    
+    # Use detected max pages or fallback to default
+    max_pages = detected_max_pages if detected_max_pages else default_num_pages
+    print(f"📊 Total pages to crawl: {max_pages}")
+    
+    # Fetch remaining pages concurrently (LISTING_CONCURRENCY trang cùng lúc)
+    async for page, page_urls in fetcher.iter_pages(fetch_page_urls_func, range(2, max_pages + 1)):
+        yield page_urls
+
+
+async def _discover_urls(
+    headers: Dict[str, str],
+    transport: str,
+    fetch_page_urls_func: Callable[[int, ListingFetcher, bool], Awaitable[Tuple[List[str], Optional[int]]]],
+    default_num_pages: int,
+    row_signatures: Optional[Dict[str, str]] = None,
+    page_cache: Optional[ListingPageCache] = None
+) -> AsyncIterator[List[str]]:
+    """
+    URL chunks cho crawl_pages_streaming
+    
+    Raises:
+        DiscoveryIncomplete: Có trang listing tải thất bại (raise sau khi đã yield hết các trang tải được)
+    """
+    total = 0
+    async with ListingFetcher(headers, transport=transport, row_signatures=row_signatures, page_cache=page_cache) as fetcher:
+        async for page_urls in _iter_listing_pages(fetcher, fetch_page_urls_func, default_num_pages):
+            total += len(page_urls)
+            yield page_urls
+        
+        print(f"✅ Collected {total} total URLs")
+        print(f"📊 Discovery: {fetcher.summary()}")
+        if fetcher.failed_pages:
+            raise DiscoveryIncomplete(f"{fetcher.failed_pages} listing pages failed")
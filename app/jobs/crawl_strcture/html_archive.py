@@ -0,0 +1,143 @@
+"""
+Archive HTML detail page (nén, content-addressed) để re-extract offline
+
+Mỗi trang được extract (không tính 304 / fingerprint không đổi) được lưu:
+- File: HTML_ARCHIVE_DIR/<sha256[:2]>/<sha256[2:4]>/<sha256>.html.zst (zstd level HTML_ARCHIVE_LEVEL;
+  entry .html.gz cũ vẫn đọc được) - cùng nội dung thì chỉ lưu một lần
+- Index: collection HTML_ARCHIVE_COLLECTION, một document cho mỗi (url, hash) = một version của trang
+
+Sau khi sửa property_data_extractor của site, chạy reextract để extract lại từ archive (không tải lại site).
+"""
+
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import zstandard
+
+from app.core.config import settings
+from app.db.mongodb import get_collection
+
+logger = logging.getLogger(__name__)
+
+CODEC_ZSTD = "zstd"
+CODEC_GZIP = "gzip"  # Chỉ để đọc entry cũ (ghi khi zstandard chưa là dependency bắt buộc)
+_EXTENSIONS = {CODEC_ZSTD: ".html.zst", CODEC_GZIP: ".html.gz"}
+
+
+def compress(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=settings.HTML_ARCHIVE_LEVEL).compress(data)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class HtmlArchive:
+    """Kho HTML nén theo hash nội dung + index (url, version) trong MongoDB"""
+
+    def __init__(self, site: str, root: Optional[str] = None, collection_name: Optional[str] = None):
+        """
+        Args:
+            site: Tên site (SiteProfile.name), để lọc khi re-extract
+            root: Thư mục archive (default: settings.HTML_ARCHIVE_DIR)
+            collection_name: Collection index (default: settings.HTML_ARCHIVE_COLLECTION)
+        """
+        self.site = site
+        self.root = root or settings.HTML_ARCHIVE_DIR
+        self.collection_name = collection_name or settings.HTML_ARCHIVE_COLLECTION
+        self.codec = CODEC_ZSTD
+        self._index_ready = False
+        self.stored = 0  # Version mới (file mới được ghi)
+        self.deduplicated = 0  # Nội dung đã có trong archive
+        self.bytes_written = 0
+
+    def _path(self, digest: str, codec: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest + _EXTENSIONS[codec])
+
+    async def _ensure_index(self) -> None:
+        if self._index_ready:
+            return
+        try:
+            collection = get_collection(self.collection_name)
+            await collection.create_index([("url", 1), ("hash", 1)], unique=True)
+            await collection.create_index([("site", 1), ("url", 1), ("fetched_at", -1)])
+        except Exception as e:
+            logger.warning(f"HTML archive index creation failed: {e}")
+        self._index_ready = True
+
+    def _write(self, digest: str, body: bytes) -> int:
+        """Ghi file nếu chưa có (ghi ra file tạm rồi rename → không để lại file dở)"""
+        path = self._path(digest, self.codec)
+        if os.path.exists(path):
+            return 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = compress(body)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)
+        return len(compressed)
+
+    async def store(self, url: str, html: str) -> Optional[str]:
+        """
+        Lưu một version của trang (không raise - lỗi archive không làm hỏng lần crawl)
+
+        Returns:
+            Hash nội dung, None nếu lỗi
+        """
+        body = html.encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()
+        try:
+            # Nén + ghi file trong thread, không chặn event loop
+            written = await asyncio.to_thread(self._write, digest, body)
+            if written:
+                self.stored += 1
+                self.bytes_written += written
+            else:
+                self.deduplicated += 1
+
+            await self._ensure_index()
+            now = datetime.now(timezone.utc)
+            await get_collection(self.collection_name).update_one(
+                {"url": url, "hash": digest},
+                {
+                    "$set": {"site": self.site, "codec": self.codec, "size": len(body), "fetched_at": now},
+                    "$setOnInsert": {"first_fetched_at": now},
+                },
+                upsert=True
+            )
+            return digest
+        except Exception as e:
+            logger.warning(f"HTML archive store failed for {url}: {e}")
+            return None
+
+    async def latest(self, urls: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Version mới nhất của mỗi URL: url → document index"""
+        if not urls:
+            return {}
+        cursor = get_collection(self.collection_name).aggregate([
+            {"$match": {"site": self.site, "url": {"$in": urls}}},
+            {"$sort": {"fetched_at": -1}},
+            {"$group": {"_id": "$url", "doc": {"$first": "$$ROOT"}}},
+        ])
+        return {entry["_id"]: entry["doc"] async for entry in cursor}
+
+    def load(self, entry: Dict[str, Any]) -> str:
+        """
+        Đọc HTML của một version (blocking - gọi trong thread khi xử lý nhiều trang)
+        
+        Raises FileNotFoundError khi index còn nhưng file đã mất (vd: thư mục archive không nằm trên volume)
+        """
+        codec = entry.get("codec", CODEC_GZIP)
+        with open(self._path(entry["hash"], codec), 'rb') as f:
+            return decompress(f.read(), codec).decode('utf-8')
+
+    def summary(self) -> str:
+        return f"{self.stored} new versions ({self.bytes_written / 1024:.0f}KB), {self.deduplicated} unchanged, codec {self.codec}"
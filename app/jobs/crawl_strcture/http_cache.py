@@ -0,0 +1,111 @@
+"""
+Conditional-GET cache cho detail pages (ETag / Last-Modified)
+
+Lưu validators của mỗi URL vào MongoDB (collection HTTP_CACHE_COLLECTION, _id = URL).
+Lần crawl sau gửi If-None-Match / If-Modified-Since; server trả 304 thì bỏ qua toàn bộ
+pipeline extract và chỉ cập nhật created_date của document.
+
+Validators của response 200 đi theo kết quả crawl (field HTTP_VALIDATORS_FIELD) và chỉ được lưu sau khi
+document đã được ghi (_BatchSaver): nếu lưu ngay lúc fetch, trang bị bỏ qua khi save (thiếu station / toạ độ /
+ảnh do API lỗi tạm thời, run dừng trước khi flush) sẽ nhận 304 mãi mãi với document cũ.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.db.mongodb import get_collection
+
+logger = logging.getLogger(__name__)
+
+# Field tạm trong property_data: {"etag": ..., "last_modified": ...}, bị bỏ trước khi lưu document
+HTTP_VALIDATORS_FIELD = "_http_validators"
+
+
+def validators_from_headers(headers) -> Dict[str, str]:
+    """ETag / Last-Modified của response (rỗng nếu server không gửi)"""
+    validators = {"etag": headers.get('ETag'), "last_modified": headers.get('Last-Modified')}
+    return {k: v for k, v in validators.items() if v}
+
+
+class HttpValidatorCache:
+    """Validators (ETag / Last-Modified) theo URL cho một lần chạy crawl"""
+
+    def __init__(self, collection_name: Optional[str] = None):
+        self.collection_name = collection_name or settings.HTTP_CACHE_COLLECTION
+        self._validators: Dict[str, Dict[str, str]] = {}
+        self.hits = 0  # Số lần server trả 304
+
+    async def preload(self, urls: List[str], data_collection_name: str) -> int:
+        """
+        Nạp validators cho các URL đã có document trong data collection
+
+        Chỉ gửi conditional request khi đã có document để refresh - URL chưa từng được lưu
+        (vd: lần trước bị bỏ qua vì thiếu field) luôn được tải đầy đủ.
+        Có thể gọi nhiều lần (theo từng chunk URL), validators được cộng dồn.
+
+        Returns:
+            Số URL có validators trong lần gọi này
+        """
+        if not urls:
+            return 0
+
+        loaded = 0
+
+        try:
+            existing_links = await get_collection(data_collection_name).distinct("link", {"link": {"$in": urls}})
+            if not existing_links:
+                return 0
+
+            cursor = get_collection(self.collection_name).find({"_id": {"$in": existing_links}})
+            async for doc in cursor:
+                validators = {k: doc[k] for k in ("etag", "last_modified") if doc.get(k)}
+                if validators:
+                    self._validators[doc["_id"]] = validators
+                    loaded += 1
+        except Exception as e:
+            logger.warning(f"HTTP cache preload failed: {e}")
+            print(f"⚠️ HTTP cache preload failed: {e}")
+
+        print(f"🗂️ HTTP cache: {loaded}/{len(urls)} URLs have validators")
+        return loaded
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Headers If-None-Match / If-Modified-Since cho URL (rỗng nếu chưa có validators)"""
+        validators = self._validators.get(url)
+        if not validators:
+            return {}
+
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+
+    async def store(self, url: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        """Lưu validators từ response 200 của document đã được ghi (bỏ qua nếu server không gửi validators)"""
+        if not etag and not last_modified:
+            return
+
+        try:
+            await get_collection(self.collection_name).update_one(
+                {"_id": url},
+                {"$set": {
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "updated_at": time.time()
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"HTTP cache store failed for {url}: {e}")
+
+    async def store_many(self, validators_by_url: Dict[str, Dict[str, str]]) -> None:
+        """Lưu validators của nhiều URL (các link vừa được ghi vào data collection)"""
+        await asyncio.gather(*(
+            self.store(url, validators.get("etag"), validators.get("last_modified"))
+            for url, validators in validators_by_url.items()
+        ))
@@ -1,94 +1,201 @@
-
+import asyncio
 from datetime import datetime
-from typing import List, Optional, Callable, Dict, Any
+from typing import List, Optional, Callable, Dict, Any, AsyncIterator, Set
 
 from .property_crawler import EnhancedPropertyCrawler
 from .custom_rules import CustomExtractor
+from .http_cache import HttpValidatorCache, HTTP_VALIDATORS_FIELD
+from .fingerprint import ContentFingerprinter
+from .dead_url_cache import DeadUrlCache
+from .html_archive import HtmlArchive
+from .extract_pool import extract_pool
+from .url_canonicalizer import UrlFrontier
+from .listing_delta import ListingDelta
+from .listing_fetcher import DiscoveryIncomplete
+from .site_profile import SiteProfile, DEFAULT_SITE_PROFILE
 from app.utils.save_utils import SaveUtils
+from app.core.config import settings
 
-async def crawl_pages(
-    urls: List[str] = [], 
-    batch_size: int = 10, 
-    id_mongo: int = 0, 
-    collection_name: str = 'table_page',
-    custom_extractor_factory: Optional[Callable[[], CustomExtractor]] = None,
-    max_consecutive_failures: int = 30,
-):
-    """
-    Crawl multiple property pages with batch-wise MongoDB saving
-    
-    Args:
-        urls: List of URLs to crawl
-        batch_size: Number of URLs to crawl simultaneously
-        id_mongo: MongoDB document ID (starting point)
-        collection_name: MongoDB collection name
-        custom_extractor_factory: Optional factory function to create custom extractor
-        max_consecutive_failures: Maximum consecutive failures before stopping (default: 30)
-    """
-    # Filter urls
-    urls, available_ids = await SaveUtils.filter_urls(urls, collection_name, id_mongo)
-    
-    start = datetime.now()
 
-    # Tracking variables
-    total_saved = 0
-    saved_batches = []
-    id_index = 0  # Index để theo dõi vị trí trong available_ids
-    
-    # Callback function để lưu sau mỗi batch
-    async def save_batch_to_mongo(batch_results: List[Dict[str, Any]], batch_num: int, total_batches: int):
-        nonlocal id_index, total_saved
-        
+class _BatchSaver:
+    """Callback on_batch_complete: lưu từng batch vào MongoDB và theo dõi ID đã dùng"""
+
+    def __init__(
+        self,
+        collection_name: str,
+        available_ids: Optional[List[int]] = None,
+        listing_delta: Optional[ListingDelta] = None,
+        http_cache: Optional[HttpValidatorCache] = None
+    ):
+        self.collection_name = collection_name
+        self.listing_delta = listing_delta
+        # Validators (ETag / Last-Modified) chỉ được lưu cho link đã ghi / refresh thành công
+        self.http_cache = http_cache
+        # Có thể được nối thêm trong lúc crawl (streaming discovery cấp ID theo từng chunk)
+        self.available_ids: List[int] = available_ids if available_ids is not None else []
+        self.total_saved = 0
+        self.total_not_modified = 0
+        self.saved_batches: List[Dict[str, Any]] = []
+        self.id_index = 0  # Index để theo dõi vị trí trong available_ids
+        self.first_save_at: Optional[datetime] = None
+
+    async def __call__(self, batch_results: List[Dict[str, Any]], batch_num: int, total_batches: int):
+        # total_batches = 0 khi chưa biết tổng số URL (streaming)
+        batch_label = f"{batch_num}/{total_batches or '?'}"
+
         try:
+            # Field tạm, không lưu vào document
+            validators = {}
+            for r in batch_results:
+                if isinstance(r, dict) and (link_validators := r.pop(HTTP_VALIDATORS_FIELD, None)):
+                    validators[r.get('link')] = link_validators
+            
+            # 304 Not Modified / fingerprint không đổi: chỉ cập nhật created_date, không ghi đè document
+            not_modified_links = [r['link'] for r in batch_results if r.get('not_modified')]
+            if not_modified_links:
+                self.total_not_modified += await SaveUtils.touch_urls(not_modified_links, self.collection_name)
+                if self.listing_delta:
+                    await self.listing_delta.refresh(not_modified_links, self.collection_name)
+                # Document đã lưu khớp nội dung trang (fingerprint không đổi)
+                await self._store_validators(validators, not_modified_links)
+                batch_results = [r for r in batch_results if not r.get('not_modified')]
+                if not batch_results:
+                    return
+
             # Lấy slice của available_ids cho batch này
             batch_size = len(batch_results)
-            batch_ids = available_ids[id_index:id_index + batch_size] if id_index < len(available_ids) else []
-            
+            ids = self.available_ids
+            batch_ids = ids[self.id_index:self.id_index + batch_size] if self.id_index < len(ids) else []
+
+            if self.listing_delta:
+                for r in batch_results:
+                    self.listing_delta.stamp(r)
+
             # Lưu batch vào MongoDB
+            saved_links: List[str] = []
             result = await SaveUtils.save_db_results(
-                batch_results, 
-                available_ids=batch_ids, 
-                collection_name=collection_name
+                batch_results,
+                available_ids=batch_ids,
+                collection_name=self.collection_name,
+                saved_links=saved_links
             )
-            
+            await self._store_validators(validators, saved_links)
+
             if result:
                 saved_count = len(batch_results)
-                total_saved += saved_count
-                
+                self.total_saved += saved_count
+                if self.first_save_at is None:
+                    self.first_save_at = datetime.now()
+
                 # Hiển thị ID range
                 if batch_ids:
                     id_range = f"{min(batch_ids)} - {max(batch_ids)}" if len(batch_ids) > 1 else str(batch_ids[0])
                 else:
                     id_range = "auto-generated"
-                
-                saved_batches.append({
+
+                self.saved_batches.append({
                     'batch_num': batch_num,
                     'saved_count': saved_count,
                     'id_range': id_range
                 })
-                
-                print(f"✅ Batch {batch_num}/{total_batches}: Saved {saved_count} records (IDs: {id_range})")
-                
+
+                print(f"✅ Batch {batch_label}: Saved {saved_count} records (IDs: {id_range})")
+
                 # Cập nhật id_index cho batch tiếp theo
-                id_index += saved_count
+                self.id_index += saved_count
             else:
-                print(f"⚠️ Batch {batch_num}/{total_batches}: No records saved")
-                
+                print(f"⚠️ Batch {batch_label}: No records saved")
+
         except Exception as e:
-            print(f"❌ Error saving batch {batch_num}/{total_batches} to MongoDB: {e}")
+            print(f"❌ Error saving batch {batch_label} to MongoDB: {e}")
+
+    async def _store_validators(self, validators: Dict[str, Dict[str, str]], links: List[str]) -> None:
+        if self.http_cache and validators and links:
+            await self.http_cache.store_many({link: validators[link] for link in links if link in validators})
+
+
+async def crawl_pages(
+    urls: List[str] = [],
+    batch_size: int = 10,
+    id_mongo: int = 0,
+    collection_name: str = 'table_page',
+    custom_extractor_factory: Optional[Callable[[], CustomExtractor]] = None,
+    max_consecutive_failures: int = 30,
+    site_profile: Optional[SiteProfile] = None,
+    remove_missing: bool = True,
+    row_signatures: Optional[Dict[str, str]] = None,
+):
+    """
+    Crawl multiple property pages with batch-wise MongoDB saving
 
-    crawler = EnhancedPropertyCrawler(custom_extractor_factory)
+    Args:
+        urls: List of URLs to crawl
+        batch_size: Number of URLs to crawl simultaneously
+        id_mongo: MongoDB document ID (starting point)
+        collection_name: MongoDB collection name
+        custom_extractor_factory: Optional factory function to create custom extractor
+        max_consecutive_failures: Số lỗi liên tiếp trước khi circuit breaker của host mở (default: 30)
+        site_profile: Cấu hình fetch/extract của site (fingerprint, end marker, ...)
+        remove_missing: Xoá các document không có trong `urls` (False nếu danh sách URL không đầy đủ)
+        row_signatures: URL → signature của dòng listing; dòng không đổi thì không tải lại detail page
+    """
+    site_profile = site_profile or DEFAULT_SITE_PROFILE
+
+    # Canonicalize + bỏ trùng trước khi lọc: mỗi phòng chỉ được fetch một lần
+    frontier = UrlFrontier(site_profile.canonicalizer)
+    urls = frontier.add(urls)
+
+    # Negative cache: bỏ URL đã biết là dead trước khi lọc → document cũ của chúng bị xoá như listing đã đóng
+    dead_urls = None
+    if settings.DEAD_URL_CACHE_ENABLED:
+        dead_urls = DeadUrlCache()
+        await dead_urls.preload(urls)
+        urls = dead_urls.filter_live(urls)
+
+    # Filter urls
+    urls, available_ids = await SaveUtils.filter_urls(urls, collection_name, id_mongo, remove_missing=remove_missing)
+
+    # Listing delta: URL hết hạn nhưng dòng listing không đổi → chỉ refresh created_date
+    listing_delta = None
+    if settings.LISTING_DELTA_ENABLED and row_signatures is not None:
+        listing_delta = ListingDelta(row_signatures, site_profile.canonicalizer)
+        urls = await listing_delta.split(urls, collection_name)
+
+    start = datetime.now()
+
+    # Conditional GET: nạp ETag/Last-Modified của các URL đã có trong collection
+    http_cache = None
+    if settings.HTTP_CACHE_ENABLED:
+        http_cache = HttpValidatorCache()
+        await http_cache.preload(urls, collection_name)
+
+    # Content fingerprint: bỏ qua extract cho trang có nội dung listing không đổi
+    fingerprinter = None
+    if settings.CONTENT_FINGERPRINT_ENABLED:
+        fingerprinter = ContentFingerprinter(site_profile.fingerprint_image_patterns)
+        await fingerprinter.preload(urls, collection_name)
+
+    # HTML của các trang được extract → archive để re-extract offline
+    html_archive = HtmlArchive(site_profile.name) if settings.HTML_ARCHIVE_ENABLED else None
+
+    # Callback để lưu sau mỗi batch
+    saver = _BatchSaver(collection_name, available_ids, listing_delta, http_cache)
+
+    crawler = EnhancedPropertyCrawler(
+        custom_extractor_factory, http_cache=http_cache, fingerprinter=fingerprinter,
+        site_profile=site_profile, dead_urls=dead_urls, html_archive=html_archive
+    )
     print("\n=== 😶‍🌫️☀️😁😂😑🤷‍♂️ ===")
-    
+
     try:
         # Crawl với callback để lưu sau mỗi batch
         await crawler.crawl_multiple_properties(
-            urls, 
+            urls,
             batch_size=batch_size,
-            on_batch_complete=save_batch_to_mongo,
+            on_batch_complete=saver,
             max_consecutive_failures=max_consecutive_failures
         )
-        
+
     except Exception as e:
         print(f"❌ Error during crawling: {e}")
         # In summary ngay cả khi có lỗi
@@ -97,8 +204,8 @@ async def crawl_pages(
         print(f"""
         === Summary (Interrupted) ===
         Total URLs: {len(urls)}
-        Total Saved: {total_saved} records
-        Batches Saved: {len(saved_batches)}
+        Total Saved: {saver.total_saved} records
+        Batches Saved: {len(saver.saved_batches)}
         Start: {start:%Y%m%d_%H%M%S} | End: {end:%Y%m%d_%H%M%S} | 🕒 Duration: {duration}
         """)
         return
@@ -108,9 +215,154 @@ async def crawl_pages(
 
     print(f"""
         === Summary ===
-        Total URLs: {len(urls)}
-        Total Saved: {total_saved} records to '{collection_name}'
-        Batches Completed: {len(saved_batches)}
-        Available IDs Used: {id_index}/{len(available_ids)}
+        Total URLs: {len(urls)} (frontier: {frontier.summary()})
+        Total Saved: {saver.total_saved} records to '{collection_name}'
+        Not Modified (304 / same fingerprint): {saver.total_not_modified} records refreshed
+        Dead URLs: {dead_urls.summary() if dead_urls else 'disabled'}
+        Listing delta: {listing_delta.summary() if listing_delta else 'disabled'}
+        HTML archive: {html_archive.summary() if html_archive else 'disabled'}
+        Extract process pool: {extract_pool.summary() if extract_pool.enabled else 'disabled'}
+        Batches Completed: {len(saver.saved_batches)}
+        Available IDs Used: {saver.id_index}/{len(available_ids)}
         Start: {start:%Y%m%d_%H%M%S} | End: {end:%Y%m%d_%H%M%S} | 🕒 Duration: {duration}
-    """)
\ No newline at end of file
+    """)
+
+
+async def crawl_pages_streaming(
+    url_chunks: AsyncIterator[List[str]],
+    batch_size: int = 10,
+    id_mongo: int = 0,
+    collection_name: str = 'table_page',
+    custom_extractor_factory: Optional[Callable[[], CustomExtractor]] = None,
+    max_consecutive_failures: int = 30,
+    site_profile: Optional[SiteProfile] = None,
+    row_signatures: Optional[Dict[str, str]] = None,
+):
+    """
+    Crawl song song với discovery: URL của mỗi trang listing được lọc và đưa ngay vào queue,
+    các worker crawl detail page bắt đầu chạy từ trang listing đầu tiên.
+
+    Bước xoá các URL không còn thấy chỉ chạy khi discovery hoàn tất (url_chunks kết thúc
+    không lỗi). Nếu url_chunks raise (vd: DiscoveryIncomplete) thì các URL đã tìm được
+    vẫn được crawl nhưng không xoá gì.
+
+    Args:
+        url_chunks: Async iterator trả về từng nhóm URL (thường là một trang listing)
+        row_signatures: URL → signature của dòng listing, được ghi trước khi chunk tương ứng được yield
+        Các tham số còn lại: như crawl_pages
+    """
+    site_profile = site_profile or DEFAULT_SITE_PROFILE
+    start = datetime.now()
+
+    http_cache = HttpValidatorCache() if settings.HTTP_CACHE_ENABLED else None
+    fingerprinter = ContentFingerprinter(site_profile.fingerprint_image_patterns) if settings.CONTENT_FINGERPRINT_ENABLED else None
+    dead_urls = DeadUrlCache() if settings.DEAD_URL_CACHE_ENABLED else None
+    listing_delta = (
+        ListingDelta(row_signatures, site_profile.canonicalizer)
+        if settings.LISTING_DELTA_ENABLED and row_signatures is not None else None
+    )
+
+    html_archive = HtmlArchive(site_profile.name) if settings.HTML_ARCHIVE_ENABLED else None
+
+    saver = _BatchSaver(collection_name, listing_delta=listing_delta, http_cache=http_cache)
+    crawler = EnhancedPropertyCrawler(
+        custom_extractor_factory, http_cache=http_cache, fingerprinter=fingerprinter,
+        site_profile=site_profile, dead_urls=dead_urls, html_archive=html_archive
+    )
+
+    queue: asyncio.Queue = asyncio.Queue()
+    # Seen-set của run: URL canonical, bỏ trùng giữa các trang listing (phân trang bị đẩy khi có listing mới)
+    frontier = UrlFrontier(site_profile.canonicalizer)
+    reserved_ids: Set[int] = set()
+    queued_count = 0
+    discovery_complete = False
+
+    async def produce():
+        nonlocal queued_count, discovery_complete
+        try:
+            async for chunk in url_chunks:
+                chunk = frontier.add(chunk)
+                if not chunk:
+                    continue
+
+                if dead_urls:
+                    await dead_urls.preload(chunk)
+                    chunk = dead_urls.filter_live(chunk)
+                    if not chunk:
+                        continue
+
+                # Freshness filter theo chunk, chưa xoá gì vì chưa có danh sách đầy đủ
+                new_urls, ids = await SaveUtils.filter_urls(
+                    chunk, collection_name, id_mongo,
+                    remove_missing=False,
+                    reserved_ids=reserved_ids
+                )
+                reserved_ids.update(ids)
+                saver.available_ids.extend(ids)
+
+                if listing_delta:
+                    new_urls = await listing_delta.split(new_urls, collection_name)
+
+                if http_cache:
+                    await http_cache.preload(new_urls, collection_name)
+                if fingerprinter:
+                    await fingerprinter.preload(new_urls, collection_name)
+
+                for url in new_urls:
+                    queue.put_nowait(url)
+                queued_count += len(new_urls)
+            discovery_complete = True
+        except DiscoveryIncomplete as e:
+            print(f"⚠️ Discovery incomplete, closed listings will not be removed: {e}")
+        except Exception as e:
+            print(f"❌ Error during URL discovery: {e}")
+        finally:
+            # Sentinel: worker dừng khi queue cạn
+            queue.put_nowait(None)
+
+    print("\n=== 😶‍🌫️☀️😁😂😑🤷‍♂️ ===")
+    producer = asyncio.create_task(produce())
+
+    try:
+        await crawler.crawl_from_queue(
+            queue,
+            batch_size=batch_size,
+            on_batch_complete=saver,
+            max_consecutive_failures=max_consecutive_failures
+        )
+        await crawler.process_retry_queue(
+            batch_size=batch_size,
+            on_batch_complete=saver,
+            max_consecutive_failures=max_consecutive_failures
+        )
+    except Exception as e:
+        print(f"❌ Error during crawling: {e}")
+        discovery_complete = False
+    finally:
+        if not producer.done():
+            producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+
+    removed = 0
+    if discovery_complete:
+        # URL dead (kể cả vừa phát hiện trong lần chạy này) được xoá như listing đã đóng
+        live_urls = [url for url in frontier.urls if not dead_urls.is_dead(url)] if dead_urls else frontier.urls
+        removed = await SaveUtils.remove_missing_urls(live_urls, collection_name)
+
+    end = datetime.now()
+    first_save = f"{saver.first_save_at - start}" if saver.first_save_at else "-"
+
+    print(f"""
+        === Summary (Streaming) ===
+        Discovered URLs: {frontier.summary()} ({'complete' if discovery_complete else 'INCOMPLETE'})
+        Queued URLs: {queued_count}
+        Total Saved: {saver.total_saved} records to '{collection_name}'
+        Not Modified (304 / same fingerprint): {saver.total_not_modified} records refreshed
+        Removed (closed listings): {removed}
+        Dead URLs: {dead_urls.summary() if dead_urls else 'disabled'}
+        Listing delta: {listing_delta.summary() if listing_delta else 'disabled'}
+        HTML archive: {html_archive.summary() if html_archive else 'disabled'}
+        Extract process pool: {extract_pool.summary() if extract_pool.enabled else 'disabled'}
+        Available IDs Used: {saver.id_index}/{len(saver.available_ids)}
+        Start: {start:%Y%m%d_%H%M%S} | End: {end:%Y%m%d_%H%M%S} | ⏱️ First save: {first_save} | 🕒 Duration: {end - start}
+    """)
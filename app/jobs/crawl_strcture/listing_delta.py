@@ -0,0 +1,135 @@
+"""
+Listing-row delta: bỏ qua detail page khi dòng trên trang listing không đổi
+
+Trang listing đã hiển thị tóm tắt của từng phòng (giá thuê, phí quản lý, layout, diện tích, tầng).
+Site parser tính một signature ngắn từ dòng đó (row_signature) và ghi vào ListingFetcher.row_signatures.
+Với URL đã hết hạn theo LAST_UPDATED, nếu signature trùng với `listing_signature` đã lưu và lần tải
+detail gần nhất (`detail_fetched_date`) chưa quá LISTING_SIGNATURE_MAX_AGE giây thì không fetch detail
+(và không chạy geocoding, station, translate) - chỉ cập nhật created_date như trang 304.
+
+Signature có salt CONTENT_FINGERPRINT_SALT: đổi salt sau khi sửa extractor → mọi phòng được tải lại.
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from itertools import islice
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.db.mongodb import get_collection
+from app.utils.save_utils import SaveUtils
+from .url_canonicalizer import UrlCanonicalizer, DEFAULT_CANONICALIZER
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_FIELD = "listing_signature"
+FETCHED_FIELD = "detail_fetched_date"
+_WHITESPACE = re.compile(r'\s+')
+
+
+def row_signature(*parts: Any) -> str:
+    """Signature của một dòng listing (các phần text được chuẩn hoá khoảng trắng)"""
+    text = '|'.join(_WHITESPACE.sub(' ', str(part or '')).strip() for part in parts)
+    return hashlib.sha1(f"{settings.CONTENT_FINGERPRINT_SALT}|{text}".encode('utf-8')).hexdigest()[:16]
+
+
+class ListingDelta:
+    """So sánh signature của dòng listing với document đã lưu cho một lần chạy crawl"""
+
+    def __init__(
+        self,
+        row_signatures: Dict[str, str],
+        canonicalizer: Optional[UrlCanonicalizer] = None,
+        max_age: Optional[int] = None
+    ):
+        """
+        Args:
+            row_signatures: URL (dạng trên trang listing) → signature; có thể được ghi thêm trong lúc crawl
+            canonicalizer: Rule chuẩn hoá URL của site (cùng rule với UrlFrontier)
+            max_age: Tuổi tối đa (giây) của lần tải detail gần nhất (default: settings.LISTING_SIGNATURE_MAX_AGE)
+        """
+        self.row_signatures = row_signatures
+        self.canonicalizer = canonicalizer or DEFAULT_CANONICALIZER
+        self.max_age = max_age if max_age is not None else settings.LISTING_SIGNATURE_MAX_AGE
+        self._signatures: Dict[str, str] = {}  # URL canonical → signature
+        self._synced = 0
+        self.skipped = 0  # Detail page không cần tải
+        self.changed = 0  # Signature khác với document đã lưu
+        self.expired = 0  # Signature trùng nhưng quá max_age
+
+    def signature(self, url: str) -> Optional[str]:
+        # row_signatures được site parser ghi theo thứ tự → chỉ chuẩn hoá các entry mới
+        if self._synced < len(self.row_signatures):
+            for raw, sig in islice(self.row_signatures.items(), self._synced, None):
+                canonical = self.canonicalizer.canonicalize(raw)
+                if canonical:
+                    self._signatures[canonical] = sig
+            self._synced = len(self.row_signatures)
+        return self._signatures.get(url)
+
+    async def split(self, urls: List[str], collection_name: str) -> List[str]:
+        """
+        Bỏ các URL có dòng listing không đổi (cập nhật created_date cho document của chúng)
+
+        Returns:
+            Các URL cần tải detail page
+        """
+        signed = {url: sig for url in urls if (sig := self.signature(url))}
+        if not signed:
+            return urls
+
+        unchanged = set()
+        cutoff = time.time() - self.max_age
+        try:
+            cursor = get_collection(collection_name).find(
+                {"link": {"$in": list(signed)}, SIGNATURE_FIELD: {"$exists": True}},
+                projection={"link": 1, SIGNATURE_FIELD: 1, FETCHED_FIELD: 1}
+            )
+            async for doc in cursor:
+                link = doc.get("link")
+                if doc.get(SIGNATURE_FIELD) != signed.get(link):
+                    self.changed += 1
+                elif (doc.get(FETCHED_FIELD) or 0) <= cutoff:
+                    self.expired += 1
+                else:
+                    unchanged.add(link)
+        except Exception as e:
+            # Fail-safe: tải lại toàn bộ
+            logger.warning(f"Listing delta lookup failed: {e}")
+            print(f"⚠️ Listing delta lookup failed: {e}")
+            return urls
+
+        if not unchanged:
+            return urls
+
+        await SaveUtils.touch_urls(list(unchanged), collection_name)
+        self.skipped += len(unchanged)
+        print(f"📋 Listing delta: {len(unchanged)}/{len(urls)} rows unchanged, skipping detail pages")
+        return [url for url in urls if url not in unchanged]
+
+    def stamp(self, result: Dict[str, Any]) -> None:
+        """Ghi signature + thời điểm tải detail vào kết quả trước khi lưu"""
+        sig = self.signature(result.get('link'))
+        if sig:
+            result[SIGNATURE_FIELD] = sig
+        result[FETCHED_FIELD] = time.time()
+
+    async def refresh(self, links: List[str], collection_name: str) -> None:
+        """Detail page đã được tải nhưng không đổi (304 / fingerprint): lưu signature mới cho document"""
+        now = time.time()
+        collection = get_collection(collection_name)
+        updates = [
+            collection.update_one({"link": link}, {"$set": {SIGNATURE_FIELD: sig, FETCHED_FIELD: now}})
+            for link in links if (sig := self.signature(link))
+        ]
+        if not updates:
+            return
+        for result in await asyncio.gather(*updates, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning(f"Listing signature refresh failed: {result}")
+
+    def summary(self) -> str:
+        return f"{self.skipped} skipped, {self.changed} changed, {self.expired} expired"
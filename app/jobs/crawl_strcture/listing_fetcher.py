@@ -0,0 +1,248 @@
+"""
+Async listing-page fetcher
+
+Thay cho requests.get tuần tự trong crawl_multi_pages: tải các trang listing qua transport của site
+(aiohttp / httpx) với số request đồng thời giới hạn, retry từng trang, và trả về URL của từng trang
+ngay khi trang đó về.
+
+- Dừng sớm: LISTING_EMPTY_PAGE_LIMIT trang liên tiếp không có listing (số trang detect sai / default
+  74, 30 quá lớn) → huỷ các trang phía sau
+- Page cache (listing_page_cache): trang có body không đổi từ lần trước → không parse lại
+"""
+
+import asyncio
+import aiohttp
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from .rate_limiter import rate_limiter
+from .retry_policy import RetryPolicy
+from .transport import Transport, TransportError, create_transport
+from .proxy_pool import proxy_pool
+from .listing_page_cache import CachedPage, ListingPageCache, page_hash, page_key
+
+
+class DiscoveryIncomplete(Exception):
+    """Có trang listing tải thất bại → danh sách URL không đầy đủ, không được xoá các URL 'không còn thấy'"""
+
+
+class ListingFetcher:
+    """Transport + retry cho các trang listing của một site"""
+
+    def __init__(
+        self,
+        headers: Dict[str, str],
+        concurrency: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        timeout: int = 30,
+        transport: Optional[str] = None,
+        row_signatures: Optional[Dict[str, str]] = None,
+        page_cache: Optional[ListingPageCache] = None,
+        empty_page_limit: Optional[int] = None
+    ):
+        """
+        Args:
+            headers: Request headers
+            concurrency: Số trang listing tải đồng thời (default: settings.LISTING_CONCURRENCY)
+            max_attempts: Số lần thử mỗi trang (default: settings.LISTING_MAX_ATTEMPTS)
+            timeout: Timeout mỗi request (giây)
+            transport: HTTP backend 'aiohttp' | 'httpx' (default: settings.CRAWLER_TRANSPORT)
+            row_signatures: Dict để site parser ghi URL → signature của dòng listing (xem listing_delta)
+            page_cache: Cache hash + URL của trang listing (None = luôn parse lại)
+            empty_page_limit: Số trang rỗng liên tiếp để dừng discovery (default: settings.LISTING_EMPTY_PAGE_LIMIT, 0 = tắt)
+        """
+        self.headers = headers
+        self.concurrency = concurrency or settings.LISTING_CONCURRENCY
+        self.retry_policy = RetryPolicy(max_attempts=max_attempts or settings.LISTING_MAX_ATTEMPTS)
+        self.timeout = timeout
+        self.transport_name = transport
+        self.failed_pages = 0  # Số trang listing tải thất bại (hết retry hoặc lỗi khi xử lý)
+        self.row_signatures: Dict[str, str] = row_signatures if row_signatures is not None else {}
+        self.page_cache = page_cache
+        self.empty_page_limit = settings.LISTING_EMPTY_PAGE_LIMIT if empty_page_limit is None else empty_page_limit
+        self.failed_page_numbers: Set[int] = set()
+        self.pages_fetched = 0  # Trang tải thành công (HTTP 200)
+        self.pages_empty = 0
+        self.pages_skipped = 0  # Trang bị huỷ sau khi gặp các trang rỗng liên tiếp
+        self._failed_tasks: Set[asyncio.Task] = set()
+        self._transport: Optional[Transport] = None
+
+    async def __aenter__(self):
+        self._transport = create_transport(
+            self.transport_name,
+            pool_size=self.concurrency,
+            headers=self.headers,
+            timeout=self.timeout
+        )
+        if self.page_cache:
+            await self.page_cache.preload()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self.page_cache:
+            # Chỉ xoá entry của trang không còn tải khi discovery đầy đủ
+            await self.page_cache.flush(prune=exc_type is None and not self.failed_pages)
+        if self._transport:
+            await self._transport.close()
+            self._transport = None
+
+    async def fetch(self, url: str, params: Optional[Dict[str, Any]] = None) -> Optional[bytes]:
+        """
+        Tải một trang listing (retry lỗi tạm thời với backoff)
+
+        Returns:
+            Body dạng bytes (để lxml tự detect encoding), None nếu thất bại
+        """
+        attempt = 0
+        while True:
+            error_msg, retryable = "", False
+            await rate_limiter.acquire(url)
+            async with proxy_pool.lease() as lease:
+                try:
+                    async with self._transport.stream(url, params=params, proxy=lease.proxy_url) as response:
+                        lease.status = response.status
+                        rate_limiter.record_status(url, response.status, response.headers.get('Retry-After'))
+                        if response.status == 200:
+                            body = await response.read()
+                            self.pages_fetched += 1
+                            return body
+                        error_msg = f"HTTP {response.status}"
+                        retryable = self.retry_policy.is_retryable_status(response.status)
+                except asyncio.TimeoutError as e:
+                    lease.status = None
+                    rate_limiter.record_throttle(url)
+                    error_msg, retryable = "Timeout", self.retry_policy.is_retryable_exception(e)
+                except (aiohttp.ClientError, TransportError) as e:
+                    lease.status = None
+                    error_msg, retryable = f"Client error: {e}", self.retry_policy.is_retryable_exception(e)
+
+            attempt += 1
+            if not retryable or attempt >= self.retry_policy.max_attempts:
+                print(f"❌ Listing fetch failed ({error_msg}): {url} {params or ''}")
+                self.failed_pages += 1
+                self._failed_tasks.add(asyncio.current_task())
+                return None
+
+            delay = self.retry_policy.backoff(attempt)
+            print(f"🔁 Listing retry {attempt}/{self.retry_policy.max_attempts - 1} in {delay:.1f}s ({error_msg}): {url} {params or ''}")
+            await asyncio.sleep(delay)
+
+    def cached_page(self, url: str, params: Optional[Dict[str, Any]], content: bytes) -> Optional[CachedPage]:
+        """
+        Kết quả lần trước nếu body trang không đổi (signature của dòng listing được nạp lại vào row_signatures)
+
+        Site parser gọi ngay sau fetch(); None → parse trang rồi gọi remember_page()
+        """
+        if not self.page_cache:
+            return None
+        cached = self.page_cache.lookup(page_key(self.page_cache.site, url, params), page_hash(content))
+        if cached:
+            for link, signature in zip(cached.urls, cached.signatures):
+                if signature:
+                    self.row_signatures[link] = signature
+        return cached
+
+    def remember_page(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        content: bytes,
+        urls: List[str],
+        max_pages: Optional[int] = None
+    ) -> None:
+        """Lưu hash + URL của trang vừa parse cho lần chạy sau"""
+        if not self.page_cache:
+            return
+        signatures = [self.row_signatures.get(link) for link in urls]
+        self.page_cache.store(page_key(self.page_cache.site, url, params), page_hash(content), urls, signatures, max_pages)
+
+    async def fetch_page(
+        self,
+        fetch_page_urls_func: Callable[..., Awaitable[Tuple[List[str], Optional[int]]]],
+        page: int,
+        detect_max_pages: bool = False,
+    ) -> Tuple[List[str], Optional[int]]:
+        """
+        Gọi hàm của site cho một trang listing.
+
+        Lỗi khi xử lý (vd: body rỗng / bị cắt làm lxml raise) được tính là trang lỗi,
+        không phải trang rỗng → không kích hoạt dừng sớm và chặn remove_missing.
+        """
+        try:
+            urls, max_pages = await fetch_page_urls_func(page, self, detect_max_pages)
+        except Exception as e:
+            print(f"❌ Error processing page {page}: {e}")
+            self.failed_pages += 1
+            self.failed_page_numbers.add(page)
+            return [], None
+        if asyncio.current_task() in self._failed_tasks:
+            self._failed_tasks.discard(asyncio.current_task())
+            self.failed_page_numbers.add(page)
+        return urls, max_pages
+
+    def _empty_run_start(self, empty: Set[int]) -> Optional[int]:
+        """Trang đầu tiên của một dãy empty_page_limit trang rỗng liên tiếp (None nếu chưa có)"""
+        for page in sorted(empty):
+            if all(page + i in empty for i in range(self.empty_page_limit)):
+                return page
+        return None
+
+    async def iter_pages(
+        self,
+        fetch_page_urls_func: Callable[[int, "ListingFetcher", bool], Awaitable[Tuple[List[str], Optional[int]]]],
+        pages: Iterable[int]
+    ) -> AsyncIterator[Tuple[int, List[str]]]:
+        """
+        Tải nhiều trang đồng thời (tối đa self.concurrency), yield (page, urls) theo thứ tự trang về
+
+        Khi có empty_page_limit trang liên tiếp trả về 0 URL (không tính trang lỗi), các trang phía sau
+        dãy đó bị huỷ; các trang phía trước vẫn được tải hết.
+
+        Args:
+            fetch_page_urls_func: Hàm của site: (page, fetcher, detect_max_pages) -> (urls, max_pages)
+            pages: Các số trang cần tải
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(page: int) -> Tuple[int, List[str]]:
+            async with semaphore:
+                urls, _ = await self.fetch_page(fetch_page_urls_func, page)
+                return page, urls
+
+        tasks = {page: asyncio.create_task(run(page)) for page in pages}
+        empty: Set[int] = set()
+        stopped = False
+        try:
+            pending = set(tasks.values())
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled():
+                        continue
+                    page, urls = task.result()
+                    if not urls and page not in self.failed_page_numbers:
+                        self.pages_empty += 1
+                        empty.add(page)
+                        start = self._empty_run_start(empty) if self.empty_page_limit > 0 else None
+                        if start is not None and not stopped:
+                            stopped = True
+                            last = start + self.empty_page_limit - 1
+                            for later, later_task in tasks.items():
+                                if later > last and not later_task.done():
+                                    later_task.cancel()
+                                    self.pages_skipped += 1
+                            print(f"🛑 Pages {start}-{last} are empty, stopping discovery ({self.pages_skipped} pages skipped)")
+                    yield page, urls
+        finally:
+            # Consumer dừng sớm → huỷ các trang chưa tải
+            for task in tasks.values():
+                task.cancel()
+
+    def summary(self) -> str:
+        text = (
+            f"{self.pages_fetched} pages fetched, {self.page_cache.unchanged if self.page_cache else 0} unchanged, "
+            f"{self.pages_empty} empty, {self.pages_skipped} skipped, {self.failed_pages} failed"
+        )
+        if self.page_cache:
+            text += f" | URLs: {self.page_cache.new_urls} new, {self.page_cache.dropped_urls} dropped"
+        return text
@@ -0,0 +1,115 @@
+"""
+Cache kết quả trang listing (hash body + danh sách URL) giữa các lần chạy
+
+Phần lớn trang listing không đổi giữa hai lần crawl. Site parser hỏi ListingFetcher.cached_page() ngay
+sau khi tải: body trùng hash của lần trước → dùng lại URL (và signature của dòng listing) đã lưu, không
+parse lại trang. Trang đổi → parse như thường rồi ListingFetcher.remember_page().
+
+Lưu trong MongoDB (collection LISTING_PAGE_COLLECTION, _id = "<site>|<url>?<params>").
+So sánh URL của lần chạy này với lần trước → số URL mới / số URL không còn trên listing.
+
+Lưu ý: hash trên toàn bộ body - trang có token / timestamp thay đổi mỗi request sẽ không bao giờ "unchanged".
+"""
+
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.db.mongodb import get_collection
+
+logger = logging.getLogger(__name__)
+
+
+def page_key(site: str, url: str, params: Optional[Dict[str, Any]] = None) -> str:
+    query = '&'.join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+    return f"{site}|{url}?{query}" if query else f"{site}|{url}"
+
+
+def page_hash(content: bytes) -> str:
+    return hashlib.sha1(content).hexdigest()
+
+
+class CachedPage:
+    """Kết quả đã lưu của một trang listing"""
+
+    def __init__(self, urls: List[str], signatures: List[Optional[str]], max_pages: Optional[int] = None):
+        self.urls = urls
+        self.signatures = signatures  # Cùng thứ tự với urls (URL chứa "." không dùng làm key Mongo được)
+        self.max_pages = max_pages
+
+
+class ListingPageCache:
+    """Hash + URL của các trang listing của một site"""
+
+    def __init__(self, site: str, collection_name: Optional[str] = None):
+        self.site = site
+        self.collection_name = collection_name or settings.LISTING_PAGE_COLLECTION
+        self._entries: Dict[str, Dict[str, Any]] = {}  # key → document đã lưu
+        self._pending: Dict[str, Dict[str, Any]] = {}  # key → document mới, ghi khi flush
+        self._touched: Set[str] = set()
+        self.previous_urls: Set[str] = set()
+        self.current_urls: Set[str] = set()
+        self.unchanged = 0
+
+    async def preload(self) -> int:
+        try:
+            cursor = get_collection(self.collection_name).find({"site": self.site})
+            async for doc in cursor:
+                self._entries[doc["_id"]] = doc
+                self.previous_urls.update(doc.get("urls", []))
+        except Exception as e:
+            logger.warning(f"Listing page cache preload failed: {e}")
+            print(f"⚠️ Listing page cache preload failed: {e}")
+        return len(self._entries)
+
+    def lookup(self, key: str, digest: str) -> Optional[CachedPage]:
+        """Kết quả đã lưu nếu body của trang không đổi"""
+        self._touched.add(key)
+        doc = self._entries.get(key)
+        if not doc or doc.get("hash") != digest:
+            return None
+        urls = doc.get("urls", [])
+        self.current_urls.update(urls)
+        self.unchanged += 1
+        return CachedPage(urls, doc.get("signatures") or [None] * len(urls), doc.get("max_pages"))
+
+    def store(self, key: str, digest: str, urls: List[str], signatures: List[Optional[str]], max_pages: Optional[int]) -> None:
+        self._touched.add(key)
+        self.current_urls.update(urls)
+        self._pending[key] = {
+            "site": self.site,
+            "hash": digest,
+            "urls": urls,
+            "signatures": signatures,
+            "max_pages": max_pages,
+            "updated_at": datetime.now(timezone.utc),
+        }
+
+    async def flush(self, prune: bool = False) -> None:
+        """
+        Ghi các trang đã đổi
+
+        Args:
+            prune: Xoá entry của các trang không được tải lần này (chỉ khi discovery đầy đủ,
+                   vd: site có ít trang hơn) - tránh tính nhầm URL "dropped" ở lần sau
+        """
+        collection = get_collection(self.collection_name)
+        writes = [collection.replace_one({"_id": key}, doc, upsert=True) for key, doc in self._pending.items()]
+        stale = [key for key in self._entries if key not in self._touched]
+        if prune and stale:
+            writes.append(collection.delete_many({"_id": {"$in": stale}}))
+        for result in await asyncio.gather(*writes, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning(f"Listing page cache write failed: {result}")
+        self._pending.clear()
+
+    @property
+    def new_urls(self) -> int:
+        return len(self.current_urls - self.previous_urls)
+
+    @property
+    def dropped_urls(self) -> int:
+        return len(self.previous_urls - self.current_urls)
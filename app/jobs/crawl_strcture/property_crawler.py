@@ -2,53 +2,79 @@
 Enhanced Property Crawler - Class chính
 """
 
-import asyncio, time, gc
+import asyncio, gc, time
 from typing import Dict, List, Any, Optional, Callable
 
 
 from .property_extractor import PropertyExtractor
 from .custom_rules import CustomExtractor
-from .crawler_pool import CrawlerPool
+from .transport import Transport, create_transport
+from .circuit_breaker import breaker_registry
+from .rate_limiter import rate_limiter
+from .http_cache import HttpValidatorCache
+from .fingerprint import ContentFingerprinter
+from .dead_url_cache import DeadUrlCache
+from .html_archive import HtmlArchive
+from .site_profile import SiteProfile
+from .concurrency_controller import ConcurrencyController
 from app.core.config import settings
 
 class EnhancedPropertyCrawler:
-    def __init__(self, custom_extractor_factory: Optional[Callable[[], CustomExtractor]] = None):
+    def __init__(
+        self,
+        custom_extractor_factory: Optional[Callable[[], CustomExtractor]] = None,
+        http_cache: Optional[HttpValidatorCache] = None,
+        fingerprinter: Optional[ContentFingerprinter] = None,
+        site_profile: Optional[SiteProfile] = None,
+        dead_urls: Optional[DeadUrlCache] = None,
+        html_archive: Optional[HtmlArchive] = None
+    ):
         """
         Initialize EnhancedPropertyCrawler
-        
+
         Args:
             custom_extractor_factory: Optional factory function to create custom extractor
                                     If None, will use basic extractor
+            http_cache: Optional ETag/Last-Modified cache để gửi conditional GET
+            fingerprinter: Optional content fingerprinter để bỏ qua trang không đổi
+            site_profile: Cấu hình fetch của site (max body size, end marker)
+            dead_urls: Optional negative cache (404/410, redirect về search) + redirect map
+            html_archive: Optional archive HTML nén cho re-extract offline
         """
-        self.extractor = PropertyExtractor(custom_extractor_factory)
+        self.extractor = PropertyExtractor(
+            custom_extractor_factory, http_cache=http_cache, fingerprinter=fingerprinter,
+            site_profile=site_profile, dead_urls=dead_urls, html_archive=html_archive
+        )
         self.custom_extractor_factory = custom_extractor_factory
-        self.pool: Optional[CrawlerPool] = None
+        self.site_profile = self.extractor.site_profile
+        # URL lỗi tạm thời (đã hết lượt retry ngay) → crawl lại một lần cuối run
+        self.retry_queue: List[str] = []
+        # Giới hạn in-flight tự điều chỉnh của streaming mode (tạo khi bắt đầu crawl, giữ qua retry pass)
+        self.concurrency: Optional[ConcurrencyController] = None
 
-    async def _crawl_single_property(self, url: str, verbose: bool = True, pool: Optional[CrawlerPool] = None) -> Dict[str, Any]:
+    async def _crawl_single_property(self, url: str, verbose: bool = True, transport: Optional[Transport] = None) -> Dict[str, Any]:
         """
         Private method để crawl một property
-        
+
         Args:
             url: URL to crawl
             verbose: Whether to print progress messages (default: True)
-            pool: Optional CrawlerPool instance to use
+            transport: Optional HTTP transport (aiohttp / httpx) dùng chung giữa các worker
         """
         if verbose:
             print(f"🚀 Crawling: {url}")
-        
-        crawler = None
+
         try:
-            # Nếu có pool, lấy crawler từ pool
-            if pool:
-                crawler = await pool.acquire()
-                result = await self.extractor.extract_property_data(url, crawler=crawler)
+            # Nếu có transport, dùng chung connection pool của crawler
+            if transport:
+                result = await self.extractor.extract_property_data(url, transport=transport)
             else:
-                # Fallback: không dùng pool
+                # Fallback: extractor tự tạo transport
                 result = await self.extractor.extract_property_data(url)
-            
+
             # Trả về trực tiếp property_data đã được flatten trong extractor
             return result.get('property_data', result)
-            
+
         except Exception as e:
             error_result = {
                 'error': str(e),
@@ -56,105 +82,284 @@ class EnhancedPropertyCrawler:
             if verbose:
                 print(f"❌ Exception crawling {url}: {e}")
             return error_result
+
+    async def _crawl_guarded(
+        self,
+        url: str,
+        transport: Optional[Transport],
+        max_consecutive_failures: int,
+        concurrency: Optional[ConcurrencyController] = None
+    ) -> Dict[str, Any]:
+        """
+        Crawl một URL qua circuit breaker của host
+
+        Nếu host đang open, chỉ coroutine này chờ (asyncio.sleep) - event loop, FastAPI
+        và job của site khác không bị ảnh hưởng. Slot của concurrency controller chỉ được lấy
+        sau khi breaker cho qua, và thời gian chờ token của rate limiter không tính vào latency,
+        để p95 / hill climbing chỉ phản ánh thời gian request thật.
+        """
+        breaker = breaker_registry.get(url, failure_threshold=max_consecutive_failures)
+        await breaker.before_request()
+
+        if concurrency:
+            await concurrency.acquire()
+        started, waited = time.monotonic(), rate_limiter.waited()
+        error = True
+        try:
+            result = await self._crawl_single_property(url, transport=transport)
+            # Trang đã đóng (404/410) là câu trả lời bình thường của host, không phải lỗi
+            error = isinstance(result, dict) and 'error' in result and not result.get('dead')
+        except Exception as e:
+            result = {'error': str(e), 'url': url}
         finally:
-            # Trả crawler về pool nếu đã lấy từ pool
-            if pool and crawler:
-                await pool.release(crawler)
+            if concurrency:
+                latency = time.monotonic() - started - (rate_limiter.waited() - waited)
+                await concurrency.release(max(0.0, latency), error)
 
-    async def crawl_multiple_properties(
-        self, 
-        urls: List[str], 
+        if error:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return result
+
+    def _defer_if_retryable(self, url: str, result: Any, final_pass: bool) -> bool:
+        """Đưa URL lỗi tạm thời vào retry_queue thay vì bỏ đến lần cron sau. True nếu đã defer"""
+        if final_pass or not (isinstance(result, dict) and result.get('retryable')):
+            return False
+        self.retry_queue.append(url)
+        return True
+
+    async def process_retry_queue(
+        self,
         batch_size: int = 10,
         on_batch_complete: Optional[Callable[[List[Dict[str, Any]], int, int], Any]] = None,
         max_consecutive_failures: int = 30
+    ) -> int:
+        """
+        Crawl lại (một lần) các URL trong retry_queue ở cuối run
+
+        Mỗi URL tiêu tốn 1 lượt trong retry budget của run; hết budget thì bỏ qua phần còn lại.
+
+        Returns:
+            Số URL đã crawl lại
+        """
+        if not self.retry_queue:
+            return 0
+
+        budget = self.extractor.retry_budget
+        urls = []
+        for url in self.retry_queue:
+            if not budget.try_consume():
+                break
+            urls.append(url)
+        dropped = len(self.retry_queue) - len(urls)
+        self.retry_queue = []
+
+        print(f"🔁 Retry pass: {len(urls)} URLs" + (f" ({dropped} dropped, budget exhausted)" if dropped else ""))
+        if not urls:
+            return 0
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for url in urls:
+            queue.put_nowait(url)
+        queue.put_nowait(None)
+
+        processed = await self.crawl_from_queue(
+            queue,
+            batch_size=batch_size,
+            on_batch_complete=on_batch_complete,
+            max_consecutive_failures=max_consecutive_failures,
+            total_urls=len(urls),
+            final_pass=True
+        )
+        print(f"📊 Retry budget: {budget.summary()}")
+        return processed
+
+    async def crawl_multiple_properties(
+        self,
+        urls: List[str],
+        batch_size: int = 10,
+        on_batch_complete: Optional[Callable[[List[Dict[str, Any]], int, int], Any]] = None,
+        max_consecutive_failures: int = 30,
+        streaming: Optional[bool] = None
     ) -> List[Dict[str, Any]]:
         """
-        Crawl nhiều properties với batch processing và crawler pool để tránh timeout và overhead
-        
+        Crawl nhiều properties với crawler pool để tránh timeout và overhead
+
         Args:
             urls: List of URLs to crawl
             batch_size: Number of URLs to crawl simultaneously (default: 10)
             on_batch_complete: Optional callback function được gọi sau mỗi batch
                              Nhận params: (batch_results, batch_num, total_batches)
-            max_consecutive_failures: Maximum consecutive failures before stopping (default: 30)
+            max_consecutive_failures: Số lỗi liên tiếp trước khi circuit breaker của host mở (default: 30)
+            streaming: True = worker pool liên tục, False = batch + gather cũ
+                       (None: lấy theo settings.CRAWLER_STREAMING)
+        """
+        if streaming is None:
+            streaming = settings.CRAWLER_STREAMING
+
+        if streaming:
+            queue: asyncio.Queue = asyncio.Queue()
+            for url in urls:
+                queue.put_nowait(url)
+            queue.put_nowait(None)  # Sentinel: hết URL
+
+            await self.crawl_from_queue(
+                queue,
+                batch_size=batch_size,
+                on_batch_complete=on_batch_complete,
+                max_consecutive_failures=max_consecutive_failures,
+                total_urls=len(urls)
+            )
+        else:
+            await self._crawl_in_batches(urls, batch_size, on_batch_complete, max_consecutive_failures)
+
+        await self.process_retry_queue(batch_size, on_batch_complete, max_consecutive_failures)
+
+        print(f"✅ Completed crawling all {len(urls)} properties!")
+
+    async def crawl_from_queue(
+        self,
+        queue: asyncio.Queue,
+        batch_size: int = 10,
+        on_batch_complete: Optional[Callable[[List[Dict[str, Any]], int, int], Any]] = None,
+        max_consecutive_failures: int = 30,
+        total_urls: Optional[int] = None,
+        final_pass: bool = False
+    ) -> int:
+        """
+        Streaming mode: batch_size workers lấy URL từ queue, URL mới bắt đầu ngay khi có slot trống
+
+        Kết quả được gom lại và flush qua on_batch_complete mỗi batch_size kết quả,
+        giữ nguyên semantics của batch mode (batch_num tăng dần, callback chạy tuần tự).
+
+        CONCURRENCY_AUTOTUNE: chạy CONCURRENCY_MAX worker nhưng số request đồng thời do
+        ConcurrencyController quyết định (bắt đầu từ batch_size, tự điều chỉnh theo latency / lỗi / RAM).
+
+        Args:
+            queue: asyncio.Queue chứa URL, kết thúc bằng sentinel None
+            batch_size: Số worker chạy đồng thời (giá trị ban đầu nếu autotune), cũng là kích thước mỗi lần flush
+            on_batch_complete: Callback (batch_results, batch_num, total_batches)
+            max_consecutive_failures: Số lỗi liên tiếp trước khi circuit breaker của host mở
+            total_urls: Tổng số URL nếu biết trước (để tính total_batches), None nếu chưa biết
+            final_pass: True khi đang chạy retry pass → lỗi không được đưa vào retry_queue nữa
+
+        Returns:
+            Số URL đã crawl
         """
+        total_batches = (total_urls + batch_size - 1) // batch_size if total_urls is not None else 0
+
+        workers = batch_size
+        if settings.CONCURRENCY_AUTOTUNE:
+            if self.concurrency is None:
+                self.concurrency = ConcurrencyController(initial=batch_size)
+            workers = self.concurrency.max_limit
+            print(f"🏘️ Crawling {total_urls if total_urls is not None else '?'} properties, "
+                  f"concurrency {self.concurrency.limit} (auto {self.concurrency.min_limit}-{self.concurrency.max_limit})...")
+        else:
+            print(f"🏘️ Crawling {total_urls if total_urls is not None else '?'} properties with {batch_size} workers...")
+
+        buffer: List[Dict[str, Any]] = []
+        flush_lock = asyncio.Lock()
+        batch_num = 0
+        processed = 0
+
+        async def flush(force: bool = False):
+            nonlocal batch_num
+            # Lock giữ thứ tự batch và tránh callback chạy chồng lên nhau
+            async with flush_lock:
+                while len(buffer) >= batch_size or (force and buffer):
+                    batch_results = buffer[:batch_size]
+                    del buffer[:batch_size]
+                    batch_num += 1
+
+                    if on_batch_complete:
+                        try:
+                            await on_batch_complete(batch_results, batch_num, total_batches)
+                        except Exception as e:
+                            print(f"⚠️ Error in batch callback: {e}")
+
+                    batch_results.clear()
+                    gc.collect()
+
+        async def worker(transport: Transport):
+            nonlocal processed
+            while True:
+                url = await queue.get()
+                if url is None:
+                    # Đưa sentinel trở lại để các worker khác cũng dừng
+                    queue.put_nowait(None)
+                    return
+
+                result = await self._crawl_guarded(url, transport, max_consecutive_failures, self.concurrency)
+                processed += 1
+                if self._defer_if_retryable(url, result, final_pass):
+                    continue
+
+                buffer.append(result)
+                if len(buffer) >= batch_size:
+                    await flush()
+
+        # HTTP transport theo site profile, số connection mặc định bằng số worker
+        async with create_transport(self.site_profile.transport, pool_size=workers) as transport:
+            await asyncio.gather(*(worker(transport) for _ in range(workers)))
+            await flush(force=True)
+
+        if self.concurrency:
+            print(f"🎛️ Concurrency: {self.concurrency.snapshot()}")
+
+        return processed
+
+    async def _crawl_in_batches(
+        self,
+        urls: List[str],
+        batch_size: int,
+        on_batch_complete: Optional[Callable[[List[Dict[str, Any]], int, int], Any]],
+        max_consecutive_failures: int
+    ) -> None:
+        """Batch mode cũ: chia URLs thành batch cố định và gather từng batch"""
         print(f"🏘️ Crawling {len(urls)} properties in batches of {batch_size}...")
-        
-        consecutive_failures = 0
-        consecutive_successes = 0
-        
-        # Khởi tạo HTTP session pool với kích thước bằng batch_size
-        async with CrawlerPool(
-            pool_size=batch_size, 
-            custom_extractor_factory=self.custom_extractor_factory
-        ) as pool:
+
+        # HTTP transport theo site profile, số connection mặc định bằng batch_size
+        async with create_transport(self.site_profile.transport, pool_size=batch_size) as transport:
             # Chia URLs thành các batches
             for i in range(0, len(urls), batch_size):
                 batch_urls = urls[i:i + batch_size]
                 batch_num = (i // batch_size) + 1
                 total_batches = (len(urls) + batch_size - 1) // batch_size
-                
+
                 print(f"📦 Processing batch {batch_num}/{total_batches} ({len(batch_urls)} URLs)...")
-                
-                # Tạo tasks cho batch hiện tại với pool
-                tasks = [self._crawl_single_property(url, pool=pool) for url in batch_urls]
-                
+
+                # Tạo tasks cho batch hiện tại với pool (đếm lỗi liên tiếp qua circuit breaker)
+                tasks = [self._crawl_guarded(url, transport, max_consecutive_failures) for url in batch_urls]
+
                 # Chạy parallel với error handling cho batch này
                 batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-                
-                # Xử lý exceptions cho batch và đếm consecutive failures
+
+                # Xử lý exceptions cho batch
                 processed_batch_results = []
                 for j, result in enumerate(batch_results):
+                    if self._defer_if_retryable(batch_urls[j], result, final_pass=False):
+                        continue
                     if isinstance(result, Exception):
                         processed_batch_results.append({
                             'error': str(result),
                             'url': batch_urls[j]
                         })
-                        consecutive_failures += 1
-                        consecutive_successes = 0  # Reset success counter khi có failure
                     else:
-                        # Kiểm tra nếu result có 'error' key (crawl failed)
-                        if isinstance(result, dict) and 'error' in result:
-                            consecutive_failures += 1
-                            consecutive_successes = 0  # Reset success counter khi có failure
-                        else:
-                            # Tăng success counter
-                            consecutive_successes += 1
-                            
-                            # Chỉ reset failure counter sau 10 lần thành công liên tiếp
-                            if consecutive_successes >= 10:
-                                print(f"✅ 10 consecutive successes achieved - resetting failure counter (was {consecutive_failures})")
-                                consecutive_failures = 0
-                                consecutive_successes = 0  # Reset success counter sau khi đã reset failure
-                        
                         processed_batch_results.append(result)
-                    
-                    # Kiểm tra threshold sau mỗi result
-                    if consecutive_failures >= max_consecutive_failures:
-                        print(f"🛑 Crawl: {consecutive_failures} consecutive failures reached!")
-                        print(f"⏳ Waiting 5 minutes before continuing...")
-                        time.sleep(60 * 5)
-                        consecutive_failures = 0
-                    elif consecutive_failures > 0 and consecutive_failures % 5 == 0:
-                        print(f"⚠️ Warning: {consecutive_failures} consecutive failures (max: {max_consecutive_failures})")
-                
+
                 # Gọi callback sau khi hoàn thành batch (nếu có)
                 if on_batch_complete:
                     try:
                         await on_batch_complete(processed_batch_results, batch_num, total_batches)
                     except Exception as e:
                         print(f"⚠️ Error in batch callback: {e}")
-                        
+
                 # Thêm garbage collection rõ ràng sau mỗi batch
                 gc.collect()
-                
+
                 # Xóa kết quả batch để giải phóng bộ nhớ
                 processed_batch_results.clear()
                 batch_results = None
-                
-                # Thêm delay giữa các batches để tránh quá tải server
-                if i + batch_size < len(urls):  # Không delay sau batch cuối
-                    print(f"⏳ Waiting {settings.CRAWLER_DELAY} seconds before next batch...")
-                    await asyncio.sleep(settings.CRAWLER_DELAY)
-        
-        print(f"✅ Completed crawling all {len(urls)} properties!")
\ No newline at end of file
+                # Không còn sleep CRAWLER_DELAY giữa các batch: tốc độ do rate_limiter theo host quyết định
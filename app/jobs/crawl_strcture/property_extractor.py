@@ -1,62 +1,246 @@
 """Module chính xử lý extract dữ liệu property với BeautifulSoup"""
 
 import asyncio
+import re
 import aiohttp
 from typing import Dict, Any, Optional, Callable
 
 from app.models.structure_model import get_empty_property_data
 from app.utils.property_utils import PropertyUtils
-from app.core.config import CrawlerConfig
+from app.core.config import CrawlerConfig, settings
 from .custom_rules import CustomExtractor
+from .rate_limiter import rate_limiter
+from .retry_policy import RetryPolicy, RetryBudget
+from .http_cache import HttpValidatorCache, HTTP_VALIDATORS_FIELD, validators_from_headers
+from .fingerprint import ContentFingerprinter, FINGERPRINT_FIELD
+from .dead_url_cache import DeadUrlCache, DEAD_STATUSES
+from .html_archive import HtmlArchive
+from .extract_pool import extract_pool
+from .site_profile import SiteProfile, DEFAULT_SITE_PROFILE
+from .transport import Transport, TransportError, TransportResponse, create_transport
+from .proxy_pool import proxy_pool
+
+# <meta charset="..."> / <meta http-equiv="Content-Type" content="...; charset=..."> trong phần đầu trang
+_META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([A-Za-z0-9_\-]+)', re.IGNORECASE)
+
+# Field đã flatten của images / stations (xem _flatten_nested_data)
+_FLATTENED_PREFIXES = {
+    'images': ('image_url_', 'image_category_'),
+    'stations': ('station_name_', 'train_line_name_', 'walk_time_'),
+}
+
+
+class BodyTooLarge(Exception):
+    """Body vượt quá max_body_bytes của site"""
+
+
+class DeadPage(Exception):
+    """Detail page đã đóng: 404/410 hoặc redirect về trang search của site"""
 
 class PropertyExtractor:
-    def __init__(self, custom_extractor_factory: Optional[Callable[[], CustomExtractor]] = None):
+    def __init__(
+        self,
+        custom_extractor_factory: Optional[Callable[[], CustomExtractor]] = None,
+        http_cache: Optional[HttpValidatorCache] = None,
+        fingerprinter: Optional[ContentFingerprinter] = None,
+        site_profile: Optional[SiteProfile] = None,
+        dead_urls: Optional[DeadUrlCache] = None,
+        html_archive: Optional[HtmlArchive] = None
+    ):
         self.config = CrawlerConfig()
+        self.site_profile = site_profile or DEFAULT_SITE_PROFILE
         self.custom_extractor_factory = custom_extractor_factory
+        self.http_cache = http_cache
+        self.fingerprinter = fingerprinter
+        self.dead_urls = dead_urls
+        self.html_archive = html_archive
+        self.retry_policy = RetryPolicy()
+        # Mỗi EnhancedPropertyCrawler (một lần chạy) có một extractor → một retry budget
+        self.retry_budget = RetryBudget()
     
-    async def _fetch_html(self, url: str, session: aiohttp.ClientSession) -> tuple[bool, str, str]:
-        """Fetch HTML từ URL (không retry). Returns: (success, html_content, error_message)"""
-        try:
-            # Lấy proxy từ session nếu có
-            proxy = getattr(session, '_proxy', None)
-            async with session.get(url, proxy=proxy) as response:
-                if response.status == 200:
-                    return (True, await response.text(), "")
-                return (False, "", f"HTTP {response.status}")
-        except asyncio.TimeoutError:
-            return (False, "", "Request timeout")
-        except aiohttp.ClientError as e:
-            return (False, "", f"Client error: {str(e)}")
-        except Exception as e:
-            return (False, "", f"Unexpected error: {str(e)}")
+    async def _fetch_once(
+        self,
+        url: str,
+        transport: Transport,
+        fetch_url: str,
+        validators: Dict[str, str]
+    ) -> tuple[bool, Optional[str], str, bool]:
+        """
+        Fetch HTML một lần. Returns: (success, html_content, error_message, retryable)
+        
+        html_content=None khi server trả 304 Not Modified (conditional GET)
+        fetch_url: URL thực sự gửi request (URL đích nếu url đã biết là redirect), cache vẫn theo url
+        validators: Nhận ETag / Last-Modified của response 200 (chỉ lưu sau khi document được ghi)
+        Raises DeadPage khi trang đã đóng (không retry)
+        """
+        # Chờ token của host (AIMD rate limiter thay cho CRAWLER_DELAY cố định)
+        await rate_limiter.acquire(fetch_url)
+        # Proxy từ proxy pool (None = kết nối trực tiếp); lease chấm điểm proxy theo kết quả
+        async with proxy_pool.lease() as lease:
+            try:
+                headers = self.http_cache.conditional_headers(url) if self.http_cache else None
+                async with transport.stream(fetch_url, headers=headers, proxy=lease.proxy_url) as response:
+                    lease.status = response.status
+                    rate_limiter.record_status(fetch_url, response.status, response.headers.get('Retry-After'))
+                    if response.status == 304 and headers:
+                        self.http_cache.hits += 1
+                        return (True, None, "", False)
+                    if response.status in DEAD_STATUSES:
+                        raise DeadPage(f"HTTP {response.status}")
+                    if response.status == 200 and response.redirected:
+                        if self.site_profile.is_dead_redirect(response.url):
+                            raise DeadPage(f"redirected to {response.url}")
+                        if self.dead_urls and response.url != url:
+                            await self.dead_urls.record_redirect(url, response.url)
+                    if response.status == 200:
+                        if settings.CRAWLER_STREAM_BODY:
+                            html_content = await self._read_body(response)
+                        else:
+                            html_content = await response.text()
+                        if self.http_cache:
+                            validators.update(validators_from_headers(response.headers))
+                        return (True, html_content, "", False)
+                    return (False, "", f"HTTP {response.status}", self.retry_policy.is_retryable_status(response.status))
+            except DeadPage:
+                raise
+            except BodyTooLarge as e:
+                return (False, "", str(e), False)
+            except asyncio.TimeoutError as e:
+                lease.status = None  # Timeout giữa chừng body cũng tính là lỗi của đường đi (proxy)
+                rate_limiter.record_throttle(fetch_url)
+                return (False, "", "Request timeout", self.retry_policy.is_retryable_exception(e))
+            except (aiohttp.ClientError, TransportError) as e:
+                lease.status = None
+                return (False, "", f"Client error: {str(e)}", self.retry_policy.is_retryable_exception(e))
+            except Exception as e:
+                return (False, "", f"Unexpected error: {str(e)}", self.retry_policy.is_retryable_exception(e))
     
-    async def extract_property_data(self, url: str, crawler: Optional[aiohttp.ClientSession] = None) -> Dict[str, Any]:
+    async def _read_body(self, response: TransportResponse) -> str:
+        """
+        Đọc body theo chunk thay cho response.text()
+
+        - Vượt max_body_bytes của site → BodyTooLarge
+        - Gặp body_end_marker → dừng đọc (phần sau marker là map/listing liên quan mà
+          clean_html_before_processing cũng bỏ đi). Nếu phần còn lại nhỏ (theo Content-Length)
+          thì vẫn đọc nốt để connection được giữ lại cho keep-alive.
+        """
+        profile = self.site_profile
+        marker = profile.body_end_marker.encode('ascii') if profile.body_end_marker else None
+        chunk_size = settings.CRAWLER_READ_CHUNK_SIZE
+
+        body = bytearray()
+        truncated = False
+        async for chunk in response.iter_chunks(chunk_size):
+            # Tìm marker từ cuối chunk trước (marker có thể nằm vắt qua 2 chunk)
+            search_from = max(0, len(body) - len(marker) + 1) if marker else 0
+            body.extend(chunk)
+            if len(body) > profile.max_body_bytes:
+                raise BodyTooLarge(f"Body exceeds {profile.max_body_bytes} bytes")
+            if marker and body.find(marker, search_from) != -1:
+                truncated = True
+                break
+
+        if truncated:
+            remaining = (response.content_length or 0) - len(body)
+            if response.content_length and 0 < remaining <= chunk_size:
+                await response.drain()
+
+        return body.decode(self._detect_charset(response, body), errors='replace')
+
+    @staticmethod
+    def _detect_charset(response: TransportResponse, body: bytes) -> str:
+        """Charset từ Content-Type, rồi <meta charset> trong 2KB đầu, mặc định UTF-8"""
+        if response.charset:
+            return response.charset
+        match = _META_CHARSET.search(body[:2048])
+        if match:
+            charset = match.group(1).decode('ascii')
+            try:
+                ''.encode(charset)
+                return charset
+            except LookupError:
+                pass
+        return 'utf-8'
+
+    async def _fetch_html(
+        self,
+        url: str,
+        transport: Transport,
+        validators: Optional[Dict[str, str]] = None
+    ) -> tuple[bool, Optional[str], str, bool]:
+        """
+        Fetch HTML từ URL với retry (jittered exponential backoff, giới hạn bởi retry budget)
+        
+        Returns: (success, html_content, error_message, retryable)
+            retryable=True nghĩa là lỗi tạm thời nhưng đã hết lượt retry → có thể thử lại cuối run
+            html_content=None (success=True) nghĩa là 304 Not Modified
+        validators: Nhận ETag / Last-Modified của response 200
+        """
+        if validators is None:
+            validators = {}
+        self.retry_budget.record_request()
+        fetch_url = self.dead_urls.resolve(url) if self.dead_urls else url
+        attempt = 0
+        while True:
+            success, html_content, error_msg, retryable = await self._fetch_once(url, transport, fetch_url, validators)
+            if success or not retryable:
+                return (success, html_content, error_msg, retryable)
+            
+            attempt += 1
+            if attempt >= self.retry_policy.max_attempts or not self.retry_budget.try_consume():
+                return (False, "", f"{error_msg} (after {attempt} attempts)", retryable)
+            
+            delay = self.retry_policy.backoff(attempt)
+            print(f"🔁 Retry {attempt}/{self.retry_policy.max_attempts - 1} in {delay:.1f}s: {url} ({error_msg})")
+            await asyncio.sleep(delay)
+    
+    async def extract_property_data(self, url: str, transport: Optional[Transport] = None) -> Dict[str, Any]:
         """Extract dữ liệu bất động sản từ URL với đầy đủ thông tin theo PropertyModel"""
         try:
-            # Sử dụng session từ pool hoặc tạo mới
-            if crawler:
-                return await self._process_url(url, crawler)
+            # Sử dụng transport của crawler hoặc tạo mới
+            if transport:
+                return await self._process_url(url, transport)
             
-            # Tạo session mới nếu không có từ pool
-            timeout = aiohttp.ClientTimeout(
-                total=self.config.get_timeout(),
-                connect=10,
-                sock_read=self.config.get_timeout()
-            )
-            async with aiohttp.ClientSession(headers=self.config.get_headers(), timeout=timeout) as session:
-                return await self._process_url(url, session)
+            # Tạo transport riêng nếu gọi lẻ (không qua crawler)
+            async with create_transport(self.site_profile.transport, pool_size=1) as own_transport:
+                return await self._process_url(url, own_transport)
                     
         except Exception as e:
             error_msg = str(e)
             PropertyUtils.log_crawl_error(url, error_msg)
             return PropertyUtils.create_crawl_result(error=error_msg)
     
-    async def _process_url(self, url: str, session: aiohttp.ClientSession) -> Dict[str, Any]:
+    async def _process_url(self, url: str, transport: Transport) -> Dict[str, Any]:
         """Xử lý fetch và extract data từ URL"""
-        success, html_content, error_msg = await self._fetch_html(url, session)
+        validators: Dict[str, str] = {}
+        try:
+            success, html_content, error_msg, retryable = await self._fetch_html(url, transport, validators)
+        except DeadPage as e:
+            # Phòng đã đóng: ghi vào negative cache để các lần chạy sau không tải lại
+            if self.dead_urls:
+                await self.dead_urls.mark_dead(url, str(e))
+            return PropertyUtils.create_crawl_result(error=f"Dead page: {e}", dead=True)
         if not success:
             PropertyUtils.log_crawl_error(url, error_msg)
-            return PropertyUtils.create_crawl_result(error=error_msg)
+            return PropertyUtils.create_crawl_result(error=error_msg, retryable=retryable)
+        if html_content is None:
+            # 304: trang không đổi → bỏ qua toàn bộ pipeline extract, chỉ refresh created_date khi lưu
+            print(f"♻️ Not modified: {url}")
+            return PropertyUtils.create_crawl_result(property_data={'link': url, 'not_modified': True})
+        
+        # Fingerprint: nội dung listing không đổi → bỏ qua post-hooks (images, geocode, station, translate)
+        fingerprint = self.fingerprinter.compute(html_content) if self.fingerprinter else None
+        if self.fingerprinter and self.fingerprinter.is_unchanged(url, fingerprint):
+            print(f"♻️ Unchanged content: {url}")
+            # Document đã lưu khớp nội dung trang → validators mới được lưu khi refresh
+            property_data = {'link': url, 'not_modified': True}
+            if validators:
+                property_data[HTTP_VALIDATORS_FIELD] = validators
+            return PropertyUtils.create_crawl_result(property_data=property_data)
+        
+        # Lưu HTML sẽ được extract → có thể re-extract offline sau khi sửa extractor
+        if self.html_archive:
+            await self.html_archive.store(url, html_content)
         try:
             
             # Extract và flatten data
@@ -65,6 +249,10 @@ class PropertyExtractor:
             html_content = None
             
             flattened_data = self._flatten_nested_data(extracted_data)
+            if fingerprint:
+                flattened_data[FINGERPRINT_FIELD] = fingerprint
+            if validators:
+                flattened_data[HTTP_VALIDATORS_FIELD] = validators
             
             PropertyUtils.log_crawl_success(url, flattened_data)
             return PropertyUtils.create_crawl_result(property_data=flattened_data)
@@ -80,8 +268,37 @@ class PropertyExtractor:
         extracted_data = get_empty_property_data(url)
         # Create a new extractor instance for each request to avoid shared state in parallel processing
         custom_extractor = self.custom_extractor_factory() if self.custom_extractor_factory else CustomExtractor()
+        
+        # Hook CPU (parse HTML, regex, fuzzy match) chạy trong worker process, hook network tiếp tục trên event loop
+        if extract_pool.enabled and custom_extractor.cpu_hooks:
+            offloaded_data = await extract_pool.run(self.custom_extractor_factory, html_content, extracted_data)
+            if offloaded_data is not None:
+                return await custom_extractor.extract_with_rules_async(html_content, offloaded_data, skip_cpu_bound=True)
+        
         return await custom_extractor.extract_with_rules_async(html_content, extracted_data)
     
+    def extract_offline(self, url: str, html_content: str, stored: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Re-extract từ HTML đã archive, không dùng network (chạy được trong thread)
+        
+        Network hooks (ảnh từ API, geocoding, station, translate) bị bỏ qua: data bắt đầu từ document
+        đã lưu nên các field đó giữ nguyên, field lấy từ HTML được extract lại.
+        """
+        data = {**get_empty_property_data(url), **stored}
+        custom_extractor = self.custom_extractor_factory() if self.custom_extractor_factory else CustomExtractor()
+        data = custom_extractor.extract_with_rules(html_content, data, offline=True)
+        
+        # images / stations được extract lại → bỏ các field đã flatten cũ (số lượng có thể giảm)
+        for key, prefixes in _FLATTENED_PREFIXES.items():
+            if data.get(key):
+                for field in [f for f in data if f.startswith(prefixes)]:
+                    del data[field]
+        
+        flattened_data = self._flatten_nested_data(data)
+        if self.fingerprinter:
+            flattened_data[FINGERPRINT_FIELD] = self.fingerprinter.compute(html_content)
+        return flattened_data
+    
     def _flatten_nested_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Flatten nested data (images, stations) thành các field riêng biệt"""
         def flatten_list(key, items, mapping):
@@ -0,0 +1,200 @@
+"""
+Per-host adaptive rate limiter (AIMD token bucket)
+
+Mỗi host có một token bucket riêng:
+- Thành công  → tăng rate cộng thêm RATE_LIMIT_INCREASE (additive increase)
+- 429/5xx/timeout → nhân rate với RATE_LIMIT_DECREASE (multiplicative decrease)
+- Retry-After → chặn host cho đến hết thời gian server yêu cầu
+
+Mọi caller (detail, listing, warm-up) chạy trên cùng một event loop và các method không await giữa
+lúc đọc và ghi state, nên không cần lock.
+"""
+
+import asyncio
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional
+from urllib.parse import urlsplit
+
+from app.core.config import settings
+
+
+# Tổng thời gian task hiện tại đã chờ token (mỗi worker là một task → giá trị riêng)
+_waited: ContextVar[float] = ContextVar("rate_limiter_waited", default=0.0)
+
+
+def get_host(url: str) -> str:
+    """Lấy host (netloc) từ URL, dùng làm key cho các registry theo host"""
+    return urlsplit(url).netloc.lower()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse header Retry-After (số giây hoặc HTTP-date)
+
+    Returns:
+        Số giây cần chờ, hoặc None nếu header không hợp lệ
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_throttle_status(status: int) -> bool:
+    """429 và 5xx là tín hiệu server đang quá tải"""
+    return status == 429 or status >= 500
+
+
+class TokenBucket:
+    """Token bucket của một host với rate tự điều chỉnh theo AIMD"""
+
+    def __init__(
+        self,
+        host: str,
+        rate: float,
+        min_rate: float,
+        max_rate: float,
+        increase: float,
+        decrease: float,
+        burst: float
+    ):
+        self.host = host
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst
+
+        self.tokens = burst
+        self.blocked_until = 0.0
+        self._last_refill = time.monotonic()
+        self._last_decrease = 0.0
+
+        # Counters cho monitoring
+        self.successes = 0
+        self.throttles = 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+
+    def reserve(self) -> float:
+        """
+        Đặt trước 1 token
+
+        Returns:
+            Số giây phải chờ trước khi được gửi request (tokens âm = đang nợ)
+        """
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def on_success(self) -> None:
+        """Additive increase"""
+        self.successes += 1
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        """Multiplicative decrease + tôn trọng Retry-After"""
+        now = time.monotonic()
+        self.throttles += 1
+
+        # Nhiều request đang bay cùng lỗi một lúc chỉ tính là một lần giảm
+        if now - self._last_decrease >= 1.0 / self.rate:
+            old_rate = self.rate
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._last_decrease = now
+            if self.rate != old_rate:
+                print(f"🐢 [{self.host}] Rate decreased: {old_rate:.2f} → {self.rate:.2f} req/s")
+
+        # Bỏ token tích luỹ để không bắn burst ngay sau khi bị throttle
+        self.tokens = min(self.tokens, 0.0)
+
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+            print(f"⏳ [{self.host}] Retry-After: pausing {retry_after:.1f}s")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Trạng thái hiện tại để expose qua health route"""
+        blocked_for = max(0.0, self.blocked_until - time.monotonic())
+        return {
+            "rate": round(self.rate, 3),
+            "min_rate": self.min_rate,
+            "max_rate": self.max_rate,
+            "tokens": round(self.tokens, 3),
+            "blocked_for": round(blocked_for, 1),
+            "successes": self.successes,
+            "throttles": self.throttles,
+        }
+
+
+class HostRateLimiter:
+    """Registry các TokenBucket theo host"""
+
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def get_bucket(self, url: str) -> TokenBucket:
+        host = get_host(url)
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(
+                host=host,
+                rate=settings.RATE_LIMIT_INITIAL,
+                min_rate=settings.RATE_LIMIT_MIN,
+                max_rate=settings.RATE_LIMIT_MAX,
+                increase=settings.RATE_LIMIT_INCREASE,
+                decrease=settings.RATE_LIMIT_DECREASE,
+                burst=settings.RATE_LIMIT_BURST
+            )
+            self._buckets[host] = bucket
+        return bucket
+
+    async def acquire(self, url: str) -> None:
+        """Chờ (non-blocking) cho đến khi được phép gửi request tới host của url"""
+        wait = self.get_bucket(url).reserve()
+        if wait > 0:
+            _waited.set(_waited.get() + wait)
+            await asyncio.sleep(wait)
+
+    @staticmethod
+    def waited() -> float:
+        """Tổng thời gian (giây) task hiện tại đã chờ trong acquire(), để loại khỏi latency đo được"""
+        return _waited.get()
+
+    def record_success(self, url: str) -> None:
+        self.get_bucket(url).on_success()
+
+    def record_throttle(self, url: str, retry_after: Optional[str] = None) -> None:
+        self.get_bucket(url).on_throttle(parse_retry_after(retry_after))
+
+    def record_status(self, url: str, status: int, retry_after: Optional[str] = None) -> None:
+        """Cập nhật bucket theo HTTP status của response"""
+        if is_throttle_status(status):
+            self.record_throttle(url, retry_after)
+        elif status < 400:
+            self.record_success(url)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {host: bucket.snapshot() for host, bucket in self._buckets.items()}
+
+
+# Global instance dùng chung cho mọi job (Mitsui, Tokyu) trong process
+rate_limiter = HostRateLimiter()
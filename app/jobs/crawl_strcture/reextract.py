@@ -0,0 +1,192 @@
+"""
+Re-extract offline từ HTML archive (không tải lại site)
+
+Sau khi sửa property_data_extractor / custom_extractor_factory của một site, chạy lại extractor trên version
+HTML mới nhất đã archive của mỗi document trong collection của site rồi cập nhật document:
+
+Chạy: python -m app.jobs.crawl_strcture.reextract --site mitsui [--workers 8] [--limit 100] [--dry-run]
+      python -m app.jobs.crawl_strcture.reextract --site tokyu --url https://... --url https://...
+
+- Field lấy từ HTML được extract lại; network hooks (ảnh từ API, geocoding, station, translate) bị bỏ qua
+  nên các field đó giữ giá trị đã lưu
+- _id, created_date giữ nguyên; thêm `reextracted_date`
+- Document không đổi thì không ghi; --dry-run chỉ đếm số document sẽ thay đổi
+"""
+
+import argparse
+import asyncio
+import logging
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.db.mongodb import get_collection
+from .custom_rules import CustomExtractor
+from .fingerprint import ContentFingerprinter
+from .html_archive import HtmlArchive
+from .property_extractor import PropertyExtractor
+from .site_profile import SiteProfile
+
+logger = logging.getLogger(__name__)
+
+# Fix for Windows ProactorEventLoop issue
+if platform.system() == 'Windows':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+REEXTRACTED_FIELD = "reextracted_date"
+_PRESERVED_FIELDS = ("_id", "created_date")
+_CHUNK_SIZE = 200
+
+
+def _comparable(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in doc.items() if k != REEXTRACTED_FIELD}
+
+
+async def reextract_collection(
+    collection_name: str,
+    custom_extractor_factory: Callable[[], CustomExtractor],
+    site_profile: SiteProfile,
+    urls: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    workers: Optional[int] = None,
+    dry_run: bool = False
+) -> Dict[str, int]:
+    """
+    Re-extract các document của collection từ HTML archive
+
+    Args:
+        collection_name: Collection của site
+        custom_extractor_factory: Factory CustomExtractor của site
+        site_profile: SiteProfile của site (tên site trong archive, pattern fingerprint)
+        urls: Chỉ re-extract các link này (default: toàn bộ collection)
+        limit: Số document tối đa
+        workers: Số thread extract song song (default: settings.REEXTRACT_WORKERS)
+        dry_run: Không ghi vào MongoDB
+
+    Returns:
+        Thống kê: total, updated, unchanged, missing (không có trong archive), failed
+    """
+    archive = HtmlArchive(site_profile.name)
+    fingerprinter = ContentFingerprinter(site_profile.fingerprint_image_patterns) if settings.CONTENT_FINGERPRINT_ENABLED else None
+    extractor = PropertyExtractor(custom_extractor_factory, fingerprinter=fingerprinter, site_profile=site_profile)
+    collection = get_collection(collection_name)
+    stats = {"total": 0, "updated": 0, "unchanged": 0, "missing": 0, "failed": 0}
+
+    def process(doc: Dict[str, Any], entry: Dict[str, Any]) -> Dict[str, Any]:
+        # Chạy trong thread: đọc + giải nén + extract (CPU), không có network
+        html_content = archive.load(entry)
+        return extractor.extract_offline(doc["link"], html_content, doc)
+
+    async def handle_chunk(docs: List[Dict[str, Any]]) -> None:
+        entries = await archive.latest([doc["link"] for doc in docs])
+        loop = asyncio.get_running_loop()
+        jobs = []
+        for doc in docs:
+            entry = entries.get(doc["link"])
+            if entry is None:
+                stats["missing"] += 1
+                continue
+            jobs.append((doc, loop.run_in_executor(executor, process, doc, entry)))
+
+        writes = []
+        for doc, job in jobs:
+            try:
+                result = await job
+            except FileNotFoundError:
+                # Index còn trong Mongo nhưng file archive đã mất
+                stats["missing"] += 1
+                logger.warning(f"Archived HTML file missing for {doc['link']}")
+                continue
+            except Exception as e:
+                stats["failed"] += 1
+                logger.warning(f"Re-extract failed for {doc['link']}: {e}")
+                print(f"❌ Re-extract failed for {doc['link']}: {e}")
+                continue
+
+            document = {**result, **{k: doc[k] for k in _PRESERVED_FIELDS if k in doc}}
+            if _comparable(document) == _comparable(doc):
+                stats["unchanged"] += 1
+                continue
+            stats["updated"] += 1
+            if not dry_run:
+                document[REEXTRACTED_FIELD] = time.time()
+                writes.append(collection.replace_one({"_id": doc["_id"]}, document))
+
+        for result in await asyncio.gather(*writes, return_exceptions=True):
+            if isinstance(result, Exception):
+                stats["failed"] += 1
+                logger.warning(f"Re-extract write failed: {result}")
+
+    query = {"link": {"$in": urls}} if urls else {}
+    cursor = collection.find(query)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    # Thread (không phải process): cache district / city được load trong process hiện tại
+    with ThreadPoolExecutor(max_workers=workers or settings.REEXTRACT_WORKERS) as executor:
+        chunk = []
+        async for doc in cursor:
+            if not doc.get("link"):
+                continue
+            stats["total"] += 1
+            chunk.append(doc)
+            if len(chunk) >= _CHUNK_SIZE:
+                await handle_chunk(chunk)
+                chunk = []
+                print(f"🔁 Re-extracted {stats['total']} documents ({stats['updated']} changed)")
+        if chunk:
+            await handle_chunk(chunk)
+
+    print(f"""
+    ✅ Re-extract completed{' (dry run)' if dry_run else ''}:
+        Collection: {collection_name}
+        Documents: {stats['total']}
+        {'Would update' if dry_run else 'Updated'}: {stats['updated']}
+        Unchanged: {stats['unchanged']}
+        Not in archive: {stats['missing']}
+        Failed: {stats['failed']}
+    """)
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Re-extract stored properties from the HTML archive")
+    parser.add_argument('--site', choices=['mitsui', 'tokyu'], required=True)
+    parser.add_argument('--url', action='append', default=[], help="Chỉ re-extract link này (lặp lại được)")
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--dry-run', action='store_true', help="Không ghi vào MongoDB")
+    args = parser.parse_args()
+
+    from app.db.mongodb import connect_to_mongo, close_mongo_connection
+    from app.utils import city_utils, prefecture_utils, district_utils
+    if args.site == 'mitsui':
+        from app.jobs.mitsui_crawl_page.custom_extractor_factory import setup_custom_extractor
+        from app.jobs.mitsui_crawl_page.constants import COLLECTION_NAME, SITE_PROFILE
+    else:
+        from app.jobs.tokyu_crawl_page.custom_extractor_factory import setup_custom_extractor
+        from app.jobs.tokyu_crawl_page.constants import COLLECTION_NAME, SITE_PROFILE
+
+    try:
+        await connect_to_mongo()
+        await city_utils.init()
+        await prefecture_utils.init()
+        district_utils.ensure_district_index()
+
+        await reextract_collection(
+            COLLECTION_NAME,
+            setup_custom_extractor,
+            SITE_PROFILE,
+            urls=args.url or None,
+            limit=args.limit,
+            workers=args.workers,
+            dry_run=args.dry_run
+        )
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Retry policy cho detail-page fetch
+
+- Phân loại lỗi: retryable (timeout, connection reset, 408/425/429/5xx) hay fatal (404, URL sai, ...)
+- Backoff: exponential với full jitter
+- RetryBudget: giới hạn tổng số retry trong một lần chạy theo tỷ lệ số request,
+  tránh việc site đang chậm khiến mình nhân số request lên nhiều lần
+"""
+
+import asyncio
+import random
+from typing import Optional
+
+import aiohttp
+
+from app.core.config import settings
+from .transport import TransportError
+
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class RetryPolicy:
+    """Quy tắc retry: phân loại lỗi + tính thời gian backoff"""
+
+    def __init__(
+        self,
+        max_attempts: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None
+    ):
+        self.max_attempts = max_attempts or settings.RETRY_MAX_ATTEMPTS
+        self.base_delay = base_delay if base_delay is not None else settings.RETRY_BASE_DELAY
+        self.max_delay = max_delay if max_delay is not None else settings.RETRY_MAX_DELAY
+
+    @staticmethod
+    def is_retryable_status(status: int) -> bool:
+        return status in RETRYABLE_STATUSES
+
+    @staticmethod
+    def is_retryable_exception(error: BaseException) -> bool:
+        """Timeout, lỗi kết nối, payload bị cắt giữa chừng → retry; còn lại (URL sai, redirect loop, ...) → fatal"""
+        if isinstance(error, asyncio.TimeoutError):
+            return True
+        if isinstance(error, TransportError):
+            return error.retryable
+        if isinstance(error, aiohttp.ClientResponseError):
+            return RetryPolicy.is_retryable_status(error.status)
+        if isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)):
+            return True
+        if isinstance(error, (ConnectionResetError, ConnectionAbortedError)):
+            return True
+        return False
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter: uniform(0, min(max_delay, base_delay * 2^attempt))"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class RetryBudget:
+    """
+    Ngân sách retry cho một lần chạy
+
+    Số retry cho phép = min_retries + ratio * số request gốc.
+    """
+
+    def __init__(self, ratio: Optional[float] = None, min_retries: Optional[int] = None):
+        self.ratio = ratio if ratio is not None else settings.RETRY_BUDGET_RATIO
+        self.min_retries = min_retries if min_retries is not None else settings.RETRY_BUDGET_MIN
+        self.requests = 0
+        self.retries = 0
+        self._exhausted_logged = False
+
+    @property
+    def allowed(self) -> int:
+        return self.min_retries + int(self.requests * self.ratio)
+
+    def record_request(self) -> None:
+        self.requests += 1
+
+    def try_consume(self) -> bool:
+        """Trừ 1 retry khỏi ngân sách, False nếu đã hết"""
+        if self.retries >= self.allowed:
+            if not self._exhausted_logged:
+                print(f"💸 Retry budget exhausted ({self.retries}/{self.allowed} retries for {self.requests} requests)")
+                self._exhausted_logged = True
+            return False
+        self.retries += 1
+        self._exhausted_logged = False
+        return True
+
+    def summary(self) -> str:
+        return f"{self.retries}/{self.allowed} retries used for {self.requests} requests"
@@ -0,0 +1,57 @@
+"""
+Site profile - cấu hình fetch/extract riêng của từng site
+
+Gom các tham số theo site (section ảnh cho fingerprint, marker kết thúc body, ...) vào một object
+thay vì truyền từng tham số qua crawl_multi → crawl_multi_pages → crawl_pages → crawler → extractor.
+Mỗi site khai báo SITE_PROFILE trong constants.py của nó.
+"""
+
+import re
+from typing import Optional, Sequence
+
+from app.core.config import settings
+from .url_canonicalizer import UrlCanonicalizer, DEFAULT_CANONICALIZER
+
+
+class SiteProfile:
+    """Cấu hình theo site"""
+
+    def __init__(
+        self,
+        name: str,
+        fingerprint_image_patterns: Sequence[str] = (),
+        body_end_marker: Optional[str] = None,
+        max_body_bytes: Optional[int] = None,
+        transport: Optional[str] = None,
+        dead_redirect_patterns: Sequence[str] = (),
+        canonicalizer: Optional[UrlCanonicalizer] = None
+    ):
+        """
+        Args:
+            name: Tên site (để log)
+            fingerprint_image_patterns: Regex (group 1) các section ảnh, đưa vào content fingerprint
+            body_end_marker: Chuỗi ASCII đánh dấu phần HTML cuối cùng extractor cần; đọc body dừng sau khi
+                             gặp marker (None = đọc hết body)
+            max_body_bytes: Kích thước body tối đa (default: settings.CRAWLER_MAX_BODY_BYTES)
+            transport: HTTP backend 'aiohttp' | 'httpx' (default: settings.CRAWLER_TRANSPORT),
+                       so sánh bằng app/tests/transport/benchmark.py
+            dead_redirect_patterns: Regex URL đích cho biết detail page đã đóng (vd: redirect về trang search)
+            canonicalizer: Rule chuẩn hoá detail URL từ trang listing (default: chỉ chuẩn hoá chung)
+        """
+        self.name = name
+        self.fingerprint_image_patterns = tuple(fingerprint_image_patterns)
+        self.body_end_marker = body_end_marker
+        self.max_body_bytes = max_body_bytes or settings.CRAWLER_MAX_BODY_BYTES
+        self.transport = transport or settings.CRAWLER_TRANSPORT
+        self.dead_redirect_patterns = tuple(re.compile(p) for p in dead_redirect_patterns)
+        self.canonicalizer = canonicalizer or DEFAULT_CANONICALIZER
+
+    def is_dead_redirect(self, url: str) -> bool:
+        """URL đích của redirect có phải trang 'không còn phòng' (search / top page) không"""
+        return any(p.search(url) for p in self.dead_redirect_patterns)
+
+    def __repr__(self) -> str:
+        return f"SiteProfile({self.name!r})"
+
+
+DEFAULT_SITE_PROFILE = SiteProfile("default")
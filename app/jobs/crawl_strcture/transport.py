@@ -0,0 +1,405 @@
+"""
+HTTP transport cho crawler
+
+Tách phần gửi request khỏi PropertyExtractor / ListingFetcher để chọn backend theo site profile:
+- aiohttp (mặc định): HTTP/1.1, một session + connector mỗi host (CrawlerPool)
+- httpx:  HTTP/2 khi server hỗ trợ (nhiều request multiplex trên một connection),
+          cần `pip install httpx[http2]` - không có thì tự quay về aiohttp
+
+Lỗi timeout của mọi backend được đưa về asyncio.TimeoutError, lỗi kết nối về TransportError,
+để RetryPolicy và rate limiter xử lý giống nhau.
+
+Khi CRAWLER_CASSETTE_MODE=record|replay, transport được bọc bởi CassetteTransport (app/utils/cassette_utils.py).
+"""
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Mapping, Optional
+
+import aiohttp
+
+from app.core.config import CrawlerConfig, settings
+from app.utils.cassette_utils import Cassette, cassette_key, get_cassette
+from .crawler_pool import CrawlerPool, register_active_pool
+
+AIOHTTP = "aiohttp"
+HTTPX = "httpx"
+
+
+class TransportError(Exception):
+    """Lỗi kết nối / giao thức của transport không phải aiohttp"""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class TransportResponse(ABC):
+    """Response chung cho mọi backend (chỉ dùng bên trong `async with transport.stream(...)`)"""
+
+    status: int
+    headers: Mapping[str, str]
+    charset: Optional[str]
+    content_length: Optional[int]
+    url: str  # URL cuối cùng (sau redirect)
+    redirected: bool
+
+    @abstractmethod
+    def iter_chunks(self, size: int) -> AsyncIterator[bytes]:
+        ...
+
+    @abstractmethod
+    async def drain(self) -> None:
+        """Đọc bỏ phần body còn lại (sau iter_chunks) để connection được dùng lại"""
+
+    @abstractmethod
+    async def read(self) -> bytes:
+        ...
+
+    @abstractmethod
+    async def text(self) -> str:
+        ...
+
+
+class _AiohttpResponse(TransportResponse):
+    def __init__(self, response: aiohttp.ClientResponse):
+        self._response = response
+        self.status = response.status
+        self.headers = response.headers
+        self.charset = response.charset
+        self.content_length = response.content_length
+        self.url = str(response.url)
+        self.redirected = bool(response.history)
+
+    def iter_chunks(self, size: int) -> AsyncIterator[bytes]:
+        return self._response.content.iter_chunked(size)
+
+    async def drain(self) -> None:
+        await self._response.content.read()
+
+    async def read(self) -> bytes:
+        return await self._response.read()
+
+    async def text(self) -> str:
+        return await self._response.text()
+
+
+class _HttpxResponse(TransportResponse):
+    def __init__(self, response: Any):
+        self._response = response
+        self._iterator: Optional[AsyncIterator[bytes]] = None
+        self.status = response.status_code
+        self.headers = response.headers
+        self.charset = response.charset_encoding
+        length = response.headers.get('content-length')
+        self.content_length = int(length) if length and length.isdigit() else None
+        self.url = str(response.url)
+        self.redirected = bool(response.history)
+
+    def iter_chunks(self, size: int) -> AsyncIterator[bytes]:
+        # Giữ iterator để drain() đọc tiếp (httpx không cho aread() sau khi đã stream)
+        self._iterator = self._response.aiter_bytes(size)
+        return self._iterator
+
+    async def drain(self) -> None:
+        if self._iterator is not None:
+            async for _ in self._iterator:
+                pass
+
+    async def read(self) -> bytes:
+        return await self._response.aread()
+
+    async def text(self) -> str:
+        await self._response.aread()
+        return self._response.text
+
+
+class Transport(ABC):
+    """Interface: `async with transport.stream(url) as response: ...` (backend thiếu method → lỗi ngay khi khởi tạo)"""
+
+    name = ""
+
+    @abstractmethod
+    def stream(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        proxy: Optional[str] = None
+    ):
+        ...
+
+    @abstractmethod
+    async def close(self) -> None:
+        ...
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"transport": self.name}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class AiohttpTransport(Transport):
+    """aiohttp qua CrawlerPool (session/connector theo host, warm-up, connection counters)"""
+
+    name = AIOHTTP
+
+    def __init__(self, pool_size: int, headers: Optional[Dict[str, str]] = None, timeout: Optional[int] = None):
+        self.pool = CrawlerPool(pool_size=pool_size, headers=headers, timeout=timeout)
+
+    @asynccontextmanager
+    async def stream(self, url, params=None, headers=None, proxy=None):
+        session = await self.pool.session_for(url)
+        async with session.get(url, params=params, headers=headers, proxy=proxy) as response:
+            yield _AiohttpResponse(response)
+
+    async def close(self) -> None:
+        await self.pool.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return self.pool.snapshot()
+
+
+class HttpxTransport(Transport):
+    """httpx.AsyncClient với HTTP/2, một client cho mỗi proxy (httpx cấu hình proxy theo client)"""
+
+    name = HTTPX
+
+    def __init__(
+        self,
+        pool_size: int,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[int] = None,
+        http2: bool = True
+    ):
+        # Import lazy: httpx / h2 là optional dependency
+        import httpx
+        if http2:
+            import h2  # noqa: F401  (httpx cần h2 cho HTTP/2)
+
+        config = CrawlerConfig()
+        self._httpx = httpx
+        self.pool_size = pool_size
+        self.http2 = http2
+        self.headers = headers or config.get_headers()
+        self.timeout = timeout or config.get_timeout()
+        self._clients: Dict[Optional[str], Any] = {}
+        self._closed = False
+        self.requests = 0
+        self.http_versions: Counter = Counter()
+        register_active_pool(self)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _client(self, proxy: Optional[str]):
+        client = self._clients.get(proxy)
+        if client is None:
+            httpx = self._httpx
+            client = httpx.AsyncClient(
+                http2=self.http2,
+                headers=self.headers,
+                timeout=httpx.Timeout(self.timeout, connect=10),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                follow_redirects=True,  # giống mặc định của aiohttp
+                proxy=proxy
+            )
+            self._clients[proxy] = client
+        return client
+
+    @asynccontextmanager
+    async def stream(self, url, params=None, headers=None, proxy=None):
+        httpx = self._httpx
+        try:
+            async with self._client(proxy).stream("GET", url, params=params, headers=headers) as response:
+                self.requests += 1
+                self.http_versions[response.http_version] += 1
+                yield _HttpxResponse(response)
+        except httpx.TimeoutException as e:
+            raise asyncio.TimeoutError(str(e)) from e
+        except httpx.UnsupportedProtocol as e:
+            raise TransportError(f"{type(e).__name__}: {e}", retryable=False) from e
+        except httpx.TransportError as e:
+            raise TransportError(f"{type(e).__name__}: {e}", retryable=True) from e
+
+    async def close(self) -> None:
+        self._closed = True
+        if self.requests:
+            versions = ", ".join(f"{v}: {n}" for v, n in self.http_versions.items())
+            print(f"📡 [httpx] {self.requests} requests ({versions})")
+        for client in self._clients.values():
+            try:
+                await client.aclose()
+            except Exception as e:
+                print(f"⚠️ [httpx] Error closing client: {e}")
+        self._clients.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "transport": self.name,
+            "http2": self.http2,
+            "pool_size": self.pool_size,
+            "requests": self.requests,
+            "http_versions": dict(self.http_versions),
+            "clients": len(self._clients),
+        }
+
+
+def _decode(body: bytes, charset: Optional[str]) -> str:
+    try:
+        return body.decode(charset or 'utf-8', errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+
+class _RecordingResponse(TransportResponse):
+    """Bọc response thật, giữ lại các byte đã đọc để ghi vào cassette"""
+
+    def __init__(self, response: TransportResponse):
+        self._response = response
+        self.body = bytearray()
+        self.status = response.status
+        self.headers = response.headers
+        self.charset = response.charset
+        self.content_length = response.content_length
+        self.url = response.url
+        self.redirected = response.redirected
+
+    async def iter_chunks(self, size: int) -> AsyncIterator[bytes]:
+        async for chunk in self._response.iter_chunks(size):
+            self.body.extend(chunk)
+            yield chunk
+
+    async def drain(self) -> None:
+        # Phần bị drain không được extractor dùng → không cần ghi
+        await self._response.drain()
+
+    async def read(self) -> bytes:
+        body = await self._response.read()
+        self.body.extend(body)
+        return body
+
+    async def text(self) -> str:
+        return _decode(await self.read(), self.charset)
+
+
+class _ReplayResponse(TransportResponse):
+    """Response dựng lại từ một entry của cassette"""
+
+    def __init__(self, entry: Dict[str, Any], url: str):
+        from requests.structures import CaseInsensitiveDict
+
+        self._body = Cassette.body_of(entry)
+        self.status = entry["status"]
+        self.headers = CaseInsensitiveDict(entry.get("headers") or {})
+        content_type = self.headers.get('Content-Type', '')
+        self.charset = content_type.split('charset=')[-1].strip(' ;"\'') if 'charset=' in content_type else None
+        self.content_length = len(self._body)
+        self.url = entry.get("url") or url
+        self.redirected = bool(entry.get("redirected"))
+
+    async def iter_chunks(self, size: int) -> AsyncIterator[bytes]:
+        for start in range(0, len(self._body), size):
+            yield self._body[start:start + size]
+
+    async def drain(self) -> None:
+        return None
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self) -> str:
+        return _decode(self._body, self.charset)
+
+
+class CassetteTransport(Transport):
+    """
+    Record: gửi request qua transport thật rồi ghi response (phần body đã đọc) vào cassette
+    Replay: không có network, trả response đã ghi với độ trễ như lúc record × CRAWLER_CASSETTE_REPLAY_LATENCY
+    """
+
+    def __init__(self, cassette: Cassette, inner: Optional[Transport] = None):
+        self.cassette = cassette
+        self.inner = inner
+        self.name = f"cassette:{cassette.mode}" + (f"+{inner.name}" if inner else "")
+
+    @asynccontextmanager
+    async def stream(self, url, params=None, headers=None, proxy=None):
+        conditional = bool(headers and ('If-None-Match' in headers or 'If-Modified-Since' in headers))
+        key = cassette_key("GET", url, params, conditional)
+
+        if self.cassette.replaying:
+            entry = self.cassette.lookup(key)
+            if entry is None:
+                raise TransportError(f"Not in cassette: {key}", retryable=False)
+            delay = self.cassette.replay_delay(entry)
+            if delay:
+                await asyncio.sleep(delay)
+            yield _ReplayResponse(entry, url)
+            return
+
+        started = time.monotonic()
+        async with self.inner.stream(url, params=params, headers=headers, proxy=proxy) as response:
+            recording = _RecordingResponse(response)
+            try:
+                yield recording
+            finally:
+                self.cassette.record(
+                    key, recording.status, recording.headers, bytes(recording.body), time.monotonic() - started,
+                    url=recording.url if recording.redirected else None
+                )
+
+    async def close(self) -> None:
+        if self.inner:
+            await self.inner.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = self.inner.snapshot() if self.inner else {}
+        data.update({
+            "cassette": self.cassette.mode,
+            "recorded": self.cassette.recorded,
+            "replayed": self.cassette.replayed,
+            "misses": self.cassette.misses,
+        })
+        return data
+
+
+def create_transport(
+    name: Optional[str] = None,
+    pool_size: int = 10,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[int] = None
+) -> Transport:
+    """
+    Tạo transport theo tên (thường là site_profile.transport)
+
+    Args:
+        name: 'aiohttp' | 'httpx' (default: settings.CRAWLER_TRANSPORT)
+        pool_size: Số connection tối đa (aiohttp: mỗi host, httpx: mỗi client)
+    """
+    cassette = get_cassette()
+    if cassette and cassette.replaying:
+        # Replay: không mở connection nào
+        return CassetteTransport(cassette)
+
+    name = (name or settings.CRAWLER_TRANSPORT).lower()
+    transport: Optional[Transport] = None
+    if name == HTTPX:
+        try:
+            transport = HttpxTransport(pool_size, headers=headers, timeout=timeout)
+        except ImportError as e:
+            print(f"⚠️ httpx transport unavailable ({e}), falling back to aiohttp. Install with: pip install 'httpx[http2]'")
+    elif name != AIOHTTP:
+        print(f"⚠️ Unknown transport '{name}', using aiohttp")
+    if transport is None:
+        transport = AiohttpTransport(pool_size, headers=headers, timeout=timeout)
+
+    return CassetteTransport(cassette, transport) if cassette else transport
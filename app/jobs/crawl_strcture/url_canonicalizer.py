@@ -0,0 +1,128 @@
+"""
+URL canonicalization + frontier (seen-set) cho một lần chạy crawl
+
+URL từ trang listing (data-js-room-link của Mitsui, href tương đối của Tokyu) có thể trùng nhau dưới
+nhiều dạng: thứ tự query khác nhau, tracking params, dấu / cuối, http/https, host viết hoa, #fragment.
+Cùng một phòng còn có thể xuất hiện trên hai trang listing khi phân trang bị đẩy trong lúc crawl.
+
+- UrlCanonicalizer: chuẩn hoá URL theo rule của site (SiteProfile.canonicalizer)
+- UrlFrontier: canonicalize + bỏ URL đã thấy trong run → mỗi phòng chỉ được fetch / enrich một lần
+
+Link đang lưu trong MongoDB đã ở dạng canonical (https, không / cuối, không tracking params) nên không làm đổi ID.
+"""
+
+import re
+from typing import Iterable, List, Optional, Sequence, Set
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+# Params chỉ dùng để tracking, không đổi nội dung trang
+TRACKING_PARAMS = frozenset({'gclid', 'fbclid', 'yclid', 'msclkid', 'dclid', '_ga', '_gl', 'mc_cid', 'mc_eid'})
+TRACKING_PREFIXES = ('utm_',)
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+_PERCENT_ESCAPE = re.compile(r'%[0-9a-fA-F]{2}')
+
+
+class UrlCanonicalizer:
+    """Rule chuẩn hoá URL của một site"""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        keep_params: Optional[Sequence[str]] = None,
+        drop_params: Sequence[str] = (),
+        strip_trailing_slash: bool = True
+    ):
+        """
+        Args:
+            base_url: URL gốc của site - để resolve href tương đối, và URL cùng host được đưa về scheme của base_url
+            keep_params: Chỉ giữ các query param này (None = giữ tất cả trừ tracking / drop_params, () = bỏ query)
+            drop_params: Query param riêng của site không ảnh hưởng nội dung (vd: tham số sort của listing)
+            strip_trailing_slash: Bỏ / cuối path (trừ path gốc "/")
+        """
+        self.base_url = base_url
+        self.keep_params = frozenset(keep_params) if keep_params is not None else None
+        self.drop_params = frozenset(drop_params)
+        self.strip_trailing_slash = strip_trailing_slash
+        base = urlsplit(base_url) if base_url else None
+        self._base_scheme = base.scheme.lower() if base else None
+        self._base_host = base.hostname.lower() if base and base.hostname else None
+
+    def _keep_param(self, name: str) -> bool:
+        if self.keep_params is not None:
+            return name in self.keep_params
+        lowered = name.lower()
+        return not (
+            lowered in TRACKING_PARAMS
+            or lowered.startswith(TRACKING_PREFIXES)
+            or name in self.drop_params
+        )
+
+    def canonicalize(self, url: str) -> Optional[str]:
+        """URL canonical, None nếu không phải URL http(s) hợp lệ"""
+        if not url:
+            return None
+        url = url.strip()
+        if self.base_url:
+            url = urljoin(self.base_url, url)
+
+        try:
+            parts = urlsplit(url)
+            port = parts.port
+        except ValueError:
+            return None
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or '').lower()
+        if scheme not in _DEFAULT_PORTS or not host:
+            return None
+
+        # Cùng host với site → cùng scheme với base_url (http/https của một trang là một)
+        if self._base_host and host == self._base_host:
+            scheme = self._base_scheme
+
+        netloc = host if port in (None, _DEFAULT_PORTS[scheme]) else f"{host}:{port}"
+
+        path = _PERCENT_ESCAPE.sub(lambda m: m.group(0).upper(), parts.path) or '/'
+        if self.strip_trailing_slash and len(path) > 1:
+            path = path.rstrip('/') or '/'
+
+        query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if self._keep_param(k)]
+        return urlunsplit((scheme, netloc, path, urlencode(sorted(query)), ''))
+
+
+DEFAULT_CANONICALIZER = UrlCanonicalizer()
+
+
+class UrlFrontier:
+    """URL đã thấy trong một lần chạy (theo dạng canonical)"""
+
+    def __init__(self, canonicalizer: Optional[UrlCanonicalizer] = None):
+        self.canonicalizer = canonicalizer or DEFAULT_CANONICALIZER
+        self._seen: Set[str] = set()
+        self.urls: List[str] = []  # URL canonical theo thứ tự phát hiện
+        self.duplicates = 0
+        self.invalid = 0
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._seen
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def add(self, urls: Iterable[str]) -> List[str]:
+        """Canonicalize và trả về các URL chưa thấy (giữ thứ tự)"""
+        new_urls = []
+        for raw in urls:
+            url = self.canonicalizer.canonicalize(raw)
+            if url is None:
+                self.invalid += 1
+                continue
+            if url in self._seen:
+                self.duplicates += 1
+                continue
+            self._seen.add(url)
+            new_urls.append(url)
+        self.urls.extend(new_urls)
+        return new_urls
+
+    def summary(self) -> str:
+        return f"{len(self._seen)} unique, {self.duplicates} duplicates, {self.invalid} invalid"
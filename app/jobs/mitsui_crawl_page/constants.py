@@ -4,9 +4,11 @@ Constants and configurations for Mitsui crawling
 from typing import Final
 
 from app.core.config import settings
+from app.jobs.crawl_strcture.site_profile import SiteProfile
+from app.jobs.crawl_strcture.url_canonicalizer import UrlCanonicalizer
 
 # URL and selector configurations
-URL_MULTI: Final = 'https://www.mitsui-chintai.co.jp/rf/result?'  # Trang chứa các thẻ có phân trang của mitsui
+URL_MULTI: Final = f'{settings.MITSUI_BASE_URL}/rf/result?'  # Trang chứa các thẻ có phân trang của mitsui
 ITEM_SELECTOR: Final = 'tr.c-room-list__body-row[data-js-room-link]'  # Thẻ phần tử
 ITEM_MAX_NUM_PAGE: Final = 'li.c-pagination__item > a.c-pagination__link[href]'
 
@@ -15,6 +17,22 @@ ID_MONGO = settings.ID_MONGO_MITSUI
 COLLECTION_NAME = settings.COLLECTION_NAME_MITSUI
 DEFAULT_NUM_PAGES = 74 #74
 
+# Section ảnh đưa vào content fingerprint (ảnh Mitsui nằm trong biến JS của trang)
+FINGERPRINT_IMAGE_PATTERNS: Final = (
+    r'(RF_firstfloorplan_photo\s*=\s*["\'][^"\']*["\'])',
+    r'(RF_gallery_url\s*=\s*["\'][^"\']*["\'])',
+)
+
+# Fetch/extract config của site. Chưa có end marker: vị trí các biến RF_* trong trang chưa được xác nhận
+SITE_PROFILE: Final = SiteProfile(
+    name='Mitsui',
+    fingerprint_image_patterns=FINGERPRINT_IMAGE_PATTERNS,
+    # Phòng đã đóng → redirect về trang kết quả tìm kiếm
+    dead_redirect_patterns=(r'/rf/result', r'^https?://[^/]+/?$'),
+    # data-js-room-link có thể là link tương đối / khác scheme
+    canonicalizer=UrlCanonicalizer(base_url=settings.MITSUI_BASE_URL),
+)
+
 # Default amenities configuration
 DEFAULT_AMENITIES = {
     "room_link": "mitsui_link",
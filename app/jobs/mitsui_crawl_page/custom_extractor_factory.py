@@ -7,6 +7,7 @@ from typing import Dict, Any
 from app.jobs.crawl_strcture.custom_rules import CustomExtractor
 from app.jobs.mitsui_crawl_page.image_extractor import ImageExtractor
 from app.jobs.mitsui_crawl_page.property_data_extractor import PropertyDataExtractor
+from app.utils.html_document_utils import HtmlDocument
 
 
 class CustomExtractorFactory:
@@ -28,8 +29,9 @@ class CustomExtractorFactory:
         return wrapper_func
     
     def _store_html(self, html: str, data: Dict[str, Any]) -> tuple:
-        """Store HTML in data for post-hooks"""
+        """Store HTML (và document lxml parse lazy, dùng chung cho mọi hook) in data for post-hooks"""
         data['_html'] = html
+        data['_doc'] = HtmlDocument(html)
         return html, data
     
     def setup_custom_extractor(self) -> CustomExtractor:
@@ -47,6 +49,7 @@ class CustomExtractorFactory:
         processors = [
             image_extractor.extract_images,           # 1. Extract images
             property_extractor.get_static_info,       # 2. Extract all static info
+            property_extractor.translate_building_name, # 2b. Translate building name
             property_extractor.convert_coordinates,   # 3. Convert coordinates
             property_extractor.set_default_amenities, # 4. Set default amenities
             property_extractor.process_pricing,       # 5. Calculate pricing
@@ -56,9 +59,30 @@ class CustomExtractorFactory:
             property_extractor.cleanup_temp_fields,   # 9. Cleanup temporary fields
         ]
         
+        # Gọi dịch vụ ngoài → bỏ qua khi re-extract offline (giữ giá trị đã lưu)
+        network_processors = {
+            image_extractor.extract_images,           # Gallery JSON API
+            property_extractor.translate_building_name,
+            property_extractor.convert_coordinates,
+            property_extractor.extract_station,
+        }
+        
+        # Chỉ dùng HTML + field của processor trước → chạy được trong worker process (extract_pool.py)
+        # get_info_district không thuộc nhóm này: cần map_lat/lng từ convert_coordinates + cache district
+        cpu_processors = {
+            property_extractor.get_static_info,
+            property_extractor.set_default_amenities,
+            property_extractor.process_pricing,
+            property_extractor.extract_deposit_key_info,
+        }
+        
         # Add all processors with error handling
         for processor in processors:
-            extractor.add_post_hook(self._create_safe_wrapper(processor))
+            extractor.add_post_hook(
+                self._create_safe_wrapper(processor),
+                network=processor in network_processors,
+                cpu_bound=processor in cpu_processors
+            )
         
         return extractor
 
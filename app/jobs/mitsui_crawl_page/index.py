@@ -3,23 +3,24 @@ Mitsui crawling entry point
 Optimized version with better error handling and structure
 Using lxml for faster HTML parsing
 """
-import requests
 from lxml import html
 from typing import List, Tuple, Optional
 
 from app.jobs.crawl_strcture.index import crawl_pages
+from app.jobs.crawl_strcture.listing_fetcher import ListingFetcher
+from app.jobs.crawl_strcture.listing_delta import row_signature
 from app.core.config import settings
 from .custom_extractor_factory import setup_custom_extractor
-from .constants import URL_MULTI, ITEM_SELECTOR, DEFAULT_NUM_PAGES, ID_MONGO, COLLECTION_NAME, ITEM_MAX_NUM_PAGE
+from .constants import URL_MULTI, ITEM_SELECTOR, DEFAULT_NUM_PAGES, ID_MONGO, COLLECTION_NAME, ITEM_MAX_NUM_PAGE, SITE_PROFILE
 
 # Lấy link của nhà trong trang
-def _fetch_page_urls(page: int, headers: dict, detect_max_pages: bool = False) -> Tuple[List[str], Optional[int]]:
+async def _fetch_page_urls(page: int, fetcher: ListingFetcher, detect_max_pages: bool = False) -> Tuple[List[str], Optional[int]]:
     """
     Fetch URLs from a single page
     
     Args:
         page: Page number to fetch
-        headers: Request headers
+        fetcher: Async listing fetcher (aiohttp session, retry, rate limit)
         detect_max_pages: If True, also detect maximum pages from pagination
         
     Returns:
@@ -28,48 +29,52 @@ def _fetch_page_urls(page: int, headers: dict, detect_max_pages: bool = False) -
     urls = []
     max_pages = None
     
-    try:
-        params = {"page": page}
-        resp = requests.get(URL_MULTI, params=params, headers=headers, timeout=30)
-        
-        if resp.status_code != 200:
-            print(f"❌ Failed to load page {page}: HTTP {resp.status_code}")
-            return urls, max_pages
-        
-        # Parse HTML with lxml (faster than BeautifulSoup)
-        tree = html.fromstring(resp.content)
-        
-        # Extract items using CSS selector
-        items = tree.cssselect(ITEM_SELECTOR)
-        print(f"📄 Page {page}: Found {len(items)} items")
-        
-        for item in items:
-            link = item.get("data-js-room-link")
-            if link:
-                urls.append(link)
+    params = {"page": page}
+    content = await fetcher.fetch(URL_MULTI, params=params)
+    
+    if content is None:
+        print(f"❌ Failed to load page {page}")
+        return urls, max_pages
+    
+    # Trang không đổi từ lần chạy trước → dùng lại URL đã parse
+    cached = fetcher.cached_page(URL_MULTI, params, content)
+    if cached:
+        print(f"📄 Page {page}: unchanged, {len(cached.urls)} items")
+        return cached.urls, cached.max_pages if detect_max_pages else None
+    
+    # Parse HTML with lxml (faster than BeautifulSoup)
+    tree = html.fromstring(content)
+    
+    # Extract items using CSS selector
+    items = tree.cssselect(ITEM_SELECTOR)
+    print(f"📄 Page {page}: Found {len(items)} items")
+    
+    for item in items:
+        link = item.get("data-js-room-link")
+        if link:
+            urls.append(link)
+            # Dòng kết quả có giá thuê, layout, diện tích → signature để bỏ qua detail page không đổi
+            fetcher.row_signatures[link] = row_signature(item.text_content())
+    
+    # Detect max pages if requested (only on first page)
+    if detect_max_pages:
+        pagination_links = tree.cssselect(ITEM_MAX_NUM_PAGE)
         
-        # Detect max pages if requested (only on first page)
-        if detect_max_pages:
-            pagination_links = tree.cssselect(ITEM_MAX_NUM_PAGE)
-            
-            if pagination_links:
-                last_link = pagination_links[-1]
-                href = last_link.get("href", "")
-                
-                if "page=" in href:
-                    try:
-                        max_pages = int(href.split("page=")[-1].split("&")[0])
-                        print(f"✅ Detected maximum pages: {max_pages}")
-                    except ValueError:
-                        print(f"⚠️ Could not parse page number from: {href}")
+        if pagination_links:
+            last_link = pagination_links[-1]
+            href = last_link.get("href", "")
             
-            if max_pages is None:
-                print(f"⚠️ Could not detect max pages, will use default: {DEFAULT_NUM_PAGES}")
+            if "page=" in href:
+                try:
+                    max_pages = int(href.split("page=")[-1].split("&")[0])
+                    print(f"✅ Detected maximum pages: {max_pages}")
+                except ValueError:
+                    print(f"⚠️ Could not parse page number from: {href}")
         
-    except requests.exceptions.Timeout:
-        print(f"⏰ Timeout loading page {page}")
-    except Exception as e:
-        print(f"❌ Error loading page {page}: {e}")
+        if max_pages is None:
+            print(f"⚠️ Could not detect max pages, will use default: {DEFAULT_NUM_PAGES}")
+    
+    fetcher.remember_page(URL_MULTI, params, content, urls, max_pages)
     
     return urls, max_pages
 
@@ -87,5 +92,6 @@ async def crawl_multi():
         default_num_pages=DEFAULT_NUM_PAGES,
         id_mongo=ID_MONGO,
         collection_name=COLLECTION_NAME,
-        custom_extractor_factory=setup_custom_extractor
+        custom_extractor_factory=setup_custom_extractor,
+        site_profile=SITE_PROFILE
     )
\ No newline at end of file
@@ -5,7 +5,11 @@ import calendar
 from typing import Dict, Any, Optional, Tuple
 from datetime import datetime, date
 
+from lxml.cssselect import CSSSelector
+
 from app.utils.html_processor_utils import HtmlProcessor
+from app.utils.html_document_utils import HtmlDocument, text_of
+from app.jobs.crawl_strcture.field_schema import FieldSchema, FieldSpec
 from app.utils.direction_utils import extract_direction_info
 from app.utils.structure_utils import extract_structure_info as utils_extract_structure_info
 from app.utils.amenities_utils import apply_amenities_to_data
@@ -18,6 +22,111 @@ from app.utils.location_utils import get_district_info
 from app.utils.room_type_utils import extract_room_type
 from app.utils.translate_utils import translate_ja_to_en
 
+# Selector compile một lần, dùng với data['_doc']
+_H1 = CSSSelector('h1')
+_RENT_DD = CSSSelector('dd[class*="__rent"]')
+
+_PARKING_NEGATIVE = ['なし', '無し', '×', '不可', 'ー', '無', 'NO', 'No', 'no']
+
+
+#=========================# Field converters (text dd → value) #======================#
+
+def parse_available_from(text: str) -> Optional[str]:
+    """入居可能日 → ISO date"""
+    current_year = datetime.now().year
+    parsed_date = None
+
+    if "即可" in text:
+        parsed_date = date.today()
+    else:
+        for key, day in {"上旬": "5日", "中旬": "15日", "下旬": "25日"}.items():
+            text = re.sub(rf'(\d{{4}}年)?(\d{{1,2}})月{key}', 
+                        lambda m: f"{m.group(1) or str(current_year)+'年'}{m.group(2)}月{day}", text)
+
+        if m := re.search(r'(\d{4})?年?(\d{1,2})月末', text):
+            year = int(m.group(1)) if m.group(1) else current_year
+            month = int(m.group(2))
+            last_day = calendar.monthrange(year, month)[1]
+            text = f"{year}年{month}月{last_day}日"
+
+        patterns = [
+            (r'(\d{4})年(\d{1,2})月(\d{1,2})日', lambda y,m,d: date(int(y), int(m), int(d))),
+            (r'(\d{1,2})月(\d{1,2})日', lambda m,d: date(current_year, int(m), int(d))),
+            (r'(\d{4})/(\d{1,2})/(\d{1,2})', lambda y,m,d: date(int(y), int(m), int(d))),
+            (r'(\d{1,2})/(\d{1,2})', lambda m,d: date(current_year, int(m), int(d))),
+        ]
+
+        for pat, conv in patterns:
+            if m := re.search(pat, text):
+                parsed_date = conv(*m.groups())
+                break
+
+    return parsed_date.isoformat() if parsed_date else None
+
+
+def parse_parking(text: str) -> str:
+    return 'N' if any(neg in text for neg in _PARKING_NEGATIVE) else 'Y'
+
+
+def parse_estimated_rent(text: str) -> int:
+    """めやす賃料 (estimated rent) → total_monthly"""
+    if match := re.search(r'([\d,]+)円', text):
+        return int(match.group(1).replace(',', ''))
+    return 0
+
+
+def parse_room_info(text: str) -> Optional[Dict[str, Any]]:
+    """間取り・面積 → room_type, size"""
+    if match := re.search(r'^([^/]+?)\s*/\s*([\d.]+)㎡', text):
+        return {'room_type': extract_room_type(match.group(1).strip()), 'size': float(match.group(2))}
+    return None
+
+
+def parse_construction_year(text: str) -> Optional[int]:
+    if match := re.search(r'(\d{4})年', text):
+        return int(match.group(1))
+    return None
+
+
+def parse_structure(text: str) -> Optional[Dict[str, Any]]:
+    """規模構造 → structure, floors, basement_floors"""
+    if not (match := re.search(r'^(.*?造)\s*地上(\d+)階(?:地下(\d+)階建?)?', text)):
+        return None
+    result = {'structure': utils_extract_structure_info(match.group(1).strip()), 'floors': int(match.group(2))}
+    if match.group(3):
+        result['basement_floors'] = int(match.group(3))
+    return result
+
+
+def parse_renewal_fee(text: str) -> Optional[Dict[str, Any]]:
+    if match := re.search(r'新賃料の(\d+)ヶ月分', text):
+        months = int(match.group(1))
+        return {'renewal_new_rent': 'Y', 'months_renewal': 12 if months == 1 else months}
+    return None
+
+
+def parse_other_fees(text: str) -> Dict[str, Any]:
+    """その他費用 → property_other_expenses_ja, lock_exchange"""
+    result = {'property_other_expenses_ja': text}
+    if match := re.search(r'玄関錠交換代[^\d]*([\d,]+)円', text):
+        result['lock_exchange'] = int(match.group(1).replace(',', ''))
+    return result
+
+
+# Field lấy thẳng từ dt/dd (label → converter → field), compile một lần lúc import
+FIELD_SPECS = [
+    FieldSpec('入居可能日', 'available_from', parse_available_from),
+    FieldSpec('駐車場', 'parking', parse_parking, default='Y'),
+    FieldSpec('めやす賃料', 'total_monthly', parse_estimated_rent),
+    FieldSpec('間取り・面積', convert=parse_room_info),
+    FieldSpec('竣工日', 'year', parse_construction_year),
+    FieldSpec('規模構造', convert=parse_structure),
+    FieldSpec('更新料', convert=parse_renewal_fee),
+    FieldSpec('その他費用', convert=parse_other_fees),
+    FieldSpec('備考', 'building_description_ja'),
+]
+SCHEMA = FieldSchema(FIELD_SPECS)
+
 class PropertyDataExtractor:
     """Handles extraction of property data from HTML"""
     
@@ -27,17 +136,22 @@ class PropertyDataExtractor:
         self.station_service = Station_Service
         self._dt_dd_cache = None
     
-    def _parse_html_once(self, html: str) -> None:
-        """Parse HTML once and cache all dt/dd pairs"""
+    def _parse_html_once(self, html: str, doc: Optional[HtmlDocument] = None) -> None:
+        """Parse HTML once and cache all dt/dd pairs (cleaned text)"""
         if self._dt_dd_cache is None:
-            self._dt_dd_cache = self.html_processor.parse_all_dt_dd(html)
+            if doc:
+                self._dt_dd_cache = doc.dt_dd()
+            else:
+                self._dt_dd_cache = {
+                    label: self.html_processor.clean_html(content)
+                    for label, content in self.html_processor.parse_all_dt_dd(html).items()
+                }
     
     def _get_dt_dd(self, dt_label: str) -> Optional[str]:
         """Get cached dt/dd content"""
         if self._dt_dd_cache is None:
             return None
-        content = self._dt_dd_cache.get(dt_label)
-        return self.html_processor.clean_html(content) if content else None
+        return self._dt_dd_cache.get(dt_label) or None
     
     def _parse_coordinates(self, address: str, data: Dict[str, Any]) -> None:
         """Fetch coordinates from Google Maps and update data directly"""
@@ -80,23 +194,18 @@ class PropertyDataExtractor:
     #==========================# Methods #========================#
     def get_static_info(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
         """Process static information extraction"""
-        self._parse_html_once(html)
+        self._parse_html_once(html, HtmlDocument.from_data(data))
+        
+        # Field khai báo trong FIELD_SPECS: một lần duyệt label map
+        self._safe_extract('schema_fields', lambda d, _: SCHEMA.extract(d, self._dt_dd_cache), data, html)
         
+        # Logic riêng (cần HTML / ghi đè field của schema, vd: amenities → parking)
         extractors = [
             ('header_info', self.extract_header_info),
-            ('available_from', self.extract_available_from),
-            ('parking', self.extract_parking),
             ('address_info', self.extract_address_info),
             ('rent_info', self.extract_rent_info),
-            ('estimated_rent', self.extract_estimated_rent),
-            ('room_info', self.extract_room_info),
-            ('construction_date', self.extract_construction_date),
-            ('structure_info', self.extract_structure_info),
-            ('renewal_fee', self.extract_renewal_fee),
             ('direction_info', self.extract_direction_info),
-            ('lock_exchange', self.extract_lock_exchange),
             ('amenities', self.extract_amenities),
-            ('building_description', self.extract_building_description),
         ]
         
         for name, extractor in extractors:
@@ -123,15 +232,18 @@ class PropertyDataExtractor:
     
     def cleanup_temp_fields(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
         self._dt_dd_cache = None
-        return PropertyUtils.cleanup_temp_fields(data, '_html')
+        return PropertyUtils.cleanup_temp_fields(data, '_html', '_doc')
     
     def extract_header_info(self, data: Dict[str, Any], html: str):
         """Extract building name, floor, and room number"""
-        h1_content = self.html_processor.find(r'<h1[^>]*>(.*?)</h1>', html)
-        if not h1_content:
+        if doc := HtmlDocument.from_data(data):
+            h1_text = doc.first_text(_H1)
+        else:
+            h1_content = self.html_processor.find(r'<h1[^>]*>(.*?)</h1>', html)
+            h1_text = self.html_processor.clean_html(h1_content) if h1_content else None
+        if not h1_text:
             return
         
-        h1_text = self.html_processor.clean_html(h1_content)
         match = re.match(r'^(.+?)\s+(\d+)階(\d+)$', h1_text)
         
         if match:
@@ -142,66 +254,25 @@ class PropertyDataExtractor:
             })
         else:
             data['building_name_ja'] = h1_text
-            
-        data['building_name_en'] = translate_ja_to_en(text = data['building_name_ja'])
-
-    def extract_available_from(self, data: Dict[str, Any], html: str):
-        """Extract available from date"""
-        text = self._extract_dt_dd_content(html, '入居可能日')
-        if not text:
-            return
-
-        current_year = datetime.now().year
-        parsed_date = None
-
-        if "即可" in text:
-            parsed_date = date.today()
-        else:
-            for key, day in {"上旬": "5日", "中旬": "15日", "下旬": "25日"}.items():
-                text = re.sub(rf'(\d{{4}}年)?(\d{{1,2}})月{key}', 
-                            lambda m: f"{m.group(1) or str(current_year)+'年'}{m.group(2)}月{day}", text)
-
-            if m := re.search(r'(\d{4})?年?(\d{1,2})月末', text):
-                year = int(m.group(1)) if m.group(1) else current_year
-                month = int(m.group(2))
-                last_day = calendar.monthrange(year, month)[1]
-                text = f"{year}年{month}月{last_day}日"
-
-            patterns = [
-                (r'(\d{4})年(\d{1,2})月(\d{1,2})日', lambda y,m,d: date(int(y), int(m), int(d))),
-                (r'(\d{1,2})月(\d{1,2})日', lambda m,d: date(current_year, int(m), int(d))),
-                (r'(\d{4})/(\d{1,2})/(\d{1,2})', lambda y,m,d: date(int(y), int(m), int(d))),
-                (r'(\d{1,2})/(\d{1,2})', lambda m,d: date(current_year, int(m), int(d))),
-            ]
-
-            for pat, conv in patterns:
-                if m := re.search(pat, text):
-                    parsed_date = conv(*m.groups())
-                    break
-
-        if parsed_date:
-            data["available_from"] = parsed_date.isoformat()
-
-    def extract_parking(self, data: Dict[str, Any], html: str):
-        """Extract parking availability"""
-        parking_text = self._extract_dt_dd_content(html, '駐車場')
-        if not parking_text:
-            data['parking'] = 'Y'
-            return
-        
-        negative_values = ['なし', '無し', '×', '不可', 'ー', '無', 'NO', 'No', 'no']
-        data['parking'] = 'N' if any(neg in parking_text for neg in negative_values) else 'Y'
     
+    def translate_building_name(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
+        """Translate building name (translate API, network hook)"""
+        if data.get('building_name_ja'):
+            data['building_name_en'] = translate_ja_to_en(text = data['building_name_ja'])
+        return data
+
     def extract_address_info(self, data: Dict[str, Any], html: str):
         """Extract address information"""
-        address_section = self.html_processor.find(r'<dt[^>]*>所在地</dt>(.*?)(?=<dt|</dl>|$)', html)
-        if not address_section:
-            return
-        
-        dd_matches = re.findall(r'<dd[^>]*>(.*?)</dd>', address_section, re.DOTALL)
+        if doc := HtmlDocument.from_data(data):
+            dd_texts = [text_of(dd) for dd in doc.dd_elements('所在地')]
+        else:
+            address_section = self.html_processor.find(r'<dt[^>]*>所在地</dt>(.*?)(?=<dt|</dl>|$)', html)
+            if not address_section:
+                return
+            dd_texts = [self.html_processor.clean_html(dd) for dd in re.findall(r'<dd[^>]*>(.*?)</dd>', address_section, re.DOTALL)]
         
-        if len(dd_matches) >= 2:
-            address_text = self.html_processor.clean_html(dd_matches[1])
+        if len(dd_texts) >= 2:
+            address_text = dd_texts[1]
             address_parts = self.coordinate_converter.parse_japanese_address(address_text)
             
             data['address'] = address_text
@@ -211,11 +282,14 @@ class PropertyDataExtractor:
     
     def extract_rent_info(self, data: Dict[str, Any], html: str):
         """Extract rent and maintenance fee"""
-        rent_match = re.search(r'<dd[^>]*class="[^"]*__rent[^"]*"[^>]*>(.*?)</dd>', html, re.DOTALL)
-        if not rent_match:
+        if doc := HtmlDocument.from_data(data):
+            rent_text = doc.first_text(_RENT_DD)
+        else:
+            rent_match = re.search(r'<dd[^>]*class="[^"]*__rent[^"]*"[^>]*>(.*?)</dd>', html, re.DOTALL)
+            rent_text = self.html_processor.clean_html(rent_match.group(1)) if rent_match else None
+        if rent_text is None:
             return
         
-        rent_text = self.html_processor.clean_html(rent_match.group(1))
         rent_text = re.sub(r"\s+", " ", rent_text.replace("／", "/").replace(",", "").strip())
 
         monthly_rent = monthly_maintenance = 0
@@ -246,73 +320,17 @@ class PropertyDataExtractor:
         data['total_monthly'] = None
         return data
                 
-    def extract_room_info(self, data: Dict[str, Any], html: str):
-        """Extract room type and size"""
-        room_info_text = self._extract_dt_dd_content(html, '間取り・面積')
-        if room_info_text and (match := re.search(r'^([^/]+?)\s*/\s*([\d.]+)㎡', room_info_text)):
-            data.update({
-                'room_type': extract_room_type(match.group(1).strip()),
-                'size': float(match.group(2))
-            })
-    
-    def extract_construction_date(self, data: Dict[str, Any], html: str):
-        """Extract construction date"""
-        construction_text = self._extract_dt_dd_content(html, '竣工日')
-        if construction_text and (match := re.search(r'(\d{4})年', construction_text)):
-            data['year'] = int(match.group(1))
-    
-    def extract_structure_info(self, data: Dict[str, Any], html: str):
-        """Extract building structure"""
-        structure_text = self._extract_dt_dd_content(html, '規模構造')
-        if structure_text and (match := re.search(r'^(.*?造)\s*地上(\d+)階(?:地下(\d+)階建?)?', structure_text)):
-            data.update({
-                'structure': utils_extract_structure_info(match.group(1).strip()),
-                'floors': int(match.group(2))
-            })
-            if match.group(3):
-                data['basement_floors'] = int(match.group(3))
-    
-    def extract_renewal_fee(self, data: Dict[str, Any], html: str):
-        """Extract renewal fee"""
-        renewal_text = self._extract_dt_dd_content(html, '更新料')
-        if renewal_text and (match := re.search(r'新賃料の(\d+)ヶ月分', renewal_text)):
-            months = int(match.group(1))
-            data.update({
-                'renewal_new_rent': 'Y',
-                'months_renewal': 12 if months == 1 else months
-            })
-    
     def extract_direction_info(self, data: Dict[str, Any], html: str):
         """Extract apartment facing direction"""
         if direction_text := self._extract_dt_dd_content(html, '方位'):
             print(f"🧭 Direction: {direction_text}")
             extract_direction_info(data, direction_text)
     
-    def extract_estimated_rent(self, data: Dict[str, Any], html: str):
-        """Extract めやす賃料 (estimated rent) as total_monthly"""
-        if estimated_rent_text := self._extract_dt_dd_content(html, 'めやす賃料'):
-            if match := re.search(r'([\d,]+)円', estimated_rent_text):
-                data['total_monthly'] = int(match.group(1).replace(',', ''))
-            else:
-                data['total_monthly'] = 0
-    
-    def extract_lock_exchange(self, data: Dict[str, Any], html: str):
-        """Extract lock exchange fee"""
-        if other_fees_text := self._extract_dt_dd_content(html, 'その他費用'):
-            data['property_other_expenses_ja'] = other_fees_text
-            if match := re.search(r'玄関錠交換代[^\d]*([\d,]+)円', other_fees_text):
-                data['lock_exchange'] = int(match.group(1).replace(',', ''))
-    
     def extract_amenities(self, data: Dict[str, Any], html: str):
         """Extract amenities"""
         if amenities_text := self._extract_dt_dd_content(html, '専有部・共用部設備'):
             apply_amenities_to_data(amenities_text, data)
     
-    def extract_building_description(self, data: Dict[str, Any], html: str):
-        """Extract building description"""
-        if description_text := self._extract_dt_dd_content(html, '備考'):
-            data['building_description_ja'] = description_text
-    
     #=========================# Other methods #======================#
     
     def extract_station(self, data: Dict[str, Any], html: str):
@@ -4,16 +4,35 @@ Constants and configurations for Tokyu crawling
 from typing import Final
 
 from app.core.config import settings
+from app.jobs.crawl_strcture.site_profile import SiteProfile
+from app.jobs.crawl_strcture.url_canonicalizer import UrlCanonicalizer
 
 # Base URL configuration
-BASE_URL: Final = 'https://rent.tokyu-housing-lease.co.jp'
+BASE_URL: Final = settings.TOKYU_BASE_URL
 
 # URL and selector configurations
-URL_MULTI: Final = 'https://rent.tokyu-housing-lease.co.jp/rent_search/%E5%9F%BC%E7%8E%89%E7%9C%8C-%E5%8D%83%E8%91%89%E7%9C%8C-%E6%9D%B1%E4%BA%AC%E9%83%BD-%E7%A5%9E%E5%A5%88%E5%B7%9D%E7%9C%8C/page:'  # Trang chứa các property có phân trang của tokyu
+URL_MULTI: Final = f'{BASE_URL}/rent_search/%E5%9F%BC%E7%8E%89%E7%9C%8C-%E5%8D%83%E8%91%89%E7%9C%8C-%E6%9D%B1%E4%BA%AC%E9%83%BD-%E7%A5%9E%E5%A5%88%E5%B7%9D%E7%9C%8C/page:'  # Trang chứa các property có phân trang của tokyu
 ITEM_SELECTOR: Final = '#search_result_rent > div > div.item_rooms > div.item_room_table > table > tbody > tr > td > a'  # Thẻ phần tử chứa link
 ITEM_MAX_NUM_PAGE: Final = 'li.pgnt > a[href]'  # Thẻ pagination để detect số trang tối đa
 DEFAULT_NUM_PAGES = 30
 
+# Section ảnh đưa vào content fingerprint (cùng vùng mà ImageExtractor đọc)
+FINGERPRINT_IMAGE_PATTERNS: Final = (
+    r'<[^>]*id="side_roomplan"[^>]*>(.*?)</(?:div|section|aside)',
+    r'<div[^>]*id="album_photos"[^>]*>(.*?)<div[^>]*id="gmap_view"',
+)
+
+# Fetch/extract config của site
+SITE_PROFILE: Final = SiteProfile(
+    name='Tokyu',
+    fingerprint_image_patterns=FINGERPRINT_IMAGE_PATTERNS,
+    # Phần cuối extractor cần: ImageExtractor đọc album_photos tới gmap_view, phía sau là bản đồ + listing liên quan
+    body_end_marker='id="gmap_view"',
+    # Phòng đã đóng → redirect về trang tìm kiếm / top page
+    dead_redirect_patterns=(r'/rent_search', r'^https?://[^/]+/?$'),
+    canonicalizer=UrlCanonicalizer(base_url=BASE_URL),
+)
+
 # Database configuration
 ID_MONGO = settings.ID_MONGO_TOKYU
 COLLECTION_NAME = settings.COLLECTION_NAME_TOKYU
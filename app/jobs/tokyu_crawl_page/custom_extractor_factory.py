@@ -8,6 +8,7 @@ from app.jobs.crawl_strcture.custom_rules import CustomExtractor
 from app.jobs.tokyu_crawl_page.image_extractor import ImageExtractor
 from app.jobs.tokyu_crawl_page.map_extractor import MapExtractor
 from app.jobs.tokyu_crawl_page.property_data_extractor import PropertyDataExtractor
+from app.utils.html_document_utils import HtmlDocument
 
 
 class CustomExtractorFactory:
@@ -29,29 +30,31 @@ class CustomExtractorFactory:
         return wrapper_func
     
     def _store_html(self, html: str, data: Dict[str, Any]) -> tuple:
-        """Store HTML in data for post-hooks"""
+        """Store HTML (và document lxml parse lazy, dùng chung cho mọi hook) in data for post-hooks"""
         data['_html'] = html
+        data['_doc'] = HtmlDocument(html)
         return html, data
     
     def setup_custom_extractor(self) -> CustomExtractor:
         """
         Setup optimized custom extractor with clear processing pipeline
         
-        Processing Order (13 steps):
+        Processing Order:
         1. Store HTML in _html field
         2. Extract images from page
-        3. Extract building information (name, type, structure, address, year)
-        4. Extract unit information (unit_no, floor, size, direction)
-        5. Extract rental costs (monthly_rent, monthly_maintenance)
-        6. Extract other fees (cleaning fee, other expenses)
-        7. Extract unit description (pet info, remarks)
-        8. Extract deposits and fees (deposit, key money, renewal)
-        9. Extract amenities from 設備・条件 section
-        10. Extract pet policy from 敷金積増 section
-        11. Set default amenities
-        12. Calculate financial info (guarantor, agency, insurance, discount, availability)
-        13. Extract map coordinates
-        14. Cleanup temporary fields (_html)
+        3. Extract declarative fields (FIELD_SPECS: building name/type/structure, address, year, room type,
+           unit_no, floor, size, maintenance, other fees, availability) + translate building name
+        4. Extract direction
+        5. Extract rental costs (monthly_rent)
+        6. Extract unit description (pet info, remarks)
+        7. Extract deposits and fees (deposit, key money, renewal)
+        8. Extract amenities from 設備・条件 section
+        9. Extract pet policy from 敷金積増 section
+        10. Set default amenities
+        11. Calculate financial info (guarantor, agency, discount)
+        12. Extract map coordinates
+        13. Extract station info
+        14. Cleanup temporary fields (_html, _doc)
         """
         # Create new instances for each extractor to avoid shared state in parallel processing
         image_extractor = ImageExtractor()
@@ -66,24 +69,38 @@ class CustomExtractorFactory:
         # Define processing pipeline in order
         processors = [
             image_extractor.extract_images,              # 1. Extract images
-            property_extractor.extract_building_info,    # 2. Building info
-            property_extractor.extract_unit_info,        # 3. Unit info
+            property_extractor.extract_fields,           # 2. Declarative fields (FIELD_SPECS)
+            property_extractor.translate_building_name,  # 2b. Translate building name
+            property_extractor.extract_direction,        # 3. Direction
             property_extractor.extract_rental_costs,     # 4. Rental costs
-            property_extractor.extract_other_fee,        # 5. Other fees
-            property_extractor.extract_unit_description, # 6. Unit description
-            property_extractor.extract_deposits_and_fees,# 7. Deposits & fees
-            property_extractor.extract_future,           # 8. Amenities
-            property_extractor.extract_is_pets,          # 9. Pet policy
-            property_extractor.set_default_amenities,    # 10. Default amenities
-            property_extractor.extract_money,            # 11. Financial calculations
-            map_extractor.extract_map,                   # 12. Map coordinates
-            property_extractor.extract_station,          # 13. Station info
-            property_extractor.cleanup_temp_fields,      # 14. Cleanup
+            property_extractor.extract_unit_description, # 5. Unit description
+            property_extractor.extract_deposits_and_fees,# 6. Deposits & fees
+            property_extractor.extract_future,           # 7. Amenities
+            property_extractor.extract_is_pets,          # 8. Pet policy
+            property_extractor.set_default_amenities,    # 9. Default amenities
+            property_extractor.extract_money,            # 10. Financial calculations
+            map_extractor.extract_map,                   # 11. Map coordinates
+            property_extractor.extract_station,          # 12. Station info
+            property_extractor.cleanup_temp_fields,      # 13. Cleanup
         ]
         
+        # Gọi dịch vụ ngoài → bỏ qua khi re-extract offline (giữ giá trị đã lưu)
+        network_processors = {
+            property_extractor.translate_building_name,
+            map_extractor.extract_map,                   # Geocoding + district
+            property_extractor.extract_station,
+        }
+        
+        # Còn lại (trừ cleanup) chỉ dùng HTML + field của processor trước → chạy được trong worker process
+        cpu_processors = set(processors) - network_processors - {property_extractor.cleanup_temp_fields}
+        
         # Add all processors with error handling
         for processor in processors:
-            extractor.add_post_hook(self._create_safe_wrapper(processor))
+            extractor.add_post_hook(
+                self._create_safe_wrapper(processor),
+                network=processor in network_processors,
+                cpu_bound=processor in cpu_processors
+            )
         
         return extractor
 
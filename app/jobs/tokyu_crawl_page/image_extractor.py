@@ -2,12 +2,26 @@
 Image extraction utilities for Tokyu crawling
 """
 import re
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+
+from lxml import etree
+from lxml.cssselect import CSSSelector
 
 from app.utils.html_processor_utils import htmlProcessor
+from app.utils.html_document_utils import HtmlDocument
 from app.jobs.tokyu_crawl_page.constants import BASE_URL
 from app.core.config import settings
 
+# Selector compile một lần, dùng với data['_doc']
+_SIDE_ROOMPLAN = CSSSelector('#side_roomplan')
+_ALBUM_PHOTOS = CSSSelector('div#album_photos')
+_EXTERIOR_DIV = CSSSelector('div#m000')
+_INTERIOR_DIVS = etree.XPath(
+    ".//div[re:test(@id, '^i[0-9]{3}$')]",
+    namespaces={'re': 'http://exslt.org/regular-expressions'}
+)
+_FIRST_IMG_SRC = etree.XPath('(.//img/@src)[1]')
+
 
 class ImageExtractor:
     """Handles image extraction from gallery"""
@@ -15,73 +29,101 @@ class ImageExtractor:
     def __init__(self):
         self.html_processor = htmlProcessor
     
+    def _find_sources_dom(self, doc: HtmlDocument) -> Optional[Tuple[Optional[str], Optional[str], List[str]]]:
+        """(floorplan, exterior, interiors) từ DOM, None nếu trang không có section ảnh (→ regex fallback)"""
+        side_roomplan = doc.first(_SIDE_ROOMPLAN)
+        album = doc.first(_ALBUM_PHOTOS)
+        if side_roomplan is None and album is None:
+            return None
+        
+        floorplan = doc.first(_FIRST_IMG_SRC, side_roomplan) if side_roomplan is not None else None
+        exterior = None
+        interiors = []
+        if album is not None:
+            if (exterior_div := doc.first(_EXTERIOR_DIV, album)) is not None:
+                exterior = doc.first(_FIRST_IMG_SRC, exterior_div)
+            for interior_div in doc.select(_INTERIOR_DIVS, album):
+                if src := doc.first(_FIRST_IMG_SRC, interior_div):
+                    interiors.append(src)
+        return floorplan, exterior, interiors
+    
+    def _find_sources_regex(self, html: str) -> Tuple[Optional[str], Optional[str], List[str]]:
+        """(floorplan, exterior, interiors) bằng regex trên HTML"""
+        floorplan = exterior = None
+        interiors = []
+        
+        # Extract floorplan from #side_roomplan > p > a > img
+        floorplan_pattern = self.html_processor.compile_regex(
+            r'<[^>]*id="side_roomplan"[^>]*>(.*?)</(?:div|section|aside)',
+            re.DOTALL
+        )
+        floorplan_section = floorplan_pattern.search(html)
+        
+        if floorplan_section:
+            floorplan = self.html_processor.find(
+                r'<img[^>]*src="([^"]+)"',
+                floorplan_section.group(1)
+            )
+        
+        # Extract album_photos section - find content between album_photos and gmap_view
+        album_pattern = self.html_processor.compile_regex(
+            r'<div[^>]*id="album_photos"[^>]*>(.*?)<div[^>]*id="gmap_view"',
+            re.DOTALL
+        )
+        album_section = album_pattern.search(html)
+        
+        if album_section:
+            album_content = album_section.group(1)
+            
+            # Extract exterior from div#m000
+            exterior = self.html_processor.find(
+                r'<div[^>]*id="m000"[^>]*>.*?<img[^>]*src="([^"]+)"',
+                album_content
+            )
+            
+            # Find all divs with id matching i00x pattern (i001, i002, i003, etc.)
+            interior_divs_pattern = self.html_processor.compile_regex(
+                r'<div[^>]*id="i\d{3}"[^>]*>.*?<img[^>]*src="([^"]+)"',
+                re.DOTALL
+            )
+            interiors = interior_divs_pattern.findall(album_content)
+        
+        return floorplan, exterior, interiors
+    
     def extract_images(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
         """Extract and organize images from HTML - all images are on the main page"""
         images_list = []
         max_images = settings.MAX_IMAGES
         used_filenames = set()
         
+        def add_image(img_url: str, category: str) -> None:
+            filename = img_url.split('/')[-1]
+            if filename not in used_filenames:
+                full_url = img_url if img_url.startswith('http') else BASE_URL + img_url
+                images_list.append({'url': full_url, 'category': category})
+                used_filenames.add(filename)
+        
         try:
-            # Extract floorplan from #side_roomplan > p > a > img
-            floorplan_pattern = self.html_processor.compile_regex(
-                r'<[^>]*id="side_roomplan"[^>]*>(.*?)</(?:div|section|aside)',
-                re.DOTALL
-            )
-            floorplan_section = floorplan_pattern.search(html)
+            sources = None
+            if doc := HtmlDocument.from_data(data):
+                sources = self._find_sources_dom(doc)
+            if sources is None:
+                sources = self._find_sources_regex(html)
+            floorplan_img, exterior_img, interior_imgs = sources
             
-            if floorplan_section:
-                floorplan_content = floorplan_section.group(1)
-                floorplan_img = self.html_processor.find(
-                    r'<img[^>]*src="([^"]+)"',
-                    floorplan_content
-                )
-                if floorplan_img:
-                    filename = floorplan_img.split('/')[-1]
-                    if filename not in used_filenames:
-                        full_url = floorplan_img if floorplan_img.startswith('http') else BASE_URL + floorplan_img
-                        images_list.append({'url': full_url, 'category': 'floorplan'})
-                        used_filenames.add(filename)
+            if floorplan_img:
+                add_image(floorplan_img, 'floorplan')
             
-            # Extract album_photos section - find content between album_photos and gmap_view
-            album_pattern = self.html_processor.compile_regex(
-                r'<div[^>]*id="album_photos"[^>]*>(.*?)<div[^>]*id="gmap_view"',
-                re.DOTALL
-            )
-            album_section = album_pattern.search(html)
+            if exterior_img and len(images_list) < max_images:
+                add_image(exterior_img, 'exterior')
             
-            if album_section:
-                album_content = album_section.group(1)
-                
-                # Extract exterior from div#m000
-                exterior_img = self.html_processor.find(
-                    r'<div[^>]*id="m000"[^>]*>.*?<img[^>]*src="([^"]+)"',
-                    album_content
-                )
-                if exterior_img and len(images_list) < max_images:
-                    filename = exterior_img.split('/')[-1]
-                    if filename not in used_filenames:
-                        full_url = exterior_img if exterior_img.startswith('http') else BASE_URL + exterior_img
-                        images_list.append({'url': full_url, 'category': 'exterior'})
-                        used_filenames.add(filename)
-                
-                # Extract interior images from div#i00x (i001, i002, i003, etc.)
-                remaining_slots = max_images - len(images_list)
-                if remaining_slots > 0:
-                    # Find all divs with id matching i00x pattern
-                    interior_divs_pattern = self.html_processor.compile_regex(
-                        r'<div[^>]*id="i\d{3}"[^>]*>.*?<img[^>]*src="([^"]+)"',
-                        re.DOTALL
-                    )
-                    interior_imgs = interior_divs_pattern.findall(album_content)
-                    
-                    for img_url in interior_imgs[:remaining_slots]:
-                        filename = img_url.split('/')[-1]
-                        if filename not in used_filenames:
-                            full_url = img_url if img_url.startswith('http') else BASE_URL + img_url
-                            images_list.append({'url': full_url, 'category': 'interior'})
-                            used_filenames.add(filename)
-                            if len(images_list) >= max_images:
-                                break
+            # Interior images from div#i00x
+            remaining_slots = max_images - len(images_list)
+            if remaining_slots > 0:
+                for img_url in interior_imgs[:remaining_slots]:
+                    add_image(img_url, 'interior')
+                    if len(images_list) >= max_images:
+                        break
             
         except Exception as e:
             pass  # Silent fail for batch processing
@@ -89,4 +131,4 @@ class ImageExtractor:
         if images_list:
             data['images'] = images_list
             
-        return data
\ No newline at end of file
+        return data
@@ -4,23 +4,24 @@ Optimized version with better error handling and logging
 Using lxml for faster HTML parsing
 """
 from typing import List, Tuple, Optional
-import requests
 from lxml import html
 import re
 
 from app.jobs.crawl_strcture.index import crawl_pages
+from app.jobs.crawl_strcture.listing_fetcher import ListingFetcher
+from app.jobs.crawl_strcture.listing_delta import row_signature
 from .custom_extractor_factory import setup_custom_extractor
-from .constants import URL_MULTI, ITEM_SELECTOR, DEFAULT_NUM_PAGES, BASE_URL, ITEM_MAX_NUM_PAGE
+from .constants import URL_MULTI, ITEM_SELECTOR, DEFAULT_NUM_PAGES, BASE_URL, ITEM_MAX_NUM_PAGE, SITE_PROFILE
 from app.core.config import settings
 
 # Lấy link của nhà trong trang
-def _fetch_page_urls(page: int, headers: dict, detect_max_pages: bool = False) -> Tuple[List[str], Optional[int]]:
+async def _fetch_page_urls(page: int, fetcher: ListingFetcher, detect_max_pages: bool = False) -> Tuple[List[str], Optional[int]]:
     """
     Fetch property URLs from a single listing page
     
     Args:
         page: Page number to crawl
-        headers: Request headers
+        fetcher: Async listing fetcher (aiohttp session, retry, rate limit)
         detect_max_pages: If True, also detect maximum pages from pagination
         
     Returns:
@@ -30,56 +31,62 @@ def _fetch_page_urls(page: int, headers: dict, detect_max_pages: bool = False) -
     max_pages = None
     page_url = f"{URL_MULTI}{page}"
     
-    try:
-        resp = requests.get(page_url, headers=headers, timeout=30)
-        
-        if resp.status_code != 200:
-            print(f"❌ Error loading page {page}: HTTP {resp.status_code}")
-            return urls, max_pages
-        
-        # Parse HTML with lxml (faster than BeautifulSoup)
-        tree = html.fromstring(resp.content)
-        
-        # Extract items using CSS selector
-        items = tree.cssselect(ITEM_SELECTOR)
-        print(f"📄 Page {page}: Found {len(items)} items")
+    content = await fetcher.fetch(page_url)
+    
+    if content is None:
+        print(f"❌ Error loading page {page}")
+        return urls, max_pages
+    
+    # Trang không đổi từ lần chạy trước → dùng lại URL đã parse
+    cached = fetcher.cached_page(page_url, None, content)
+    if cached:
+        print(f"📄 Page {page}: unchanged, {len(cached.urls)} items")
+        return cached.urls, cached.max_pages if detect_max_pages else None
+    
+    # Parse HTML with lxml (faster than BeautifulSoup)
+    tree = html.fromstring(content)
+    
+    # Extract items using CSS selector
+    items = tree.cssselect(ITEM_SELECTOR)
+    print(f"📄 Page {page}: Found {len(items)} items")
 
-        for i, a_tag in enumerate(items):
-            if a_tag is None or not a_tag.get("href"):
-                continue
+    for i, a_tag in enumerate(items):
+        if a_tag is None or not a_tag.get("href"):
+            continue
 
-            href = a_tag.get("href")
-            full_url = href if href.startswith("http") else BASE_URL + href
-            urls.append(full_url)
-                
-        # Detect max pages if requested (only on first page)
-        if detect_max_pages:
-            pagination_links = tree.cssselect(ITEM_MAX_NUM_PAGE)
+        href = a_tag.get("href")
+        full_url = href if href.startswith("http") else BASE_URL + href
+        urls.append(full_url)
+
+        # Dòng của phòng trong bảng kết quả (giá thuê, layout, diện tích) → signature
+        row = next(a_tag.iterancestors('tr'), a_tag)
+        fetcher.row_signatures[full_url] = row_signature(row.text_content())
             
-            if pagination_links:
-                last_link = pagination_links[-1]
-                href = last_link.get("href", "")
-                
-                if "page:" in href:
-                    try:
-                        # Use regex to extract the number after 'page:'
-                        match = re.search(r'page:(\d+)', href)
-                        if match:
-                            max_pages = int(match.group(1))
-                            print(f"✅ Detected maximum pages: {max_pages}")
-                        else:
-                            print(f"⚠️ Could not parse page number from: {href}")
-                    except ValueError:
-                        print(f"⚠️ Could not parse page number from: {href}")
+    # Detect max pages if requested (only on first page)
+    if detect_max_pages:
+        pagination_links = tree.cssselect(ITEM_MAX_NUM_PAGE)
+        
+        if pagination_links:
+            last_link = pagination_links[-1]
+            href = last_link.get("href", "")
             
-            if max_pages is None:
-                print(f"⚠️ Could not detect max pages, will use default: {DEFAULT_NUM_PAGES}")
-                
-    except requests.Timeout:
-        print(f"⚠️ Timeout loading page {page}")
-    except Exception as e:
-        print(f"❌ Error processing page {page}: {e}")
+            if "page:" in href:
+                try:
+                    # Use regex to extract the number after 'page:'
+                    match = re.search(r'page:(\d+)', href)
+                    if match:
+                        max_pages = int(match.group(1))
+                        print(f"✅ Detected maximum pages: {max_pages}")
+                    else:
+                        print(f"⚠️ Could not parse page number from: {href}")
+                except ValueError:
+                    print(f"⚠️ Could not parse page number from: {href}")
+        
+        if max_pages is None:
+            print(f"⚠️ Could not detect max pages, will use default: {DEFAULT_NUM_PAGES}")
     
+    fetcher.remember_page(page_url, None, content, urls, max_pages)
+            
     return urls, max_pages
 
 
@@ -93,5 +100,6 @@ async def crawl_multi():
         default_num_pages=DEFAULT_NUM_PAGES,
         id_mongo=settings.ID_MONGO_TOKYU,
         collection_name=settings.COLLECTION_NAME_TOKYU,
-        custom_extractor_factory=setup_custom_extractor
+        custom_extractor_factory=setup_custom_extractor,
+        site_profile=SITE_PROFILE
     )
\ No newline at end of file
@@ -1,7 +1,8 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import re
 
 from app.utils.html_processor_utils import HtmlProcessor
+from app.utils.html_document_utils import HtmlDocument, text_of
 from app.utils.structure_utils import extract_structure_info
 from app.utils.construction_date_utils import extract_construction_year
 from app.utils.direction_utils import extract_direction_info
@@ -15,6 +16,45 @@ from app.services.station_service import Station_Service
 from app.utils.building_type_utils import extract_building_type
 from app.utils.room_type_utils import extract_room_type
 from app.utils.translate_utils import translate_ja_to_en
+from app.jobs.crawl_strcture.field_schema import FieldSchema, FieldSpec, TH
+
+
+_CLEANING_FEE = re.compile(r'清掃費[：:]\s*([0-9,]+)円')
+
+
+def _positive_area(text: str) -> Optional[float]:
+    size = extract_area_size(text)
+    return size if size and size > 0 else None
+
+
+def parse_move_out_fees(text: str) -> Dict[str, Any]:
+    """退去時費用 → other_initial_fees (清掃費), property_other_expenses_ja (các dòng sau)"""
+    result = {'other_initial_fees': 0}
+    if cleaning_match := _CLEANING_FEE.search(text):
+        cleaning_fee = extract_numeric_value(cleaning_match.group(1).replace(',', '') + '円')
+        result['other_initial_fees'] = cleaning_fee if cleaning_fee and cleaning_fee > 0 else 0
+    
+    if lines := (text.split('\n', 1)[1] if '\n' in text else ''):
+        result['property_other_expenses_ja'] = lines
+    return result
+
+
+# Field lấy thẳng từ dt/dd, th/td (label → converter → field), compile một lần lúc import
+FIELD_SPECS = [
+    FieldSpec('物件名', 'building_name_ja'),
+    FieldSpec('種別', 'building_type', extract_building_type),
+    FieldSpec('建物構造', 'structure', extract_structure_info),
+    FieldSpec('所在地', 'address'),
+    FieldSpec('築年月', 'year', extract_construction_year),
+    FieldSpec('間取り（タイプ）', 'room_type', extract_room_type, default='1R', source=TH),
+    FieldSpec('部屋番号', 'unit_no', source=TH),
+    FieldSpec('所在階/階建', convert=extract_floor_info, source=TH),
+    FieldSpec('専有面積', 'size', _positive_area, default=0, source=TH),
+    FieldSpec('管理費・共益費', 'monthly_maintenance', extract_numeric_value, default=0, source=TH),
+    FieldSpec('退去時費用', convert=parse_move_out_fees, source=TH),
+    FieldSpec('入居可能日', 'available_from', extract_available_from, source=TH),
+]
+SCHEMA = FieldSchema(FIELD_SPECS)
 
 
 class PropertyDataExtractor:
@@ -22,19 +62,27 @@ class PropertyDataExtractor:
     def __init__(self):
         self.html_processor = HtmlProcessor()
         self.station_service = Station_Service
+        self._doc: Optional[HtmlDocument] = None
         self._dt_dd_cache = None
         self._th_td_cache = None
     
-    def _parse_html_once(self, html: str) -> None:
-        if self._dt_dd_cache is None:
-            self._dt_dd_cache = self.html_processor.parse_all_dt_dd(html)
-        if self._th_td_cache is None:
-            self._th_td_cache = self.html_processor.parse_all_th_td(html)
+    def _parse_html_once(self, data: Dict[str, Any], html: str) -> None:
+        # DOM dùng chung (data['_doc']); regex chỉ khi parse lỗi
+        if self._doc is None:
+            self._doc = HtmlDocument.from_data(data)
+        if self._doc is not None:
+            return
+        if self._dt_dd_cache is None or self._th_td_cache is None:
+            self._dt_dd_cache, self._th_td_cache = self.html_processor.parse_label_maps(html)
     
     def _get_dt_dd(self, dt_label: str) -> Optional[str]:
+        if self._doc is not None:
+            return self._doc.dt_dd().get(dt_label)
         return self._dt_dd_cache.get(dt_label) if self._dt_dd_cache else None
     
     def _get_td(self, th_label: str) -> Optional[str]:
+        if self._doc is not None:
+            return self._doc.td_text(th_label)
         if not self._th_td_cache:
             return None
         content = self._th_td_cache.get(th_label)
@@ -43,6 +91,33 @@ class PropertyDataExtractor:
     def _get_td_raw(self, th_label: str) -> Optional[str]:
         return self._th_td_cache.get(th_label) if self._th_td_cache else None
     
+    def _get_td_span_text(self, th_label: str) -> Optional[str]:
+        """Text của <span> đầu tiên trong td"""
+        if self._doc is not None:
+            cell = self._doc.td_element(th_label)
+            span = cell.find('.//span') if cell is not None else None
+            return text_of(span) if span is not None else None
+        if content_raw := self._get_td_raw(th_label):
+            if span_match := self.html_processor.compile_regex(r'<span[^>]*>(.*?)</span>').search(content_raw):
+                return self.html_processor.clean_html(span_match.group(1)).strip()
+        return None
+    
+    def _get_td_items(self, th_label: str) -> Optional[List[str]]:
+        """Text các <li> trong td, None nếu không có td (→ regex fallback)"""
+        if self._doc is None or (cell := self._doc.td_element(th_label)) is None:
+            return None
+        return [text_of(li) for li in cell.iter('li')]
+    
+    def _label_maps(self) -> tuple:
+        """(dt → text dd, th → text td) cho FieldSchema"""
+        if self._doc is not None:
+            return self._doc.dt_dd(), self._doc.th_td()
+        clean = self.html_processor.clean_html
+        return (
+            {label: clean(content) for label, content in (self._dt_dd_cache or {}).items()},
+            {label: clean(content) for label, content in (self._th_td_cache or {}).items()},
+        )
+    
     def _find_dt_dd(self, html: str, dt_label: str) -> Optional[str]:
         return self.html_processor.find_dt_dd(html, dt_label)
     
@@ -52,115 +127,55 @@ class PropertyDataExtractor:
     def set_default_amenities(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
         return PropertyUtils.set_default_amenities(data, DEFAULT_AMENITIES)
     
-    def extract_building_info(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
-        self._parse_html_once(html)
-        
-        if building_name := self._get_dt_dd('物件名'):
-            data['building_name_ja'] = building_name
-            data['building_name_en'] = translate_ja_to_en(text = data['building_name_ja'])
-        
-        if building_type := self._get_dt_dd('種別'):
-            data['building_type'] = extract_building_type(building_type)
-        
-        if structure_text := self._get_dt_dd('建物構造'):
-            data['structure'] = extract_structure_info(structure_text)
-        
-        if address := self._get_dt_dd('所在地'):
-            data['address'] = address
-        
-        if construction_text := self._get_dt_dd('築年月'):
-            if year := extract_construction_year(construction_text):
-                data['year'] = year
-                
-        if room_type := self._get_td('間取り（タイプ）'):
-            data['room_type'] = extract_room_type(room_type)
-        else:
-            data['room_type'] = '1R'
-            
-        print(room_type)
-            
-        return data
+    def extract_fields(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
+        """Field khai báo trong FIELD_SPECS (building, unit, maintenance, other fees, available_from)"""
+        self._parse_html_once(data, html)
+        return SCHEMA.extract(data, *self._label_maps())
     
     def extract_unit_description(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
+        self._parse_html_once(data, html)
         description_parts = []
         
-        if pet_content := self.html_processor.find(r'ペット可区分.*?<td[^>]*>(.*?)</td>', html):
+        pet_items = self._get_td_items('ペット可区分')
+        if pet_items is None and (pet_content := self.html_processor.find(r'ペット可区分.*?<td[^>]*>(.*?)</td>', html)):
             li_pattern = self.html_processor.compile_regex(r'<li[^>]*>(.*?)</li>')
-            if (li_matches := li_pattern.findall(pet_content)) and len(li_matches) > 1:
-                pet_text = ''.join([self.html_processor.clean_html(li).strip() for li in li_matches[1:]])
-                if pet_text:
-                    description_parts.append(pet_text)
+            pet_items = [self.html_processor.clean_html(li).strip() for li in li_pattern.findall(pet_content)]
+        if pet_items and len(pet_items) > 1:
+            if pet_text := ''.join(pet_items[1:]):
+                description_parts.append(pet_text)
         
-        if remarks_content := self.html_processor.find(r'備考.*?<td[^>]*>(.*?)</td>', html):
-            if remarks_text := self.html_processor.clean_html(remarks_content).strip():
-                description_parts.append(remarks_text)
+        remarks_text = self._get_td('備考') if self._doc is not None else None
+        if remarks_text is None and (remarks_content := self.html_processor.find(r'備考.*?<td[^>]*>(.*?)</td>', html)):
+            remarks_text = self.html_processor.clean_html(remarks_content).strip()
+        if remarks_text:
+            description_parts.append(remarks_text)
         
         if description_parts:
             data['property_description_ja'] = ' \n '.join(description_parts)
         
         return data
     
-    def extract_unit_info(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
-        self._parse_html_once(html)
-        
-        if unit_no := self._get_td('部屋番号'):
-            data['unit_no'] = unit_no
-        
-        if floor_text := self._get_td('所在階/階建'):
-            data.update(extract_floor_info(floor_text))
-        
-        if size_text := self._get_td('専有面積'):
-            size = extract_area_size(size_text)
-            data['size'] = size if size and size > 0 else 0
-        else:
-            data['size'] = 0
+    def extract_direction(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
+        self._parse_html_once(data, html)
         
         if direction_text := self._get_td('方位'):
             data.update(extract_direction_info(data, direction_text))
         
         return data
     
-    def extract_other_fee(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
-        self._parse_html_once(html)
-        
-        if not (text := self._get_td('退去時費用')):
-            return data
-        
-        if cleaning_match := self.html_processor.compile_regex(r'清掃費[：:]\s*([0-9,]+)円').search(text):
-            cleaning_fee = extract_numeric_value(cleaning_match.group(1).replace(',', '') + '円')
-            data['other_initial_fees'] = cleaning_fee if cleaning_fee and cleaning_fee > 0 else 0
-        else:
-            data['other_initial_fees'] = 0
-        
-        if lines := (text.split('\n', 1)[1] if '\n' in text else ''):
-            data['property_other_expenses_ja'] = lines
-        
-        return data
-            
-    
     def extract_rental_costs(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
-        self._parse_html_once(html)
+        self._parse_html_once(data, html)
         
-        if rent_content_raw := self._get_td_raw('賃料'):
-            if span_match := self.html_processor.compile_regex(r'<span[^>]*>(.*?)</span>').search(rent_content_raw):
-                rent_text = self.html_processor.clean_html(span_match.group(1)).strip()
-                monthly_rent = extract_numeric_value(rent_text)
-                data['monthly_rent'] = monthly_rent if monthly_rent and monthly_rent > 0 else 0
-            else:
-                data['monthly_rent'] = 0
+        if (rent_text := self._get_td_span_text('賃料')) is not None:
+            monthly_rent = extract_numeric_value(rent_text)
+            data['monthly_rent'] = monthly_rent if monthly_rent and monthly_rent > 0 else 0
         else:
             data['monthly_rent'] = 0
         
-        if maintenance_text := self._get_td('管理費・共益費'):
-            monthly_maintenance = extract_numeric_value(maintenance_text)
-            data['monthly_maintenance'] = monthly_maintenance if monthly_maintenance is not None else 0
-        else:
-            data['monthly_maintenance'] = 0
-        
         return data
     
     def extract_deposits_and_fees(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
-        self._parse_html_once(html)
+        self._parse_html_once(data, html)
         
         data.setdefault('numeric_deposit', 0)
         data.setdefault('numeric_security_deposit', 0)
@@ -191,7 +206,7 @@ class PropertyDataExtractor:
         return data
     
     def extract_future(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
-        self._parse_html_once(html)
+        self._parse_html_once(data, html)
         
         if amenities_text := self._get_td('設備・条件'):
             apply_amenities_to_data(amenities_text, data)
@@ -199,7 +214,7 @@ class PropertyDataExtractor:
         return data
     
     def extract_is_pets(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
-        self._parse_html_once(html)
+        self._parse_html_once(data, html)
         
         if deposit_increase_text := self._get_td('敷金積増'):
             if 'ペット飼育' in deposit_increase_text:
@@ -212,7 +227,7 @@ class PropertyDataExtractor:
         return data
     
     def extract_money(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
-        self._parse_html_once(html)
+        self._parse_html_once(data, html)
         
         monthly_rent = data.get('monthly_rent', 0)
         monthly_maintenance = data.get('monthly_maintenance', 0)
@@ -230,16 +245,19 @@ class PropertyDataExtractor:
         else:
             data['numeric_discount'] = 0
         
-        if available_text := self._get_td('入居可能日'):
-            if available_date := extract_available_from(available_text):
-                data['available_from'] = available_date
-        
+        return data
+    
+    def translate_building_name(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
+        """Translate building name (translate API, network hook)"""
+        if data.get('building_name_ja'):
+            data['building_name_en'] = translate_ja_to_en(text = data['building_name_ja'])
         return data
     
     def extract_station(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
         return self.station_service.set_station_data(data, html)
     
     def cleanup_temp_fields(self, data: Dict[str, Any], html: str) -> Dict[str, Any]:
+        self._doc = None
         self._dt_dd_cache = None
         self._th_td_cache = None
-        return PropertyUtils.cleanup_temp_fields(data, '_html')
\ No newline at end of file
+        return PropertyUtils.cleanup_temp_fields(data, '_html', '_doc')
\ No newline at end of file
@@ -20,7 +20,9 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on application shutdown"""
     from app.core.scheduler import stop_scheduler
+    from app.jobs.crawl_strcture.extract_pool import extract_pool
     stop_scheduler()
+    extract_pool.shutdown()
     pass
 
 if __name__ == "__main__":
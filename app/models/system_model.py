@@ -3,7 +3,7 @@ Pydantic models
 """
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Dict
 from enum import Enum
 
 class ListingStatus(str, Enum):
@@ -37,6 +37,7 @@ class HealthResponse(BaseModel):
     version: str = Field(default="1.0.0", description="API version")
     database_status: str = Field(..., description="Database connection status")
     scheduler_status: str = Field(..., description="Scheduler status")
+    circuit_breakers: Dict[str, str] = Field(default_factory=dict, description="Circuit breaker state per crawled host")
 
     class Config:
         json_encoders = {
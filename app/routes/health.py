@@ -8,6 +8,10 @@ import logging
 from app.models.system_model import HealthResponse
 from app.core.scheduler import get_scheduler
 from app.db.mongodb import get_database
+from app.jobs.crawl_strcture.rate_limiter import rate_limiter
+from app.jobs.crawl_strcture.circuit_breaker import breaker_registry
+from app.jobs.crawl_strcture.crawler_pool import active_pool_snapshots
+from app.jobs.crawl_strcture.proxy_pool import proxy_pool
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -51,7 +55,8 @@ async def health_check():
             status=overall_status,
             timestamp=datetime.now(),
             database_status=database_status,
-            scheduler_status=scheduler_status
+            scheduler_status=scheduler_status,
+            circuit_breakers=breaker_registry.states()
         )
     
     except Exception as e:
@@ -99,4 +104,58 @@ async def scheduler_health():
     
     except Exception as e:
         logger.error(f"Scheduler health check failed: {e}")
-        raise HTTPException(status_code=503, detail=f"Scheduler health check failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=503, detail=f"Scheduler health check failed: {str(e)}")
+
+@router.get("/health/rate-limits")
+async def rate_limits_health():
+    """
+    Current per-host crawl rate (AIMD token bucket)
+    """
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "hosts": rate_limiter.snapshot()
+    }
+
+
+@router.get("/health/circuit-breakers")
+async def circuit_breakers_health():
+    """
+    Circuit breaker state per crawled host
+    """
+    breakers = breaker_registry.snapshot()
+    open_hosts = [host for host, info in breakers.items() if info["state"] != "closed"]
+
+    return {
+        "status": "degraded" if open_hosts else "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "open_hosts": open_hosts,
+        "hosts": breakers
+    }
+
+
+@router.get("/health/connection-pools")
+async def connection_pools_health():
+    """
+    Live connection counters of running crawl jobs (in use / idle / new vs reused per host)
+    """
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "pools": active_pool_snapshots()
+    }
+
+
+@router.get("/health/proxies")
+async def proxies_health():
+    """
+    Proxy pool health: score, latency, bans and quarantine per proxy
+    """
+    proxies = proxy_pool.snapshot()
+    quarantined = [label for label, info in proxies.items() if info["quarantined_for"] > 0]
+
+    return {
+        "status": "degraded" if proxies and len(quarantined) == len(proxies) else "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "enabled": proxy_pool.enabled,
+        "quarantined": quarantined,
+        "proxies": proxies
+    }
@@ -0,0 +1,74 @@
+"""
+Golden-file test cho amenities_utils.process_amenities_text
+
+Chạy: python -m app.tests.amenities.golden            # so kết quả với golden.json, exit 1 nếu khác
+      python -m app.tests.amenities.golden --update   # ghi lại golden.json (chỉ khi cố ý đổi AMENITIES_MAPPING / logic)
+
+golden.json: corpus text thiết bị (một entry mỗi dòng) + kết quả [japanese, field] theo thứ tự AMENITIES_MAPPING.
+Expected được sinh từ bản cũ (exact substring + difflib với mọi item); corpus gồm cách viết thật của hai site,
+key bị sửa ký tự (nhánh fuzzy), danh sách nhiều kiểu phân cách, item dài > 200 ký tự (autojunk của difflib)
+và text trùng lặp (cache).
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+from app.utils.amenities_utils import process_amenities_text
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), 'golden.json')
+
+
+def _actual(text: str) -> List[List[str]]:
+    return [[amenity['japanese'], amenity['field']] for amenity in process_amenities_text(text)]
+
+
+def _write(entries: List[Dict[str, Any]]) -> None:
+    lines = [json.dumps(entry, ensure_ascii=False) for entry in entries]
+    with open(GOLDEN_PATH, 'w', encoding='utf-8') as f:
+        f.write('[\n' + ',\n'.join(lines) + '\n]\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Golden-file test for amenities matching")
+    parser.add_argument('--update', action='store_true', help="Ghi lại expected từ implementation hiện tại")
+    args = parser.parse_args()
+
+    with open(GOLDEN_PATH, encoding='utf-8') as f:
+        entries = json.load(f)
+
+    if args.update:
+        _write([{'text': entry['text'], 'amenities': _actual(entry['text'])} for entry in entries])
+        print(f"✍️ Updated {len(entries)} entries in {GOLDEN_PATH}")
+        return
+
+    started = time.perf_counter()
+    mismatches = 0
+    for i, entry in enumerate(entries):
+        actual = _actual(entry['text'])
+        if actual != entry['amenities']:
+            mismatches += 1
+            if mismatches <= 10:
+                print(f"❌ Entry {i}: {entry['text'][:80]!r}")
+                print(f"   expected: {entry['amenities']}")
+                print(f"   actual:   {actual}")
+    cold = time.perf_counter() - started
+
+    # Lần hai: toàn bộ từ cache
+    started = time.perf_counter()
+    for entry in entries:
+        process_amenities_text(entry['text'])
+    warm = time.perf_counter() - started
+
+    print(f"📊 {len(entries)} texts: {cold * 1000:.1f}ms (cached: {warm * 1000:.1f}ms)")
+    if mismatches:
+        print(f"❌ {mismatches} mismatches")
+        sys.exit(1)
+    print("✅ All entries match golden output")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark parse dt/dd + th/td: regex cũ (.*? giữa th và td) vs tokenizer HtmlProcessor.parse_label_maps
+
+Chạy: python -m app.tests.html_parsing.benchmark data/html_archive [--limit 500]   # HTML đã archive / file .html
+      python -m app.tests.html_parsing.benchmark --mock tokyu --pages 50 [--nav-rows 200]
+
+--nav-rows N chèn thêm một bảng N hàng chỉ có <th> (kiểu menu / bảng header) sau bảng cuối của nội dung: với regex cũ
+mỗi <th> không có <td> phía sau làm .*? quét tới cuối trang, thời gian tăng theo bình phương số <th>.
+Ngoài thời gian, script đếm số trang mà hai cách parse cho kết quả khác nhau (label / nội dung).
+"""
+
+import argparse
+import gzip
+import os
+import re
+import statistics
+import time
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from app.utils.html_processor_utils import HtmlProcessor
+
+_LEGACY_DT_DD = re.compile(r'<dt[^>]*>(.*?)</dt>\s*<dd[^>]*>(.*?)</dd>', re.DOTALL | re.IGNORECASE)
+_LEGACY_TH_TD = re.compile(r'<th[^>]*>(.*?)</th>.*?<td[^>]*>(.*?)</td>', re.DOTALL | re.IGNORECASE)
+_EXTENSIONS = ('.html', '.htm', '.html.gz', '.html.zst')
+
+
+def legacy_label_maps(html: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """parse_all_dt_dd / parse_all_th_td trước khi có tokenizer"""
+    maps = []
+    for pattern in (_LEGACY_DT_DD, _LEGACY_TH_TD):
+        result = {}
+        for match in pattern.finditer(html):
+            label = HtmlProcessor.clean_html(match.group(1)).strip()
+            if label:
+                result[label] = match.group(2).strip()
+        maps.append(result)
+    return maps[0], maps[1]
+
+
+def _read(path: str) -> str:
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path.endswith('.gz'):
+        data = gzip.decompress(data)
+    elif path.endswith('.zst'):
+        import zstandard
+        data = zstandard.ZstdDecompressor().decompress(data)
+    return data.decode('utf-8', errors='replace')
+
+
+def _files(paths: List[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for dirpath, _, filenames in os.walk(path):
+            for name in sorted(filenames):
+                if name.endswith(_EXTENSIONS):
+                    yield os.path.join(dirpath, name)
+
+
+def _mock_pages(site: str, pages: int) -> Iterator[str]:
+    from app.tests.mock_server.server import FaultConfig, Listing, MockSites
+
+    sites = MockSites(listings=pages, per_page=20, page_kb=200, seed=1, faults=FaultConfig(), api_faults=False)
+    sites.urls = {'mitsui': 'http://127.0.0.1:8781', 'tokyu': 'http://127.0.0.1:8782', 'api': 'http://127.0.0.1:8783'}
+    render = sites.mitsui_detail if site == 'mitsui' else sites.tokyu_detail
+    for i in range(pages):
+        yield render(Listing(sites.seed, i))
+
+
+def _with_nav_table(html: str, rows: int) -> str:
+    nav = '<table class="nav">' + ''.join(f'<tr><th>メニュー{i}</th></tr>' for i in range(rows)) + '</table>'
+    # Ngay sau bảng / dl cuối cùng của nội dung chính: phần còn lại của trang (menu, footer, script) không có <td>
+    position = max(html.rfind('</table>'), html.rfind('</dl>'))
+    if position < 0:
+        return html + nav
+    position = html.index('>', position) + 1
+    return html[:position] + nav + html[position:]
+
+
+def _timed(parse: Callable[[str], Tuple[Dict[str, str], Dict[str, str]]], html: str, repeat: int):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = parse(html)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dt/dd + th/td parsing")
+    parser.add_argument('paths', nargs='*', help="File / thư mục HTML (.html, .html.gz, .html.zst)")
+    parser.add_argument('--mock', choices=['mitsui', 'tokyu'], default=None, help="Dùng trang giả của mock server")
+    parser.add_argument('--pages', type=int, default=50, help="Số trang giả (--mock)")
+    parser.add_argument('--limit', type=int, default=None, help="Số file tối đa")
+    parser.add_argument('--nav-rows', type=int, default=0, help="Chèn bảng N hàng chỉ có <th> vào mỗi trang")
+    parser.add_argument('--repeat', type=int, default=3, help="Lấy lần nhanh nhất trong N lần")
+    parser.add_argument('--skip-legacy', action='store_true', help="Chỉ đo tokenizer (regex cũ quá chậm)")
+    args = parser.parse_args()
+
+    if args.mock:
+        pages = _mock_pages(args.mock, args.pages)
+    elif args.paths:
+        pages = (_read(path) for path in _files(args.paths))
+    else:
+        parser.error("Cần PATH hoặc --mock")
+
+    legacy_times: List[float] = []
+    new_times: List[float] = []
+    differing = 0
+    total_bytes = 0
+    for count, html in enumerate(pages, 1):
+        if args.limit and count > args.limit:
+            break
+        if args.nav_rows:
+            html = _with_nav_table(html, args.nav_rows)
+        total_bytes += len(html)
+
+        elapsed, (dt_dd, th_td) = _timed(HtmlProcessor.parse_label_maps, html, args.repeat)
+        new_times.append(elapsed)
+        if args.skip_legacy:
+            continue
+
+        elapsed, (legacy_dt_dd, legacy_th_td) = _timed(legacy_label_maps, html, args.repeat)
+        legacy_times.append(elapsed)
+        if legacy_dt_dd != dict(dt_dd) or legacy_th_td != dict(th_td):
+            differing += 1
+            if differing <= 5:
+                changed = sorted(
+                    {k for k in legacy_dt_dd.keys() | dt_dd.keys() if legacy_dt_dd.get(k) != dt_dd.get(k)} |
+                    {k for k in legacy_th_td.keys() | th_td.keys() if legacy_th_td.get(k) != th_td.get(k)}
+                )
+                print(f"🔀 Page {count}: labels differ: {changed[:10]}")
+
+    if not new_times:
+        print("⚠️ No pages found")
+        return
+
+    print(f"📄 {len(new_times)} pages, {total_bytes / len(new_times) / 1024:.0f}KB avg")
+    for name, times in (("legacy regex", legacy_times), ("tokenizer", new_times)):
+        if not times:
+            continue
+        print(
+            f"📊 {name:12s} total {sum(times) * 1000:.1f}ms | p50 {statistics.median(times) * 1000:.2f}ms | "
+            f"max {max(times) * 1000:.2f}ms"
+        )
+    if legacy_times:
+        print(f"🔀 Pages with different output: {differing}")
+
+
+if __name__ == "__main__":
+    main()
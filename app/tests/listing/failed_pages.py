@@ -0,0 +1,68 @@
+"""
+Kiểm tra: trang listing lỗi khi parse được tính là trang lỗi, không phải trang rỗng
+
+Chạy: python -m app.tests.listing.failed_pages
+
+Hàm page giả trả URL cho trang 1-4, trang 3 nhận body rỗng (HTTP 200) nên lxml raise giữa lúc parse,
+các trang sau rỗng. Trang 3 phải vào failed_page_numbers (→ DiscoveryIncomplete, không remove_missing)
+và không được tính vào chuỗi trang rỗng để dừng sớm.
+"""
+
+import asyncio
+from typing import List, Optional, Tuple
+
+from lxml import html
+
+from app.jobs.crawl_strcture.listing_fetcher import ListingFetcher
+from app.jobs.crawl_strcture.handle_multi_crawl_url import _iter_listing_pages
+
+BROKEN_PAGE = 3
+LAST_PAGE = 4
+
+
+def _make_page_func(broken: int):
+    async def fetch_page_urls(page: int, fetcher: ListingFetcher, detect_max_pages: bool = False) -> Tuple[List[str], Optional[int]]:
+        urls = []
+        content = b"" if page == broken else f"<ul><li><a href='/room/{page}'>room</a></li></ul>".encode()
+        await asyncio.sleep(0)
+        if page <= LAST_PAGE:
+            # Body rỗng / bị cắt → ParserError: Document is empty
+            tree = html.fromstring(content)
+            for a_tag in tree.cssselect("a"):
+                urls.append(a_tag.get("href"))
+                fetcher.row_signatures[a_tag.get("href")] = page
+        return urls, 20 if detect_max_pages else None
+    return fetch_page_urls
+
+
+async def _check(broken: int) -> bool:
+    fetcher = ListingFetcher(headers={}, concurrency=1, empty_page_limit=2)
+    pages = []
+    async for page_urls in _iter_listing_pages(fetcher, _make_page_func(broken), default_num_pages=10):
+        pages.append(page_urls)
+
+    found = [url for urls in pages for url in urls]
+    expected = [f"/room/{page}" for page in range(1, LAST_PAGE + 1) if page != broken]
+    print(f"Broken page {broken}: {fetcher.summary()} | failed pages: {sorted(fetcher.failed_page_numbers)} | URLs: {found}")
+
+    ok = True
+    if fetcher.failed_pages != 1 or fetcher.failed_page_numbers != {broken}:
+        print(f"  ❌ page {broken} not counted as failed")
+        ok = False
+    if sorted(found) != expected:
+        print(f"  ❌ expected URLs {expected}")
+        ok = False
+    if fetcher.pages_empty == 0 or fetcher.pages_skipped == 0:
+        print("  ❌ trailing empty pages did not stop discovery")
+        ok = False
+    return ok
+
+
+async def main():
+    results = [await _check(BROKEN_PAGE), await _check(1)]
+    print("✅ All checks passed" if all(results) else "❌ Some checks failed")
+    return all(results)
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
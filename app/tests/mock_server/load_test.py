@@ -0,0 +1,100 @@
+"""
+Load test crawler (EnhancedPropertyCrawler, rate limiter, circuit breaker, Mongo writer) với mock server
+
+Chạy: python -m app.tests.mock_server.load_test --site mitsui --listings 10000 [--error-rate 0.01] [--rate-429 0.005]
+      python -m app.tests.mock_server.load_test --site tokyu --listings 100000 --set RATE_LIMIT_MAX=200 --set BATCH_SIZE=50
+
+Cần MongoDB (MONGODB_URL trong .env). Dữ liệu ghi vào collection riêng `<collection>_loadtest` (xoá trước mỗi lần chạy,
+đổi bằng --collection-suffix) để không đụng dữ liệu thật. Geocoding dùng endpoint JSON của mock server thay cho Selenium.
+Chạy hai lần liên tiếp với --keep để đo lần crawl lại (conditional GET → 304, content fingerprint).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+
+from app.tests.mock_server.server import add_arguments, server_from_args
+
+# Fix for Windows ProactorEventLoop issue
+if platform.system() == 'Windows':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+
+def _apply_overrides(overrides: dict) -> None:
+    """Ghi đè settings qua biến môi trường - phải chạy trước khi import app.core.config"""
+    if 'app.core.config' in sys.modules:
+        raise RuntimeError("app.core.config đã được import, settings override sẽ không có tác dụng")
+    for key, value in overrides.items():
+        os.environ[key] = str(value)
+        print(f"   {key}={value}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test crawler against the mock server")
+    parser.add_argument('--site', choices=['mitsui', 'tokyu'], default='mitsui')
+    parser.add_argument('--collection-suffix', default='_loadtest')
+    parser.add_argument('--keep', action='store_true', help="Không xoá collection trước khi chạy (đo lần crawl lại)")
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE', help="Ghi đè setting bất kỳ")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = await server_from_args(args).start()
+    print(f"🧪 Mock server: {args.listings} listings, {server.sites.num_pages} listing pages, "
+          f"latency {args.latency}s (+{args.jitter}s), 503 {args.error_rate:.1%}, 429 {args.rate_429:.1%}")
+
+    collection_key = f"COLLECTION_NAME_{args.site.upper()}"
+    overrides = server.settings_overrides()
+    overrides[collection_key] = f"room_{args.site}{args.collection_suffix}"
+    overrides['CRAWLER_CASSETTE_MODE'] = 'off'
+    for item in args.set:
+        key, _, value = item.partition('=')
+        overrides[key.strip()] = value.strip()
+    _apply_overrides(overrides)
+
+    # Import sau khi đặt biến môi trường (constants của site đọc settings lúc import)
+    from app.core.config import settings
+    from app.db.mongodb import connect_to_mongo, close_mongo_connection, get_collection
+    from app.utils import city_utils, prefecture_utils, district_utils
+    from app.jobs.crawl_strcture.rate_limiter import rate_limiter
+    from app.jobs.crawl_strcture.circuit_breaker import breaker_registry
+    if args.site == 'mitsui':
+        from app.jobs.mitsui_crawl_page.index import crawl_multi
+    else:
+        from app.jobs.tokyu_crawl_page.index import crawl_multi
+
+    collection_name = getattr(settings, collection_key)
+    try:
+        await connect_to_mongo()
+        await city_utils.init()
+        await prefecture_utils.init()
+        district_utils.ensure_district_index()
+
+        collection = get_collection(collection_name)
+        if not args.keep:
+            await collection.delete_many({})
+            print(f"🧹 Cleared {collection_name}")
+
+        started = time.perf_counter()
+        await crawl_multi()
+        elapsed = time.perf_counter() - started
+
+        saved = await collection.count_documents({})
+        print("\n" + "=" * 60)
+        print(f"📊 LOAD TEST [{args.site}] {args.listings} listings in {elapsed:.1f}s")
+        print(f"   Throughput: {args.listings / elapsed:.1f} listings/s")
+        print(f"   Saved in {collection_name}: {saved} ({saved / max(1, args.listings):.1%})")
+        print(f"   Mock server responses: {json.dumps(dict(sorted(server.sites.stats.items())))}")
+        print(f"   Rate limiter: {json.dumps(rate_limiter.snapshot(), default=str)}")
+        print(f"   Circuit breakers: {json.dumps(breaker_registry.snapshot(), default=str)}")
+        print("=" * 60)
+    finally:
+        await close_mongo_connection()
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,461 @@
+"""
+Mock server cho load test crawler: Mitsui, Tokyu và các API phụ (gallery, station, translate, geocoding)
+
+Chạy riêng: python -m app.tests.mock_server.server [--listings 10000] [--latency 0.05] [--error-rate 0.01] [--rate-429 0.01]
+Load test:  python -m app.tests.mock_server.load_test (tự bật server này)
+
+Mỗi "site" chạy trên một port riêng để rate limiter / circuit breaker (theo host:port) tách biệt như thật:
+- port:   Mitsui  /rf/result?page=N (listing), /rf/tatemono/{id}/{room} (detail, dt/dd + biến RF_*)
+- port+1: Tokyu   /rent_search/{area}/page:N (listing), /rent/{id}/{room} (detail, dt/dd + th/td + album)
+- port+2: API     /gallery/{id}.json, /api/routes/get_by_position, /translate, /maps/geocode
+
+Dữ liệu sinh theo seed + id listing → cùng tham số thì cùng nội dung (ETag ổn định, conditional GET trả 304).
+Lỗi giả lập (latency, 5xx, 429 + Retry-After) chỉ áp dụng cho hai site, API phụ dùng --api-faults.
+--dead-rate: tỉ lệ listing vẫn có trên trang listing nhưng detail đã đóng (một nửa 404, một nửa redirect về search).
+Đếm request theo loại / status tại GET /__stats trên mỗi port.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import platform
+import random
+from collections import Counter
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+# Fix for Windows ProactorEventLoop issue
+if platform.system() == 'Windows':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+TOKYU_AREA = '%E5%9F%BC%E7%8E%89%E7%9C%8C-%E5%8D%83%E8%91%89%E7%9C%8C-%E6%9D%B1%E4%BA%AC%E9%83%BD-%E7%A5%9E%E5%A5%88%E5%B7%9D%E7%9C%8C'
+
+_BUILDING_WORDS = ['パーク', 'レジデンス', 'コート', 'ハイツ', 'テラス', 'ヒルズ', 'タワー', 'ガーデン']
+_PLACES = ['青山', '麻布', '代々木', '目黒', '白金', '恵比寿', '永福', '桜台']
+_WARDS = [('港区', 35.66, 139.74), ('渋谷区', 35.66, 139.70), ('目黒区', 35.64, 139.70), ('練馬区', 35.74, 139.65)]
+_ROOM_TYPES = ['1R', '1K', '1LDK', '2LDK', '3LDK']
+_STRUCTURES = ['鉄筋コンクリート造', '鉄骨鉄筋コンクリート造', '鉄骨造']
+_DIRECTIONS = ['南', '南東', '東', '西', '北']
+_AMENITIES = ['エアコン', 'バス・トイレ別', '温水洗浄便座', 'システムキッチン', 'フローリング', 'BS', 'インターネット対応', 'オートロック']
+
+
+class FaultConfig:
+    """Độ trễ và lỗi giả lập cho mỗi request"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, rate_429: float = 0.0, retry_after: int = 1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+
+
+class Listing:
+    """Một listing giả, sinh ổn định từ (seed, id)"""
+
+    def __init__(self, seed: int, listing_id: int):
+        rnd = random.Random(seed * 1_000_003 + listing_id)
+        self.id = listing_id
+        self.room = 101 + rnd.randrange(12) * 100 + rnd.randrange(10)
+        self.floor = self.room // 100
+        self.floors = self.floor + rnd.randrange(1, 15)
+        self.name = f"{rnd.choice(_PLACES)}{rnd.choice(_BUILDING_WORDS)}{listing_id}"
+        ward = rnd.choice(_WARDS)[0]
+        self.address = f"東京都{ward}{rnd.choice(_PLACES)}{rnd.randrange(1, 6)}丁目{rnd.randrange(1, 30)}-{rnd.randrange(1, 20)}"
+        self.dead_roll = rnd.random()
+        self.rent = rnd.randrange(60, 400) * 1000
+        self.maintenance = rnd.randrange(0, 20) * 1000
+        self.room_type = rnd.choice(_ROOM_TYPES)
+        self.size = round(rnd.uniform(18, 120), 2)
+        self.year = rnd.randrange(1980, 2025)
+        self.structure = rnd.choice(_STRUCTURES)
+        self.direction = rnd.choice(_DIRECTIONS)
+        self.amenities = '、'.join(rnd.sample(_AMENITIES, rnd.randrange(2, len(_AMENITIES))))
+        self.images = rnd.randrange(3, 20)
+
+
+class MockSites:
+    """Sinh HTML / JSON cho cả hai site; port của từng host được gán khi start"""
+
+    def __init__(
+        self,
+        listings: int,
+        per_page: int,
+        page_kb: int,
+        seed: int,
+        faults: FaultConfig,
+        api_faults: bool,
+        dead_rate: float = 0.0
+    ):
+        self.listings = listings
+        self.per_page = per_page
+        self.page_kb = page_kb
+        self.seed = seed
+        self.faults = faults
+        self.api_faults = api_faults
+        self.dead_rate = dead_rate
+        self.urls: Dict[str, str] = {}
+        self.stats: Counter = Counter()
+        self._rnd = random.Random(seed)
+        self._filler = self._make_filler(page_kb)
+
+    @property
+    def num_pages(self) -> int:
+        return max(1, -(-self.listings // self.per_page))
+
+    def listing(self, listing_id: int) -> Optional[Listing]:
+        if not 0 <= listing_id < self.listings:
+            return None
+        return Listing(self.seed, listing_id)
+
+    def page_items(self, page: int) -> List[Listing]:
+        start = (page - 1) * self.per_page
+        return [Listing(self.seed, i) for i in range(max(0, start), min(self.listings, start + self.per_page))]
+
+    @staticmethod
+    def _make_filler(size_kb: int) -> str:
+        """Phần HTML không liên quan (menu, script, listing gợi ý) để trang có kích thước như thật"""
+        rows = []
+        size = 0
+        i = 0
+        while size < size_kb * 1024:
+            row = f'<li class="related"><a href="/related/{i}">関連物件 {i}</a><span>おすすめ</span></li>\n'
+            rows.append(row)
+            size += len(row.encode('utf-8'))
+            i += 1
+        return f"<ul class=\"related-list\">{''.join(rows)}</ul>"
+
+    # ---------------------------------------------------------------- Mitsui
+
+    def mitsui_listing(self, page: int) -> str:
+        base = self.urls['mitsui']
+        rows = ''.join(
+            f'<tr class="c-room-list__body-row" data-js-room-link="{base}/rf/tatemono/{item.id}/{item.room}">'
+            f'<td>{item.name}</td><td>{item.rent:,}円</td><td>{item.room_type}</td><td>{item.size}㎡</td></tr>'
+            for item in self.page_items(page)
+        )
+        pagination = ''.join(
+            f'<li class="c-pagination__item"><a class="c-pagination__link" href="/rf/result?page={p}">{p}</a></li>'
+            for p in sorted({1, page, self.num_pages})
+        )
+        return (
+            '<html><head><meta charset="utf-8"><title>検索結果</title></head><body>'
+            f'<table class="c-room-list"><tbody>{rows}</tbody></table>'
+            f'<ul class="c-pagination">{pagination}</ul></body></html>'
+        )
+
+    def mitsui_detail(self, item: Listing) -> str:
+        api = self.urls['api']
+        dl = ''.join(f'<dt>{label}</dt><dd>{value}</dd>' for label, value in [
+            ('入居可能日', '即可'),
+            ('駐車場', 'なし' if item.id % 3 else 'あり'),
+            ('めやす賃料', f'{item.rent + item.maintenance:,}円'),
+            ('敷金／礼金', '1ヶ月 / 1ヶ月'),
+            ('間取り・面積', f'{item.room_type} / {item.size}㎡'),
+            ('竣工日', f'{item.year}年3月'),
+            ('規模構造', f'{item.structure} 地上{item.floors}階地下1階建'),
+            ('更新料', '新賃料の1ヶ月分'),
+            ('方位', item.direction),
+            ('その他費用', '玄関錠交換代 22,000円'),
+            ('専有部・共用部設備', item.amenities),
+            ('備考', 'テストデータ'),
+        ])
+        return (
+            '<html><head><meta charset="utf-8"></head><body>'
+            f'<h1>{item.name} {item.floor}階{item.room}</h1>'
+            '<dl class="c-room-detail">'
+            f'<dt>所在地</dt><dd>地図</dd><dd>{item.address}</dd>'
+            f'<dt>賃料</dt><dd class="c-room-detail__rent">{item.rent:,}円／{item.maintenance:,}円</dd>'
+            f'{dl}</dl>'
+            '<script>'
+            f'var RF_firstfloorplan_photo = "{api}/images/{item.id}/floorplan.jpg";'
+            f'var RF_gallery_url = "{api}/gallery/{item.id}.json";'
+            '</script>'
+            f'{self._filler}</body></html>'
+        )
+
+    # ---------------------------------------------------------------- Tokyu
+
+    def tokyu_listing(self, page: int) -> str:
+        rows = ''.join(
+            f'<tr><td><a href="/rent/{item.id}/{item.room}">{item.name}</a></td>'
+            f'<td>{item.rent:,}円</td><td>{item.room_type}</td><td>{item.size}m²</td></tr>'
+            for item in self.page_items(page)
+        )
+        pagination = ''.join(
+            f'<li class="pgnt"><a href="/rent_search/{TOKYU_AREA}/page:{p}">{p}</a></li>'
+            for p in sorted({1, page, self.num_pages})
+        )
+        return (
+            '<html><head><meta charset="utf-8"></head><body>'
+            '<div id="search_result_rent"><div><div class="item_rooms"><div class="item_room_table">'
+            f'<table><tbody>{rows}</tbody></table>'
+            f'</div></div></div></div><ul>{pagination}</ul></body></html>'
+        )
+
+    def tokyu_detail(self, item: Listing) -> str:
+        dl = ''.join(f'<dt>{label}</dt><dd>{value}</dd>' for label, value in [
+            ('物件名', item.name),
+            ('種別', 'マンション'),
+            ('建物構造', item.structure),
+            ('所在地', item.address),
+            ('築年月', f'{item.year}年3月'),
+        ])
+        table = ''.join(f'<tr><th>{label}</th><td>{value}</td></tr>' for label, value in [
+            ('間取り（タイプ）', item.room_type),
+            ('部屋番号', item.room),
+            ('所在階/階建', f'{item.floor}階/{item.floors}階建'),
+            ('専有面積', f'{item.size}m²'),
+            ('方位', item.direction),
+            ('賃料', f'<span>{item.rent // 10000}.{item.rent % 10000 // 1000}万円</span>'),
+            ('管理費・共益費', f'{item.maintenance}円'),
+            ('敷金/保証金', '1ヶ月/-'),
+            ('礼金/償却・敷引', '1ヶ月/-'),
+            ('更新料', '1ヶ月'),
+            ('設備・条件', item.amenities),
+            ('敷金積増', 'ペット飼育時 1ヶ月'),
+            ('フリーレント', '-'),
+            ('入居可能日', '即入居可'),
+            ('退去時費用', '清掃費：45,000円\n鍵交換費'),
+            ('ペット可区分', '<ul><li>区分</li><li>小型犬可</li></ul>'),
+            ('備考', 'テストデータ'),
+        ])
+        album = ''.join(
+            f'<div id="i{n:03d}"><img src="/images/{item.id}/i{n:03d}.jpg"></div>'
+            for n in range(1, item.images)
+        )
+        return (
+            '<html><head><meta charset="utf-8"></head><body>'
+            f'<dl>{dl}</dl><table><tbody>{table}</tbody></table>'
+            f'<div id="side_roomplan"><p><a><img src="/images/{item.id}/plan.jpg"></a></p></div>'
+            f'<div id="album_photos"><div id="m000"><img src="/images/{item.id}/m000.jpg"></div>{album}</div>'
+            # Sau gmap_view là bản đồ + listing liên quan (phần crawler bỏ qua nhờ body_end_marker)
+            f'<div id="gmap_view"></div>{self._filler}</body></html>'
+        )
+
+    # ------------------------------------------------------------------ API
+
+    def gallery(self, item: Listing) -> List[Dict[str, object]]:
+        api = self.urls['api']
+        images = [{"filename": f"{api}/images/{item.id}/exterior.jpg", "ROOM_NO": 99999}]
+        images += [{"filename": f"{api}/images/{item.id}/{n}.jpg", "ROOM_NO": item.room} for n in range(item.images)]
+        return images
+
+    @staticmethod
+    def stations(lat: float, lng: float) -> List[Dict[str, object]]:
+        rnd = random.Random(f"{lat:.4f},{lng:.4f}")
+        return [
+            {
+                "name": f"{rnd.choice(_PLACES)}駅",
+                "lines_info": [{"name": f"テスト{rnd.randrange(1, 9)}号線"}],
+                "distance": round(rnd.uniform(0.1, 1.5), 2),
+            }
+            for _ in range(rnd.randrange(1, 7))
+        ]
+
+    def geocode(self, address: str) -> Optional[Dict[str, float]]:
+        # Địa chỉ do chính server sinh → suy ra lại toạ độ ổn định từ hash
+        for ward, lat_base, lng_base in _WARDS:
+            if ward in address:
+                digest = int(hashlib.md5(address.encode('utf-8')).hexdigest()[:8], 16)
+                return {"lat": round(lat_base + (digest % 4000) / 100000 - 0.02, 6),
+                        "lng": round(lng_base + (digest // 4000 % 4000) / 100000 - 0.02, 6)}
+        return None
+
+
+def _html_response(request: web.Request, body: str) -> web.Response:
+    """HTML kèm ETag; If-None-Match khớp → 304 (để thử conditional GET / HTTP cache)"""
+    data = body.encode('utf-8')
+    etag = f'"{hashlib.md5(data).hexdigest()}"'
+    if request.headers.get('If-None-Match') == etag:
+        request.app['sites'].stats[f"{request.app['kind']}:304"] += 1
+        return web.Response(status=304, headers={'ETag': etag})
+    return web.Response(body=data, content_type='text/html', charset='utf-8', headers={'ETag': etag})
+
+
+@web.middleware
+async def _fault_middleware(request: web.Request, handler):
+    sites: MockSites = request.app['sites']
+    kind = request.app['kind']
+    if request.path == '/__stats':
+        return await handler(request)
+
+    faults = sites.faults
+    if kind != 'api' or sites.api_faults:
+        delay = faults.latency + (sites._rnd.uniform(0, faults.jitter) if faults.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        roll = sites._rnd.random()
+        if roll < faults.rate_429:
+            sites.stats[f"{kind}:429"] += 1
+            return web.Response(status=429, text='Too Many Requests', headers={'Retry-After': str(faults.retry_after)})
+        if roll < faults.rate_429 + faults.error_rate:
+            sites.stats[f"{kind}:503"] += 1
+            return web.Response(status=503, text='Service Unavailable')
+
+    try:
+        response = await handler(request)
+    except web.HTTPException as e:
+        sites.stats[f"{kind}:{e.status}"] += 1
+        raise
+    if response.status != 304:
+        sites.stats[f"{kind}:{response.status}"] += 1
+    return response
+
+
+def _listing_or_404(sites: MockSites, listing_id: str) -> Listing:
+    item = sites.listing(int(listing_id)) if listing_id.isdigit() else None
+    if item is None:
+        raise web.HTTPNotFound()
+    return item
+
+
+def _live_listing(sites: MockSites, listing_id: str, search_path: str) -> Listing:
+    """Listing của detail page; phòng đã đóng (--dead-rate) → 404 hoặc redirect về trang search"""
+    item = _listing_or_404(sites, listing_id)
+    if item.dead_roll < sites.dead_rate / 2:
+        raise web.HTTPNotFound()
+    if item.dead_roll < sites.dead_rate:
+        raise web.HTTPFound(search_path)
+    return item
+
+
+async def _stats(request: web.Request) -> web.Response:
+    return web.json_response(dict(request.app['sites'].stats))
+
+
+def _create_app(sites: MockSites, kind: str) -> web.Application:
+    app = web.Application(middlewares=[_fault_middleware])
+    app['sites'] = sites
+    app['kind'] = kind
+    app.router.add_get('/__stats', _stats)
+
+    if kind == 'mitsui':
+        async def listing(request):
+            page = int(request.query.get('page', '1'))
+            return _html_response(request, sites.mitsui_listing(page))
+
+        async def detail(request):
+            item = _live_listing(sites, request.match_info['listing_id'], '/rf/result?page=1')
+            return _html_response(request, sites.mitsui_detail(item))
+
+        app.router.add_get('/rf/result', listing)
+        app.router.add_get('/rf/tatemono/{listing_id}/{room}', detail)
+
+    elif kind == 'tokyu':
+        async def listing(request):
+            return _html_response(request, sites.tokyu_listing(int(request.match_info['page'])))
+
+        async def detail(request):
+            item = _live_listing(sites, request.match_info['listing_id'], f'/rent_search/{TOKYU_AREA}/page:1')
+            return _html_response(request, sites.tokyu_detail(item))
+
+        app.router.add_get(r'/rent_search/{area}/page:{page:\d+}', listing)
+        app.router.add_get('/rent/{listing_id}/{room}', detail)
+
+    else:
+        async def gallery(request):
+            return web.json_response(sites.gallery(_listing_or_404(sites, request.match_info['listing_id'])))
+
+        async def stations(request):
+            try:
+                lat, lng = float(request.query['lat']), float(request.query['lng'])
+            except (KeyError, ValueError):
+                return web.json_response({"error": "lat/lng required"}, status=400)
+            return web.json_response(sites.stations(lat, lng))
+
+        async def translate(request):
+            return web.json_response({"destination-text": f"EN {request.query.get('text', '')}"})
+
+        async def geocode(request):
+            result = sites.geocode(request.query.get('address', ''))
+            return web.json_response(result or {"lat": None, "lng": None})
+
+        app.router.add_get('/gallery/{listing_id}.json', gallery)
+        app.router.add_get('/api/routes/get_by_position', stations)
+        app.router.add_get('/translate', translate)
+        app.router.add_get('/maps/geocode', geocode)
+
+    return app
+
+
+class MockServer:
+    """Ba host của mock server trong event loop hiện tại"""
+
+    def __init__(self, sites: MockSites, host: str = '127.0.0.1', port: int = 8780):
+        self.sites = sites
+        self.host = host
+        self.port = port
+        self._runners: List[web.AppRunner] = []
+
+    async def start(self) -> "MockServer":
+        for offset, kind in enumerate(('mitsui', 'tokyu', 'api')):
+            self.sites.urls[kind] = f"http://{self.host}:{self.port + offset}"
+        for offset, kind in enumerate(('mitsui', 'tokyu', 'api')):
+            runner = web.AppRunner(_create_app(self.sites, kind), access_log=None)
+            await runner.setup()
+            await web.TCPSite(runner, self.host, self.port + offset).start()
+            self._runners.append(runner)
+        return self
+
+    async def stop(self) -> None:
+        for runner in self._runners:
+            await runner.cleanup()
+        self._runners.clear()
+
+    def settings_overrides(self) -> Dict[str, str]:
+        """Biến môi trường để crawler trỏ vào mock server (đặt trước khi import app.core.config)"""
+        urls = self.sites.urls
+        return {
+            'MITSUI_BASE_URL': urls['mitsui'],
+            'TOKYU_BASE_URL': urls['tokyu'],
+            'STATION_URL': f"{urls['api']}/api/routes/get_by_position",
+            'TRANSLATE_API_URL': f"{urls['api']}/translate",
+            'GEOCODING_API_URL': f"{urls['api']}/maps/geocode",
+        }
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Tham số dùng chung cho server.py và load_test.py"""
+    parser.add_argument('--listings', type=int, default=10000, help="Số listing mỗi site")
+    parser.add_argument('--per-page', type=int, default=50, help="Số listing mỗi trang listing")
+    parser.add_argument('--page-kb', type=int, default=120, help="Kích thước phần filler của detail page (KB)")
+    parser.add_argument('--latency', type=float, default=0.05, help="Độ trễ mỗi request (giây)")
+    parser.add_argument('--jitter', type=float, default=0.05, help="Độ trễ ngẫu nhiên thêm vào (0..jitter giây)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Tỉ lệ 503")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="Tỉ lệ 429 (kèm Retry-After)")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--api-faults', action='store_true', help="Áp dụng latency / lỗi cho cả API phụ")
+    parser.add_argument('--dead-rate', type=float, default=0.0, help="Tỉ lệ listing có detail đã đóng (404 / redirect)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8780, help="Mitsui = port, Tokyu = port+1, API = port+2")
+
+
+def server_from_args(args: argparse.Namespace) -> MockServer:
+    faults = FaultConfig(args.latency, args.jitter, args.error_rate, args.rate_429, args.retry_after)
+    sites = MockSites(args.listings, args.per_page, args.page_kb, args.seed, faults, args.api_faults, args.dead_rate)
+    return MockServer(sites, args.host, args.port)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Mock Mitsui / Tokyu / station server")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = await server_from_args(args).start()
+    print(f"🧪 Mock server: {args.listings} listings/site, {server.sites.num_pages} pages/site")
+    for key, value in server.settings_overrides().items():
+        print(f"   {key}={value}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,131 @@
+"""
+Benchmark HTTP transport (aiohttp vs httpx) cho detail-page fetch
+
+Chạy: python -m app.tests.transport.benchmark [--requests 500] [--concurrency 10] [--latency 0.05]
+      python -m app.tests.transport.benchmark --base-url https://localhost:8443  # server thật / server HTTP/2
+
+Mặc định tự bật một stand-in server (aiohttp.web) trả trang HTML giả có cùng kích thước với detail page.
+aiohttp.web chỉ có HTTP/1.1, nên để đo HTTP/2 multiplexing của httpx hãy trỏ --base-url tới server
+hỗ trợ h2 (vd: hypercorn) hoặc chính site cần so sánh (nhớ giảm --requests).
+"""
+
+import argparse
+import asyncio
+import platform
+import statistics
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from app.jobs.crawl_strcture.transport import AIOHTTP, HTTPX, create_transport
+
+# Fix for Windows ProactorEventLoop issue
+if platform.system() == 'Windows':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+
+def _fake_detail_page(size_kb: int) -> bytes:
+    rows = []
+    i = 0
+    while sum(len(r) for r in rows) < size_kb * 1024:
+        rows.append(f"<dl><dt>項目{i}</dt><dd>値 {i} テスト データ</dd></dl>\n")
+        i += 1
+    return f"<html><head><meta charset=\"utf-8\"></head><body>{''.join(rows)}</body></html>".encode('utf-8')
+
+
+async def _start_stand_in(latency: float, size_kb: int, port: int) -> web.AppRunner:
+    body = _fake_detail_page(size_kb)
+
+    async def detail(request: web.Request) -> web.Response:
+        if latency:
+            await asyncio.sleep(latency)
+        return web.Response(body=body, content_type='text/html', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/rooms/{room_id}', detail)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    return runner
+
+
+async def _run(transport_name: str, base_url: str, total: int, concurrency: int) -> Optional[Dict[str, float]]:
+    latencies: List[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(f"{base_url}/rooms/{i}")
+
+    transport = create_transport(transport_name, pool_size=concurrency)
+    if transport.name != transport_name:
+        print(f"⏭️ Skipping {transport_name}: not available")
+        await transport.close()
+        return None
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            url = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                async with transport.stream(url) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    async with transport:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        snapshot = transport.snapshot()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "elapsed": elapsed,
+        "rps": total / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "errors": errors,
+        "snapshot": snapshot,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark crawler HTTP transports")
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.05, help="Độ trễ của stand-in server (giây)")
+    parser.add_argument('--size-kb', type=int, default=150, help="Kích thước trang giả (KB)")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--base-url', default=None, help="Dùng server có sẵn thay cho stand-in")
+    parser.add_argument('--transports', default=f"{AIOHTTP},{HTTPX}")
+    args = parser.parse_args()
+
+    runner = None
+    base_url = args.base_url
+    if not base_url:
+        runner = await _start_stand_in(args.latency, args.size_kb, args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+        print(f"🧪 Stand-in server at {base_url} (latency {args.latency}s, {args.size_kb}KB pages)")
+
+    try:
+        for name in args.transports.split(','):
+            result = await _run(name.strip(), base_url, args.requests, args.concurrency)
+            if not result:
+                continue
+            print(
+                f"📊 {name:8s} {result['elapsed']:.2f}s | {result['rps']:.1f} req/s | "
+                f"p50 {result['p50']:.1f}ms | p95 {result['p95']:.1f}ms | errors {result['errors']}"
+            )
+            print(f"   {result['snapshot']}")
+    finally:
+        if runner:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,7 +1,9 @@
 """
 Amenities processing utilities
 """
-from typing import Dict, Any, List
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
 import difflib
 
 AMENITIES_MAPPING = {
@@ -83,42 +85,89 @@ AMENITIES_MAPPING = {
     'インターホン': 'autolock',
 }
 
+SIMILARITY_THRESHOLD = 0.5
+_CACHE_SIZE = 4096  # Nhiều phòng trong cùng toà nhà có cùng text thiết bị
+
+
+def _build_char_postings(keys: List[str]) -> Dict[str, List[Tuple[int, int]]]:
+    """Index ký tự của các key: ký tự → [(vị trí key, số lần xuất hiện trong key)]"""
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    for index, key in enumerate(keys):
+        for char, count in Counter(key).items():
+            postings.setdefault(char, []).append((index, count))
+    return postings
+
+
+# Build một lần lúc import
+_KEYS = list(AMENITIES_MAPPING)
+_KEY_LENGTHS = [len(key) for key in _KEYS]
+_MAX_KEY_LENGTH = max(_KEY_LENGTHS)
+_CHAR_POSTINGS = _build_char_postings(_KEYS)
+
+
+def _similar_keys(item: str, found: set) -> set:
+    """
+    Key chưa tìm thấy có SequenceMatcher(key, item).ratio() >= SIMILARITY_THRESHOLD
+
+    ratio = 2*M / (len(key) + len(item)) với M (số ký tự khớp) <= số ký tự chung (tính cả lặp lại)
+    → key có 4 * số ký tự chung < len(key) + len(item) không thể đạt 0.5, bỏ qua không gọi difflib.
+    Bound không bao giờ loại key thực sự khớp nên kết quả giống hệt vòng lặp difflib cũ.
+    """
+    item_length = len(item)
+    # Item dài hơn 3 lần key dài nhất: ratio < 0.5 với mọi key
+    if not item or item_length > 3 * _MAX_KEY_LENGTH:
+        return set()
+
+    overlap: Dict[int, int] = {}
+    for char, item_count in Counter(item).items():
+        for index, key_count in _CHAR_POSTINGS.get(char, ()):
+            overlap[index] = overlap.get(index, 0) + min(key_count, item_count)
+
+    similar = set()
+    matcher = None
+    for index, common in overlap.items():
+        if index in found or 4 * common < _KEY_LENGTHS[index] + item_length:
+            continue
+        if matcher is None:
+            # seq2 (item) cố định, đổi seq1 theo key: SequenceMatcher chỉ index seq2 một lần
+            matcher = difflib.SequenceMatcher(None, '', item)
+        matcher.set_seq1(_KEYS[index])
+        if matcher.ratio() >= SIMILARITY_THRESHOLD:
+            similar.add(index)
+    return similar
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _match_amenities(amenities_text: str) -> Tuple[int, ...]:
+    """Vị trí (theo thứ tự AMENITIES_MAPPING) của các key khớp với text"""
+    # Exact match: substring của text
+    found = {index for index, key in enumerate(_KEYS) if key in amenities_text}
+
+    # Fuzzy match: key còn lại giống một item (tách theo dấu phẩy)
+    for item in {item.strip() for item in amenities_text.split(',')}:
+        found |= _similar_keys(item, found)
+
+    return tuple(sorted(found))
+
+
 def process_amenities_text(amenities_text: str) -> List[Dict[str, str]]:
     """
     Process amenities text and map Japanese amenities to field names
     using diff-based similarity matching
     
+    Exact substring match trước, key còn lại so với từng item bằng difflib (ratio >= 0.5) sau khi lọc
+    bằng index ký tự. Kết quả được cache theo text.
+    
     Args:
         amenities_text: Raw amenities text from HTML
         
     Returns:
         List of dictionaries with amenity info
     """
-    found_amenities = []
-    
-    # Split the amenities text into individual items
-    amenity_items = [item.strip() for item in amenities_text.split(',')]
-    
-    for jp_amenity, field_name in AMENITIES_MAPPING.items():
-        # Check for exact match first (for efficiency)
-        if jp_amenity in amenities_text:
-            found_amenities.append({
-                'japanese': jp_amenity,
-                'field': field_name
-            })
-            continue
-            
-        # If no exact match, check for similarity with each item
-        for item in amenity_items:
-            similarity = difflib.SequenceMatcher(None, jp_amenity, item).ratio()
-            if similarity >= 0.5:
-                found_amenities.append({
-                    'japanese': jp_amenity,
-                    'field': field_name,
-                })
-                break
-    
-    return found_amenities
+    return [
+        {'japanese': _KEYS[index], 'field': AMENITIES_MAPPING[_KEYS[index]]}
+        for index in _match_amenities(amenities_text)
+    ]
 
 
 def apply_amenities_to_data(amenities_text: str, data: Dict[str, Any]) -> None:
@@ -0,0 +1,173 @@
+"""
+HTTP cassette: ghi lại / phát lại response để chạy crawl offline, có thể lặp lại
+
+CRAWLER_CASSETTE_MODE:
+- off:    không làm gì (mặc định)
+- record: mọi response crawler nhận được (listing, detail, gallery JSON, station API, translate)
+          được ghi vào CRAWLER_CASSETTE_PATH (JSONL nén gzip, mỗi dòng một response)
+- replay: không gửi request thật, trả response đã ghi; độ trễ = thời gian lúc record
+          × CRAWLER_CASSETTE_REPLAY_LATENCY (0 = trả ngay)
+
+Key của một response: method + URL (query đã merge params và sắp xếp) + có gửi conditional headers hay không.
+Cùng key được ghi nhiều lần (vd: 503 rồi 200 khi retry) thì replay trả lần lượt theo thứ tự, hết thì lặp lại lần cuối.
+"""
+
+import atexit
+import base64
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MODE_OFF = "off"
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+
+
+def cassette_key(method: str, url: str, params: Optional[Mapping[str, Any]] = None, conditional: bool = False) -> str:
+    """Key ổn định cho một request: query string của url + params, sắp xếp theo tên"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query.extend((str(k), str(v)) for k, v in params.items())
+    canonical = urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(sorted(query)), ""))
+    return f"{method.upper()} {canonical}" + (" [conditional]" if conditional else "")
+
+
+class Cassette:
+    """File cassette của một process (dùng chung cho transport async và http_client)"""
+
+    def __init__(self, mode: str, path: str, latency_scale: float = 1.0):
+        self.mode = mode
+        self.path = path
+        self.latency_scale = latency_scale
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._file = None
+        self._closed = False
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+
+        if mode == MODE_REPLAY:
+            self._load()
+        elif mode == MODE_RECORD:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            print(f"📼 Recording HTTP responses to {path}")
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == MODE_RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == MODE_REPLAY
+
+    def _load(self) -> None:
+        count = 0
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry['key'], []).append(entry)
+                    count += 1
+        except FileNotFoundError:
+            logger.error(f"Cassette not found: {self.path}")
+            print(f"❌ Cassette not found: {self.path}")
+        except (EOFError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+            # Process record bị kill giữa chừng → đuôi file hỏng, giữ các dòng đã đọc được
+            logger.warning(f"Cassette {self.path} truncated after {count} entries: {e}")
+        print(f"📼 Replaying {count} responses ({len(self._entries)} URLs) from {self.path}")
+
+    def record(
+        self,
+        key: str,
+        status: int,
+        headers: Mapping[str, str],
+        body: bytes,
+        elapsed: float,
+        url: Optional[str] = None
+    ) -> None:
+        """url: URL cuối cùng nếu request bị redirect (None = không redirect)"""
+        entry = {
+            "key": key,
+            "status": status,
+            "headers": {k: v for k, v in headers.items()},
+            "body": base64.b64encode(body).decode('ascii'),
+            "elapsed": round(elapsed, 4),
+            "recorded_at": time.time(),
+        }
+        if url:
+            entry["url"] = url
+            entry["redirected"] = True
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                # 'ab': mỗi lần chạy thêm một gzip member, gzip.open đọc nối tiếp được
+                self._file = gzip.open(self.path, 'ab')
+            self._file.write(line.encode('utf-8'))
+            self.recorded += 1
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Response tiếp theo đã ghi cho key (None nếu chưa từng ghi)"""
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                self.misses += 1
+                return None
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            self.replayed += 1
+            return entries[min(index, len(entries) - 1)]
+
+    def replay_delay(self, entry: Mapping[str, Any]) -> float:
+        return max(0.0, float(entry.get("elapsed", 0.0)) * self.latency_scale)
+
+    @staticmethod
+    def body_of(entry: Mapping[str, Any]) -> bytes:
+        return base64.b64decode(entry["body"])
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if self.recording:
+            print(f"📼 Cassette closed: {self.recorded} responses recorded to {self.path}")
+        elif self.replaying:
+            print(f"📼 Cassette replay: {self.replayed} responses served, {self.misses} misses")
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Cassette theo settings (None khi CRAWLER_CASSETTE_MODE=off)"""
+    global _cassette
+    mode = (settings.CRAWLER_CASSETTE_MODE or MODE_OFF).lower()
+    if mode == MODE_OFF:
+        return None
+    if mode not in (MODE_RECORD, MODE_REPLAY):
+        logger.warning(f"Unknown CRAWLER_CASSETTE_MODE '{mode}', cassette disabled")
+        return None
+
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(mode, settings.CRAWLER_CASSETTE_PATH, settings.CRAWLER_CASSETTE_REPLAY_LATENCY)
+            atexit.register(_cassette.close)
+        return _cassette
@@ -7,6 +7,9 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.common.exceptions import TimeoutException, WebDriverException
 
+from app.core.config import settings
+from app.utils.http_client_utils import http_client
+
 
 # ==================== ZOMBIE PROCESS KILLER ====================
 def _kill_all_chrome_zombies() -> int:
@@ -100,7 +103,26 @@ def _cleanup_on_exit():
         print(f"🧹 Cleaned up {killed} Chrome zombie processes on exit")
 
 
+def _fetch_coordinates_from_api(address: str) -> Optional[Tuple[float, float]]:
+    """JSON geocoder (settings.GEOCODING_API_URL, vd: mock server khi load test) thay cho Selenium"""
+    try:
+        response = http_client.get(settings.GEOCODING_API_URL, params={'address': address}, timeout=settings.GALLERY_TIMEOUT)
+        if response.status_code != 200:
+            print(f"❌ Geocoding API failed: HTTP {response.status_code}")
+            return None
+        result = response.json()
+        if result.get('lat') is None or result.get('lng') is None:
+            return None
+        return float(result['lat']), float(result['lng'])
+    except Exception as e:
+        print(f"❌ Geocoding API error for {address}: {e}")
+        return None
+
+
 def fetch_coordinates_from_google_maps(address: str) -> Optional[Tuple[float, float]]:
+    if settings.GEOCODING_API_URL:
+        return _fetch_coordinates_from_api(address)
+
     driver = None
     
     try:
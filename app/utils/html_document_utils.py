@@ -0,0 +1,135 @@
+"""
+Parsed HTML document (lxml) dùng chung cho mọi extraction hook của một trang
+
+Pre-hook của site tạo một HtmlDocument cho mỗi trang (data['_doc']), parse lazy một lần khi hook đầu tiên dùng.
+Các hook query bằng selector đã compile sẵn (etree.XPath / CSSSelector) thay vì quét lại trang 200-500KB bằng
+từng regex. Cặp dt/dd và th/td được index trong cùng một lần duyệt cây.
+
+Regex của HtmlProcessor chỉ còn là fallback: parse lỗi (HtmlDocument.from_data() trả về None) hoặc selector
+không tìm thấy gì.
+"""
+import logging
+from typing import Any, Dict, List, Optional
+
+from lxml import etree
+from lxml import html as lxml_html
+
+logger = logging.getLogger(__name__)
+
+
+def text_of(element: Any) -> str:
+    """Text của element (hoặc kết quả @attr của XPath), clean như HtmlProcessor.clean_html"""
+    if element is None:
+        return ""
+    if isinstance(element, str):
+        return element.replace('\xa0', ' ').strip()
+    return element.text_content().replace('\xa0', ' ').strip()
+
+
+class HtmlDocument:
+    """Cây lxml của một trang + index dt/dd, th/td"""
+
+    def __init__(self, html: str):
+        self.html = html
+        self._root = None
+        self._parsed = False
+        self._dt_groups: Optional[Dict[str, List[Any]]] = None  # dt label → các dd liền sau
+        self._th_td: Optional[Dict[str, Any]] = None  # th label → td kế tiếp
+        # Text đã clean, build một lần cho mỗi trang (hook tra từng label nhiều lần)
+        self._dt_dd_text: Optional[Dict[str, str]] = None
+        self._th_td_text: Optional[Dict[str, str]] = None
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any]) -> Optional['HtmlDocument']:
+        """Document của trang đang extract, None nếu chưa có hoặc parse lỗi (→ dùng regex)"""
+        doc = data.get('_doc')
+        if isinstance(doc, cls) and doc.root is not None:
+            return doc
+        return None
+
+    @property
+    def root(self):
+        if not self._parsed:
+            self._parsed = True
+            try:
+                self._root = lxml_html.document_fromstring(self.html) if self.html else None
+            except (etree.ParserError, ValueError) as e:
+                logger.debug(f"HTML parse failed, falling back to regex: {e}")
+                self._root = None
+        return self._root
+
+    def select(self, selector: etree.XPath, element: Any = None) -> List[Any]:
+        """Kết quả của selector đã compile (etree.XPath / CSSSelector) trên element (default: cả trang)"""
+        context = self.root if element is None else element
+        if context is None:
+            return []
+        result = selector(context)
+        return result if isinstance(result, list) else [result]
+
+    def first(self, selector: etree.XPath, element: Any = None) -> Optional[Any]:
+        results = self.select(selector, element)
+        return results[0] if results else None
+
+    def first_text(self, selector: etree.XPath, element: Any = None) -> Optional[str]:
+        found = self.first(selector, element)
+        return text_of(found) if found is not None else None
+
+    def _index(self) -> None:
+        """
+        Index dt/dd và th/td trong một lần duyệt cây, cùng quy tắc với HtmlProcessor.parse_label_maps:
+        dd liền sau dt, th ghép với td kế tiếp trong cùng hàng, label trùng giữ cái sau
+        """
+        self._dt_groups, self._th_td = {}, {}
+        if self.root is None:
+            return
+
+        pending_th = None
+        for element in self.root.iter('dt', 'tr', 'th', 'td'):
+            if element.tag == 'dt':
+                dds = []
+                sibling = element.getnext()
+                while sibling is not None and sibling.tag == 'dd':
+                    dds.append(sibling)
+                    sibling = sibling.getnext()
+                label = text_of(element)
+                if label and dds:
+                    self._dt_groups[label] = dds
+            elif element.tag == 'tr':
+                pending_th = None
+            elif element.tag == 'th':
+                pending_th = text_of(element)
+            elif pending_th is not None:
+                if pending_th:
+                    self._th_td[pending_th] = element
+                pending_th = None
+
+    def dd_elements(self, dt_label: str) -> List[Any]:
+        """Các <dd> liền sau <dt>dt_label</dt>"""
+        if self._dt_groups is None:
+            self._index()
+        return self._dt_groups.get(dt_label, [])
+
+    def dt_dd(self) -> Dict[str, str]:
+        """Tất cả cặp dt/dd: label → text của dd đầu tiên (cache, không sửa dict trả về)"""
+        if self._dt_dd_text is None:
+            if self._dt_groups is None:
+                self._index()
+            self._dt_dd_text = {label: text_of(dds[0]) for label, dds in self._dt_groups.items()}
+        return self._dt_dd_text
+
+    def td_element(self, th_label: str) -> Optional[Any]:
+        """<td> kế tiếp <th>th_label</th>"""
+        if self._th_td is None:
+            self._index()
+        return self._th_td.get(th_label)
+
+    def th_td(self) -> Dict[str, str]:
+        """Tất cả cặp th/td: label → text của td (cache, không sửa dict trả về)"""
+        if self._th_td_text is None:
+            if self._th_td is None:
+                self._index()
+            self._th_td_text = {label: text_of(cell) for label, cell in self._th_td.items()}
+        return self._th_td_text
+
+    def td_text(self, th_label: str) -> Optional[str]:
+        return self.th_td().get(th_label)
@@ -2,7 +2,7 @@
 HTML processing utilities for Mitsui crawling
 """
 import re
-from typing import Optional, Dict
+from typing import Dict, List, Optional, Tuple
 from functools import lru_cache
 
 class HtmlProcessor:
@@ -94,48 +94,147 @@ class HtmlProcessor:
         return cls.clean_html(content).strip() if content else None
     
     @classmethod
-    def parse_all_dt_dd(cls, html: str) -> Dict[str, str]:
+    def parse_label_maps(cls, html: str) -> Tuple['LabelMap', 'LabelMap']:
         """
-        Parse ALL <dt>label</dt><dd>content</dd> pairs in one pass
+        Parse ALL <dt>label</dt><dd>content</dd> and <th>label</th><td>content</td> pairs in one linear pass
+        
+        Tokenizer chỉ dừng ở thẻ dl/dt/dd/table/tr/th/td (một finditer, không backtracking):
+        - dd phải liền sau </dt> (chỉ cách khoảng trắng), chỉ lấy dd đầu tiên
+        - th ghép với td kế tiếp trong cùng hàng <tr> (th gần nhất), không ghép sang hàng sau
+        - table / dl lồng trong ô được giữ nguyên trong nội dung ô; </dd>, </td> bị bỏ vẫn được xử lý
         
         Args:
             html: HTML string to parse
             
         Returns:
-            Dictionary mapping dt labels to cleaned dd content
+            (dt_dd, th_td): LabelMap label (cleaned) → raw content (not cleaned)
         """
-        result = {}
-        pattern = cls.compile_regex(r'<dt[^>]*>(.*?)</dt>\s*<dd[^>]*>(.*?)</dd>')
+        dt_dd, th_td = LabelMap(), LabelMap()
+        capture = None      # Ô đang lấy nội dung: dt / dd / th / td
+        start = 0           # Vị trí bắt đầu nội dung của ô
+        nested = 0          # Số table / dl lồng trong ô đang lấy
+        dd_label = None     # Label của dd đang lấy
+        dt_label = None     # dt vừa đóng (raw, clean khi có dd), chờ dd liền sau
+        dt_end = 0
+        th_label = None     # th trong hàng hiện tại (raw, clean khi có td), chờ td
         
-        for match in pattern.finditer(html):
-            label = cls.clean_html(match.group(1)).strip()
-            content = match.group(2).strip()  # Keep raw HTML for now
-            if label:
-                result[label] = content
+        for match in _LABEL_TAG.finditer(html):
+            closing = match.group(1) == '/'
+            tag = match.group(2).lower()
+            
+            if capture is not None:
+                if nested:
+                    if tag in _NESTING_TAGS:
+                        nested += -1 if closing else 1
+                    continue
+                if not closing and tag in _NESTING_TAGS:
+                    nested = 1
+                    continue
+                explicit_end = closing and tag == capture
+                if not explicit_end and (closing, tag) not in _IMPLIED_END[capture]:
+                    continue
+                
+                content = html[start:match.start()]
+                if capture == 'dt':
+                    dt_label = content
+                    dt_end = match.end() if explicit_end else match.start()
+                elif capture == 'dd':
+                    if dd_label:
+                        dt_dd.add(dd_label, content.strip())
+                elif capture == 'th':
+                    th_label = content
+                elif th_label is not None:
+                    if label := cls.clean_html(th_label).strip():
+                        th_td.add(label, content.strip())
+                    th_label = None
+                capture = None
+                if explicit_end:
+                    continue
+            
+            if closing:
+                if tag in ('tr', 'table'):
+                    th_label = None
+                elif tag == 'dl':
+                    dt_label = None
+                continue
+            
+            if tag == 'dd':
+                adjacent = dt_label is not None and not html[dt_end:match.start()].strip()
+                dd_label = cls.clean_html(dt_label).strip() if adjacent else None
+                dt_label = None
+            elif tag == 'dt':
+                dt_label = None
+            elif tag == 'tr':
+                th_label = None
+                continue
+            elif tag in _NESTING_TAGS:
+                continue
+            capture = tag
+            start = match.end()
         
-        return result
+        return dt_dd, th_td
     
     @classmethod
-    def parse_all_th_td(cls, html: str) -> Dict[str, str]:
+    def parse_all_dt_dd(cls, html: str) -> 'LabelMap':
         """
-        Parse ALL <th>label</th>...<td>content</td> pairs in one pass
+        Parse ALL <dt>label</dt><dd>content</dd> pairs in one pass
         
         Args:
             html: HTML string to parse
             
         Returns:
-            Dictionary mapping th labels to raw td content (not cleaned)
+            LabelMap mapping dt labels to raw dd content (.get: label trùng lấy cái sau)
         """
-        result = {}
-        # Match th label followed by td content (may have other tags in between)
-        pattern = cls.compile_regex(r'<th[^>]*>(.*?)</th>.*?<td[^>]*>(.*?)</td>')
-        
-        for match in pattern.finditer(html):
-            label = cls.clean_html(match.group(1)).strip()
-            content = match.group(2).strip()  # Keep raw HTML
-            if label:
-                result[label] = content
+        return cls.parse_label_maps(html)[0]
+    
+    @classmethod
+    def parse_all_th_td(cls, html: str) -> 'LabelMap':
+        """
+        Parse ALL <th>label</th>...<td>content</td> pairs in one pass
         
-        return result
+        Args:
+            html: HTML string to parse
+            
+        Returns:
+            LabelMap mapping th labels to raw td content (not cleaned)
+        """
+        return cls.parse_label_maps(html)[1]
+
+
+class LabelMap(dict):
+    """
+    Ordered multi-map label → nội dung ô
+    
+    Dùng như dict (get / [] / items: label trùng lấy giá trị sau cùng, như các regex cũ);
+    getall() / pairs giữ mọi giá trị theo thứ tự trong trang.
+    """
     
+    def __init__(self):
+        super().__init__()
+        self.pairs: List[Tuple[str, str]] = []
+    
+    def add(self, label: str, content: str) -> None:
+        self.pairs.append((label, content))
+        self[label] = content
+    
+    def getall(self, label: str) -> List[str]:
+        return [content for key, content in self.pairs if key == label]
+    
+    def cleaned(self) -> Dict[str, str]:
+        """label → nội dung đã clean_html"""
+        return {label: HtmlProcessor.clean_html(content) for label, content in self.items()}
+
+
+# Thẻ mở / đóng mà tokenizer của parse_label_maps quan tâm
+# Không dùng re.IGNORECASE: chậm gấp đôi trên trang tiếng Nhật, class ký tự hoa/thường thay thế
+_LABEL_TAG = re.compile(r'<(/?)([dD][lLtTdD]|[tT](?:[aA][bB][lL][eE]|[rRhHdD]))\b[^>]*>')
+_NESTING_TAGS = ('table', 'dl')
+# Thẻ kết thúc ngầm một ô (HTML cho phép bỏ </dt>, </dd>, </th>, </td>): (closing, tag)
+_IMPLIED_END = {
+    'dt': {(False, 'dt'), (False, 'dd'), (True, 'dl')},
+    'dd': {(False, 'dt'), (False, 'dd'), (True, 'dl')},
+    'th': {(False, 'th'), (False, 'td'), (False, 'tr'), (True, 'tr'), (True, 'table')},
+    'td': {(False, 'th'), (False, 'td'), (False, 'tr'), (True, 'tr'), (True, 'table')},
+}
+
 htmlProcessor = HtmlProcessor()
\ No newline at end of file
@@ -1,10 +1,15 @@
 """
 HTTP client utilities for Mitsui crawling
 """
+import time
+
 import requests
 from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
 from urllib3.util.retry import Retry
 
+from app.utils.cassette_utils import Cassette, cassette_key, get_cassette
+
 class HttpClient:
     """Singleton HTTP client with optimized connection pooling"""
     _instance = None
@@ -50,8 +55,36 @@ class HttpClient:
         return session
     
     def get(self, url: str, **kwargs) -> requests.Response:
-        """Make GET request using the optimized session"""
-        return self._session.get(url, **kwargs)
+        """Make GET request using the optimized session (record/replay qua cassette nếu bật)"""
+        cassette = get_cassette()
+        if cassette is None:
+            return self._session.get(url, **kwargs)
+
+        key = cassette_key('GET', url, kwargs.get('params'))
+        if cassette.replaying:
+            return self._replay(cassette, key, url)
+
+        response = self._session.get(url, **kwargs)
+        cassette.record(key, response.status_code, response.headers, response.content, response.elapsed.total_seconds())
+        return response
+
+    @staticmethod
+    def _replay(cassette: Cassette, key: str, url: str) -> requests.Response:
+        entry = cassette.lookup(key)
+        if entry is None:
+            raise requests.exceptions.ConnectionError(f"Not in cassette: {key}")
+
+        delay = cassette.replay_delay(entry)
+        if delay:
+            time.sleep(delay)
+
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry.get('headers') or {})
+        response._content = Cassette.body_of(entry)
+        response.url = url
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
     
     def close(self):
         """Close the session"""
@@ -37,8 +37,14 @@ class PropertyUtils:
     
     @staticmethod
     def create_crawl_result(property_data: Dict[str, Any] = None, 
-                           error: str = None) -> Dict[str, Any]:
-        """Tạo cấu trúc kết quả crawl chuẩn"""
+                           error: str = None,
+                           retryable: bool = False,
+                           dead: bool = False) -> Dict[str, Any]:
+        """
+        Tạo cấu trúc kết quả crawl chuẩn
+        retryable=True: lỗi tạm thời, có thể thử lại cuối run
+        dead=True: trang đã đóng (404/410, redirect về search) - không tính là lỗi cho circuit breaker
+        """
         if property_data:
             result = {
                 'property_data': property_data,
@@ -47,6 +53,10 @@ class PropertyUtils:
             result = {
                 'error': error or 'Unknown error'
             }
+            if retryable:
+                result['retryable'] = True
+            if dead:
+                result['dead'] = True
         
         return result
     
@@ -2,7 +2,7 @@
 File operation utility functions
 """
 import logging, time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set
 import logging, time, json, os
 from app.core.config import settings
 
@@ -80,7 +80,13 @@ class SaveUtils:
             return None
         
     @staticmethod
-    async def filter_urls(urls: List[str], collection_name: Optional[str] = "crawl_results", id_fallback: Optional[int] = 0) -> tuple[List[str], List[int]]:
+    async def filter_urls(
+        urls: List[str],
+        collection_name: Optional[str] = "crawl_results",
+        id_fallback: Optional[int] = 0,
+        remove_missing: bool = True,
+        reserved_ids: Optional[Set[int]] = None
+    ) -> tuple[List[str], List[int]]:
         """
         Lọc ra các URLs chưa tồn tại trong collection hoặc đã quá hạn cập nhật và lấy danh sách ID khả dụng
         
@@ -90,6 +96,9 @@ class SaveUtils:
             urls: Danh sách URLs cần kiểm tra
             collection_name: Tên collection cần kiểm tra
             id_fallback: ID mặc định nếu collection rỗng
+            remove_missing: Xoá các URL không có trong `urls` (False khi `urls` chỉ là một phần
+                            của kết quả discovery - xem remove_missing_urls)
+            reserved_ids: Các ID đã cấp cho chunk trước nhưng có thể chưa được lưu, không cấp lại
             
         Returns:
             Tuple gồm (danh sách URLs chưa tồn tại hoặc cần cập nhật, danh sách ID khả dụng để sử dụng)
@@ -137,35 +146,30 @@ class SaveUtils:
             
             # Xóa các URLs trong collection không còn tồn tại trong danh sách crawl
             # (Tránh tình trạng nhà đã được đóng nhưng vẫn còn trong DB)
-            urls_set = set(urls)
-            delete_result = await collection.delete_many({
-                "link": {"$nin": urls}  # URLs không có trong danh sách crawl
-            })
-            deleted_count = delete_result.deleted_count
-            
-            if deleted_count > 0:
-                logger.info(f"Removed {deleted_count} URLs no longer available in crawl results")
-                print(f"🗑️ Removed {deleted_count} closed/unavailable listings from collection")
+            if remove_missing:
+                await SaveUtils.remove_missing_urls(urls, collection_name)
             
             # Tìm các ID gaps (ID bị thiếu) để tái sử dụng
             available_ids = []
             if len(new_urls) > 0:
                 existing_ids = await collection.distinct("_id")
                 existing_ids_set = set(int(i) for i in existing_ids)
+                reserved = reserved_ids or set()
 
                 max_id = max(existing_ids_set) if existing_ids_set else id_fallback
                 needed = len(new_urls)
 
-                # Tìm các ID còn trống (gap)
+                # Tìm các ID còn trống (gap), bỏ qua ID đã cấp cho chunk trước
                 all_ids = set(range(id_fallback, max_id + 1))
-                available_ids = list(all_ids - existing_ids_set)
+                available_ids = list(all_ids - existing_ids_set - reserved)
 
                 # Cắt vừa đủ số lượng cần thiết
                 available_ids = available_ids[:needed]
 
-                # Nếu chưa đủ, thêm các ID mới
+                # Nếu chưa đủ, thêm các ID mới (sau cả các ID đã cấp)
                 if len(available_ids) < needed:
-                    available_ids.extend(range(max_id + 1, max_id + 1 + (needed - len(available_ids))))
+                    next_id = max(max_id, max(reserved, default=max_id)) + 1
+                    available_ids.extend(range(next_id, next_id + (needed - len(available_ids))))
             
             gaps_count = len([id for id in available_ids if id <= max_id])
             new_ids_count = len([id for id in available_ids if id > max_id])
@@ -181,8 +185,75 @@ class SaveUtils:
             return urls, []
     
     @staticmethod
-    async def save_db_results(results: List[Dict[str, Any]], collection_name: Optional[str] = "crawl_results", available_ids: Optional[List[int]] = None) -> Optional[str]:
-        """Lưu kết quả vào MongoDB - Insert mới hoặc Update nếu URL đã tồn tại"""        
+    async def remove_missing_urls(urls: List[str], collection_name: Optional[str] = "crawl_results") -> int:
+        """
+        Xoá các document có link không nằm trong `urls` (listing đã đóng)
+        
+        Chỉ gọi với danh sách URL đầy đủ của một lần discovery thành công - nếu thiếu trang
+        listing nào thì các listing còn mở trên trang đó cũng sẽ bị xoá.
+        
+        Returns:
+            Số document đã xoá
+        """
+        if not urls:
+            # Discovery rỗng gần như chắc chắn là lỗi site/mạng, không xoá toàn bộ collection
+            return 0
+        
+        try:
+            collection = get_collection(collection_name)
+            delete_result = await collection.delete_many({
+                "link": {"$nin": urls}  # URLs không có trong danh sách crawl
+            })
+            deleted_count = delete_result.deleted_count
+            
+            if deleted_count > 0:
+                logger.info(f"Removed {deleted_count} URLs no longer available in crawl results")
+                print(f"🗑️ Removed {deleted_count} closed/unavailable listings from collection")
+            return deleted_count
+        
+        except Exception as e:
+            logger.error(f"Error removing missing URLs from collection {collection_name}: {e}")
+            print(f"❌ Error removing closed listings: {e}")
+            return 0
+    
+    @staticmethod
+    async def touch_urls(urls: List[str], collection_name: Optional[str] = "crawl_results") -> int:
+        """
+        Chỉ cập nhật created_date cho các URL không thay đổi (vd: 304 Not Modified)
+        
+        Returns:
+            Số document đã được cập nhật
+        """
+        if not urls:
+            return 0
+        
+        try:
+            collection = get_collection(collection_name)
+            update_result = await collection.update_many(
+                {"link": {"$in": urls}},
+                {"$set": {"created_date": time.time()}}
+            )
+            print(f"♻️ Refreshed {update_result.modified_count} unchanged records in '{collection_name}'")
+            return update_result.modified_count
+        
+        except Exception as e:
+            logger.error(f"Error touching URLs in collection {collection_name}: {e}")
+            print(f"❌ Error refreshing unchanged records: {e}")
+            return 0
+    
+    @staticmethod
+    async def save_db_results(
+        results: List[Dict[str, Any]],
+        collection_name: Optional[str] = "crawl_results",
+        available_ids: Optional[List[int]] = None,
+        saved_links: Optional[List[str]] = None
+    ) -> Optional[str]:
+        """
+        Lưu kết quả vào MongoDB - Insert mới hoặc Update nếu URL đã tồn tại
+        
+        saved_links: Nếu truyền vào, được nối thêm link của các document thực sự được ghi
+        (result thiếu field / toạ độ không hợp lệ bị bỏ qua)
+        """        
         try:
             collection = get_collection(collection_name)
             
@@ -232,6 +303,8 @@ class SaveUtils:
                     }
                     await collection.replace_one({"_id": existing_id}, document)
                     updated_count += 1
+                    if saved_links is not None:
+                        saved_links.append(link)
                 else:
                     # URL mới → INSERT với _id từ available_ids
                     if id_index < len(available_ids):
@@ -256,6 +329,8 @@ class SaveUtils:
                     }
                     await collection.insert_one(document)
                     inserted_count += 1
+                    if saved_links is not None:
+                        saved_links.append(link)
             
             total_count = inserted_count + updated_count
             if total_count > 0:
@@ -1,10 +1,12 @@
-import requests
+from app.core.config import settings
+from app.utils.http_client_utils import http_client
     
 def translate_ja_to_en(lan_src: str = 'ja', lan_dl: str = 'en', text: str = ''):
     if not text:
         return None
     
-    call_api = requests.get(f'https://ftapi.pythonanywhere.com/translate?sl={lan_src}&dl={lan_dl}&text={text}')
+    # Qua http_client (params được encode đúng, ghi/phát lại được bằng cassette)
+    call_api = http_client.get(settings.TRANSLATE_API_URL, params={'sl': lan_src, 'dl': lan_dl, 'text': text})
     
     if call_api:
         return call_api.json().get('destination-text')